@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+#  Quantities derived from the points over time, worked out in one streaming pass.
+#
+#  The points are read a block of time at a time, so only a block is ever in memory however
+#  long the run is.  Velocities are central differences of the positions (one sided at the
+#  first and last point), so every block is read with one extra point on each side (a halo)
+#  and gives the same velocities as differencing the whole array at once.  For every point in
+#  time the block gives:
+#     kineticEnergy   - sum of 1/2 m |v|^2
+#     centerOfMass    - sum of m r / sum of m                  (x, y, z)
+#     momentum        - sum of m v                             (x, y, z)
+#     angularMomentum - sum of m r x v, about the origin       (x, y, z)
+#     rmsSpeed        - root mean square of the particles' speeds
+#  The points files don't hold masses, so every particle weighs 1 unless masses are given.
+#  Particles with a position that isn't finite make the quantities at that point NaN.
+#
+#  Example
+#     series = analysis.TrajectoryAnalysis(points, timeStep = 0.01)
+#     energy = series.series["kineticEnergy"]          <-- One value per point in time
+#
+#     python3 analysis.py points.npy --time-step 0.01 --output series.csv
+
+import argparse
+import csv
+import numpy as np
+import store
+import trajectory
+
+#  The quantities worked out: name, label and number of components
+quantities = [("kineticEnergy", "Kinetic Energy", 1),
+              ("centerOfMass", "Center of Mass", 3),
+              ("momentum", "Momentum", 3),
+              ("angularMomentum", "Angular Momentum", 3),
+              ("rmsSpeed", "RMS Speed", 1)]
+
+#  The most memory a block of points and its temporary arrays may use (in bytes)
+defaultBlockBytes = 64 * 1024 * 1024
+
+#  The number of arrays the size of a block that are in memory at once (positions, velocities,
+#  cross products and squares)
+blockCopies = 5
+
+class TrajectoryAnalysis(object):
+   '''Time series of quantities derived from the points, one value (or x, y, z) per point in
+      time.
+      Input:  array of points <np.ndarray or store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]],
+              mass of every particle (all 1 if None) <np.ndarray> [float],
+              time between points <float>,
+              most memory a block may use (in bytes) <int>,
+              function called with the fraction done after each block of points <function(fraction <float>)>
+      Output: None'''
+   def __init__(self, points, masses = None, timeStep = 1.0, maxBytes = defaultBlockBytes, progress = None):
+      particleCount = points.shape[0]
+      self.masses = np.ones(particleCount) if masses is None else np.asarray(masses, dtype = np.float64)
+      if(self.masses.shape != (particleCount,)): raise(ValueError("There must be a mass for each of the " + str(particleCount) + " particles"))
+      self.timeStep = float(timeStep)
+      
+      #  The number of points in a block, so it and its temporary arrays fit in maxBytes
+      self.blockSize = max(1, int(maxBytes // (blockCopies * max(1, particleCount * 3 * 8))))
+      
+      #  The room the series are worked out into, the series themselves ([point] or
+      #  [point [x, y, z]], the part of the room that is filled) and the number of points worked out
+      self.buffers = dict((name, np.empty((0,) if size == 1 else (0, 3))) for name, label, size in quantities)
+      self.series = dict(self.buffers)
+      self.pointCount = 0
+      
+      self.update(points, progress)
+
+   def update(self, points, progress = None):
+      '''Work out the quantities for the points added since the series were last worked out
+         (the last point is redone since its velocity was one sided).
+         Input:  array of points <np.ndarray or store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]],
+                 function called with the fraction done after each block of points <function(fraction <float>)>
+         Output: None'''
+      #  Read points kept on the disk straight from their source so the working set isn't flushed
+      source = points.source if isinstance(points, store.ChunkedTrajectory) else points
+      pointCount = points.shape[2]
+      first = max(0, self.pointCount - 1)
+      
+      #  Make room for the new points, keeping the ones already worked out.  The room is doubled
+      #  when it runs out, so adding a few points at a time (as live points are) takes amortized
+      #  constant time per point.
+      for name, buffer in self.buffers.items():
+         if(pointCount > len(buffer)):
+            grown = np.empty((max(pointCount, 2 * len(buffer)),) + buffer.shape[1:])
+            grown[:first] = buffer[:first]
+            self.buffers[name] = grown
+      
+      #  The total mass and the masses shaped to weigh every particle of a block
+      totalMass = self.masses.sum()
+      masses = self.masses[:, np.newaxis, np.newaxis]
+      
+      #  Go through each block of time
+      for start in range(first, pointCount, self.blockSize):
+         stop = min(start + self.blockSize, pointCount)
+         positions, velocity = velocities(source, start, stop, self.timeStep)
+         
+         #  Sum over the particles, giving [axis [point]] or [point]
+         with np.errstate(invalid = "ignore", over = "ignore"):
+            speedSquared = (velocity ** 2).sum(axis = 1)
+            self.buffers["kineticEnergy"][start:stop] = 0.5 * np.dot(self.masses, speedSquared)
+            self.buffers["centerOfMass"][start:stop] = ((masses * positions).sum(axis = 0) / totalMass).T
+            self.buffers["momentum"][start:stop] = (masses * velocity).sum(axis = 0).T
+            self.buffers["angularMomentum"][start:stop] = (masses * np.cross(positions, velocity, axis = 1)).sum(axis = 0).T
+            self.buffers["rmsSpeed"][start:stop] = np.sqrt(speedSquared.mean(axis = 0))
+         
+         if(progress != None): progress((stop - first) / max(1, pointCount - first))
+      
+      self.series = dict((name, buffer[:pointCount]) for name, buffer in self.buffers.items())
+      self.pointCount = pointCount
+
+   def writeCsv(self, fileName):
+      '''Write the series to a CSV file, a row per point in time.
+         Input:  file name <str>
+         Output: None'''
+      #  A column per quantity, or per axis of quantities with x, y and z
+      header = ["point", "time"]
+      for name, label, size in quantities:
+         header.extend([name] if size == 1 else [name + axis for axis in "XYZ"])
+      columns = [np.arange(self.pointCount), np.arange(self.pointCount) * self.timeStep]
+      for name, label, size in quantities:
+         columns.extend([self.series[name]] if size == 1 else list(self.series[name].T))
+      
+      with open(fileName, "w", newline = "") as WRITE:
+         writer = csv.writer(WRITE)
+         writer.writerow(header)
+         for row in zip(*columns):
+            writer.writerow([int(row[0])] + ["%.10g" % value for value in row[1:]])
+
+def velocities(points, start, stop, timeStep = 1.0):
+   '''Get the positions and velocities of every particle over a range of points.  The range
+      is read with a point of halo on each side, so the velocities are central differences
+      everywhere but at the first and last point of the points.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              first point <int>,
+              index after the last point <int>,
+              time between points <float>
+      Output: positions <np.ndarray> [particle number [axis X, Y, Z [position <float>]]],
+              velocities <np.ndarray> [particle number [axis X, Y, Z [velocity <float>]]]'''
+   pointCount = points.shape[2]
+   
+   #  Read the range with its halo
+   first = max(0, start - 1)
+   last = min(pointCount, stop + 1)
+   block = np.asarray(points[:, :, first:last], dtype = np.float64)
+   
+   #  A single point has no velocity
+   if(block.shape[2] < 2): return(block[:, :, start - first:stop - first], np.zeros(block.shape[:2] + (stop - start,)))
+   
+   with np.errstate(invalid = "ignore", over = "ignore"):
+      velocity = np.gradient(block, timeStep, axis = 2)
+   return(block[:, :, start - first:stop - first], velocity[:, :, start - first:stop - first])
+
+def main():
+   '''Work out the quantities of the points file given on the command line and write them to a
+      CSV file.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Work out the kinetic energy, center of mass, momentum and angular momentum of nBody points over time.")
+   parser.add_argument("points", help = "points file (or shard manifest or pattern)")
+   parser.add_argument("--masses", default = None, help = "binary (.npy) file of every particle's mass (default: all 1)")
+   parser.add_argument("--time-step", dest = "timeStep", type = float, default = 1.0, help = "time between points")
+   parser.add_argument("--output", default = "analysis.csv", help = "CSV file for the series")
+   args = parser.parse_args()
+   
+   points = trajectory.loadPoints(args.points)
+   masses = np.load(args.masses, allow_pickle = False) if args.masses != None else None
+
+   def progress(fraction):
+      print("\rAnalyzing... %3d%%" % (fraction * 100), end = "", flush = True)
+   result = TrajectoryAnalysis(points, masses, args.timeStep, progress = progress)
+   print("")
+   
+   result.writeCsv(args.output)
+   print("Wrote " + str(result.pointCount) + " points to " + args.output)
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+#  A Barnes-Hut tree code for nBody simulations with many particles.
+#
+#  The particles are put in an octree; a cell far enough away (its size over its distance is
+#  under the opening angle theta) pulls like a single particle at its center of mass, so each
+#  particle only looks at O(log N) cells instead of every other particle.
+#
+#  The octree is kept in flat numpy arrays, one entry per cell, instead of a Python object per
+#  cell.  The particles are sorted along a Morton (Z-order) curve so the particles of every cell
+#  are a contiguous run of the sorted arrays and the children of every cell are a contiguous run
+#  of cells.  The tree is built one level at a time and walked for a block of particles at a
+#  time by keeping the (particle, cell) pairs that are still open in arrays.
+#
+#  The tree is rebuilt every step (building it is O(N log N), much less than walking it).
+#  Plug it into the simulation with
+#     import functools, simulation, barneshut
+#     points = simulation.simulate(positions, velocities, masses, 0.001, 2000, softening = 0.01,
+#                                  acceleration = functools.partial(barneshut.accelerations, theta = 0.5))
+#
+#  Compare its accuracy and speed against direct summation with
+#     python3 barneshut.py --particles 20000 --theta 0.3 0.5 0.7 1.0
+
+import argparse
+import time
+import numpy as np
+import simulation
+
+#  The number of bits per axis in the Morton codes (the deepest level of the tree)
+mortonBits = 21
+
+#  The most particles a cell holds before it is split
+defaultLeafSize = 8
+
+#  The default opening angle
+defaultTheta = 0.5
+
+#  The number of particles whose forces are worked out at a time
+targetBlockSize = 2048
+
+def spreadBits(values):
+   '''Spread the lowest 21 bits of each value out so there are two 0 bits between each bit.
+      Input:  values <np.ndarray> [uint64]
+      Output: spread values <np.ndarray> [uint64]'''
+   values = values.astype(np.uint64) & np.uint64(0x1fffff)
+   values = (values | (values << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+   values = (values | (values << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+   values = (values | (values << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+   values = (values | (values << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+   values = (values | (values << np.uint64(2))) & np.uint64(0x1249249249249249)
+   return(values)
+
+class Octree(object):
+   '''An octree of particles kept in flat arrays.  Cell 0 is the root and every cell's
+      children are the cells firstChild to firstChild + childCount - 1.
+      Input:  positions <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              most particles in a leaf cell <int>
+      Output: None'''
+   def __init__(self, positions, masses, leafSize = defaultLeafSize):
+      positions = np.asarray(positions, dtype = np.float64)
+      masses = np.asarray(masses, dtype = np.float64)
+      self.leafSize = leafSize
+      
+      #  The cube around every particle
+      low = positions.min(axis = 0)
+      rootSize = float((positions.max(axis = 0) - low).max()) * (1.0 + 1e-9)
+      if(rootSize <= 0): rootSize = 1.0
+      
+      #  Put every particle on a grid and sort the particles along the Morton curve
+      cells = np.clip(((positions - low) / rootSize * 2 ** mortonBits).astype(np.int64), 0, 2 ** mortonBits - 1).astype(np.uint64)
+      codes = spreadBits(cells[:, 0]) | (spreadBits(cells[:, 1]) << np.uint64(1)) | (spreadBits(cells[:, 2]) << np.uint64(2))
+      self.order = np.argsort(codes, kind = "stable")
+      codes = codes[self.order]
+      cells = cells[self.order]
+      self.positions = positions[self.order]
+      self.masses = masses[self.order]
+      
+      #  Running sums so any run of particles' mass and moment can be found by subtracting
+      massSums = np.concatenate([[0.0], np.cumsum(self.masses)])
+      momentSums = np.concatenate([np.zeros((1, 3)), np.cumsum(self.positions * self.masses[:, np.newaxis], axis = 0)])
+      
+      #  The cells of each level: first particle, number of particles and level
+      levelStarts = [np.zeros(1, dtype = np.int64)]
+      levelCounts = [np.array([len(positions)], dtype = np.int64)]
+      levelChildren = []
+      
+      #  Split the cells with too many particles until none are left
+      level = 0
+      while(True):
+         starts, counts = levelStarts[-1], levelCounts[-1]
+         split = (counts > leafSize) if level < mortonBits else np.zeros(len(counts), dtype = bool)
+         if(not split.any()):
+            levelChildren.append((np.zeros(len(starts), dtype = np.int64), np.zeros(len(starts), dtype = np.int64)))
+            break
+         
+         #  Every run of particles with the same code at the next level is a child cell
+         keys = codes >> np.uint64(3 * (mortonBits - level - 1))
+         childStarts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+         
+         #  Keep only the children of the cells being split (runs under cells that weren't
+         #  split, or under leaves of earlier levels, are dropped)
+         parents = np.maximum(np.searchsorted(starts, childStarts, side = "right") - 1, 0)
+         kept = split[parents] & (childStarts >= starts[parents]) & (childStarts < starts[parents] + counts[parents])
+         childStarts = childStarts[kept]
+         parents = parents[kept]
+         childEnds = np.append(childStarts[1:], len(codes))
+         childEnds = np.minimum(childEnds, starts[parents] + counts[parents])
+         
+         #  Each split cell's children follow one another
+         childCount = np.bincount(parents, minlength = len(starts)).astype(np.int64)
+         firstChild = np.cumsum(childCount) - childCount
+         levelChildren.append((firstChild, childCount))
+         
+         levelStarts.append(childStarts)
+         levelCounts.append(childEnds - childStarts)
+         level += 1
+      
+      #  Join the levels into flat arrays
+      offsets = np.cumsum([0] + [len(starts) for starts in levelStarts])
+      self.start = np.concatenate(levelStarts)
+      self.count = np.concatenate(levelCounts)
+      self.firstChild = np.concatenate([firstChild + offsets[level + 1] for level, (firstChild, childCount) in enumerate(levelChildren)])
+      self.childCount = np.concatenate([childCount for firstChild, childCount in levelChildren])
+      self.leaf = self.childCount == 0
+      cellLevels = np.repeat(np.arange(len(levelStarts)), [len(starts) for starts in levelStarts])
+      
+      #  The size and center of every cell (from the grid position of its first particle)
+      self.size = rootSize / 2.0 ** cellLevels
+      shift = (mortonBits - cellLevels).astype(np.uint64)[:, np.newaxis]
+      self.center = low + ((cells[self.start] >> shift).astype(np.float64) + 0.5) * self.size[:, np.newaxis]
+      
+      #  The mass and center of mass of every cell
+      self.mass = massSums[self.start + self.count] - massSums[self.start]
+      moment = momentSums[self.start + self.count] - momentSums[self.start]
+      self.centerOfMass = self.center.copy()
+      np.divide(moment, self.mass[:, np.newaxis], out = self.centerOfMass, where = self.mass[:, np.newaxis] > 0)
+      
+      #  How far the center of mass is from the center of the cell (used to open close cells)
+      self.offset = np.sqrt(((self.centerOfMass - self.center) ** 2).sum(axis = 1))
+
+   def accelerations(self, targets, G = 1.0, softening = 0.0, theta = defaultTheta):
+      '''Work out the acceleration of points from the particles in the tree.  A cell is opened
+         when its size over theta plus the distance from its center to its center of mass is
+         more than the distance to its center of mass, so a point is never pulled by a cell
+         it is inside.
+         Input:  positions of the points <np.ndarray> [point [x, y, z]],
+                 gravitational constant <float>,
+                 softening length <float>,
+                 opening angle <float>
+         Output: accelerations <np.ndarray> [point [x, y, z]]'''
+      targets = np.asarray(targets, dtype = np.float64)
+      result = np.empty((len(targets), 3))
+      
+      #  The distance inside which each cell is opened
+      reach = (self.size / max(theta, 1e-12) + self.offset) ** 2
+      
+      #  Walk the tree for a block of points at a time
+      for blockStart in range(0, len(targets), targetBlockSize):
+         block = targets[blockStart:blockStart + targetBlockSize]
+         total = np.zeros((len(block), 3))
+         
+         #  Start every point at the root
+         points = np.arange(len(block))
+         nodes = np.zeros(len(block), dtype = np.int64)
+         
+         while(len(points) > 0):
+            #  The distance from each point to its cell's center of mass
+            difference = self.centerOfMass[nodes] - block[points]
+            distance = (difference ** 2).sum(axis = 1)
+            opened = distance < reach[nodes]
+            
+            #  Cells far enough away pull from their center of mass
+            accepted = ~opened
+            self.addPull(total, points[accepted], difference[accepted], distance[accepted], self.mass[nodes[accepted]], softening)
+            
+            #  Opened leaves pull with each of their particles
+            leaves = opened & self.leaf[nodes]
+            if(leaves.any()):
+               counts = self.count[nodes[leaves]]
+               pairPoints = np.repeat(points[leaves], counts)
+               particles = np.repeat(self.start[nodes[leaves]] - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+               pairDifference = self.positions[particles] - block[pairPoints]
+               self.addPull(total, pairPoints, pairDifference, (pairDifference ** 2).sum(axis = 1), self.masses[particles], softening)
+            
+            #  Opened cells with children are replaced by their children
+            inner = opened & ~self.leaf[nodes]
+            counts = self.childCount[nodes[inner]]
+            points = np.repeat(points[inner], counts)
+            nodes = np.repeat(self.firstChild[nodes[inner]] - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+         
+         result[blockStart:blockStart + len(block)] = G * total
+      
+      return(result)
+
+   def addPull(self, total, points, difference, distance, masses, softening):
+      '''Add the pull of sources on points.
+         Input:  accelerations to add to <np.ndarray> [point [x, y, z]],
+                 point of each pair <np.ndarray> [int],
+                 vector from each point to its source <np.ndarray> [pair [x, y, z]],
+                 squared distance of each pair <np.ndarray> [float],
+                 mass of each source <np.ndarray> [float],
+                 softening length <float>
+         Output: None'''
+      if(len(points) == 0): return()
+      
+      #  mass / r^3 for every pair (a particle doesn't pull on itself)
+      distance = distance + softening ** 2
+      weight = np.zeros_like(distance)
+      np.divide(masses, distance * np.sqrt(distance), out = weight, where = distance > 0)
+      
+      #  Add up the pulls on each point
+      for axis in range(3):
+         total[:, axis] += np.bincount(points, weights = weight * difference[:, axis], minlength = len(total))
+
+def accelerations(positions, masses, G = 1.0, softening = 0.0, theta = defaultTheta, leafSize = defaultLeafSize, targets = None):
+   '''Work out the acceleration of particles with a Barnes-Hut tree.  This has the same
+      arguments as simulation.accelerations, plus the opening angle and the leaf size.
+      Input:  positions <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              gravitational constant <float>,
+              softening length <float>,
+              opening angle (0 is exact, larger is faster and rougher) <float>,
+              most particles in a leaf cell <int>,
+              particles to work out the accelerations of (defaults to all) <slice>
+      Output: accelerations <np.ndarray> [target particle [x, y, z]]'''
+   #  Work out the accelerations of every particle if no targets are given
+   if(targets == None): targets = slice(0, len(positions))
+   positions = np.asarray(positions, dtype = np.float64)
+   
+   #  Build the tree and walk it for the targets
+   tree = Octree(positions, masses, leafSize)
+   return(tree.accelerations(positions[targets], G, softening, theta))
+
+def compare(particleCount, thetas, softening = 0.01, seed = 0):
+   '''Compare the accuracy and speed of the tree against direct summation for a random cluster.
+      Input:  number of particles <int>,
+              opening angles to try <list> [float],
+              softening length <float>,
+              random seed <int>
+      Output: results <list> [dict]'''
+   positions, velocities, masses = simulation.randomCluster(particleCount, seed = seed)
+   
+   #  The exact accelerations
+   begin = time.time()
+   exact = simulation.accelerations(positions, masses, softening = softening)
+   results = [{"method": "direct", "theta": 0.0, "seconds": time.time() - begin, "medianError": 0.0, "p99Error": 0.0, "maxError": 0.0}]
+   exactSize = np.sqrt((exact ** 2).sum(axis = 1))
+   
+   #  The tree's accelerations and their errors relative to the exact ones
+   for theta in thetas:
+      begin = time.time()
+      approximate = accelerations(positions, masses, softening = softening, theta = theta)
+      seconds = time.time() - begin
+      error = np.sqrt(((approximate - exact) ** 2).sum(axis = 1)) / np.maximum(exactSize, 1e-300)
+      results.append({"method": "barnes-hut", "theta": theta, "seconds": seconds, "medianError": float(np.median(error)),
+                      "p99Error": float(np.percentile(error, 99)), "maxError": float(error.max())})
+   
+   return(results)
+
+def main():
+   '''Print the accuracy versus speed comparison given on the command line.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Compare Barnes-Hut forces against direct summation.")
+   parser.add_argument("--particles", type = int, default = 10000, help = "number of particles")
+   parser.add_argument("--theta", type = float, nargs = "+", default = [0.3, 0.5, 0.7, 1.0], help = "opening angles to try")
+   parser.add_argument("--softening", type = float, default = 0.01, help = "softening length")
+   parser.add_argument("--seed", type = int, default = 0, help = "random seed")
+   args = parser.parse_args()
+   
+   #  Print a table of the results
+   print("%-11s %6s %10s %9s %14s %14s %14s" % ("method", "theta", "seconds", "speedup", "median error", "99% error", "max error"))
+   results = compare(args.particles, args.theta, args.softening, args.seed)
+   for result in results:
+      print("%-11s %6.2f %10.3f %9.2f %14.3e %14.3e %14.3e" % (result["method"], result["theta"], result["seconds"], results[0]["seconds"] / result["seconds"],
+                                                            result["medianError"], result["p99Error"], result["maxError"]))
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+#  Benchmarks for the load, color and per-frame update paths of the nBody graph.
+#
+#  Synthetic (particle, axis, time) points are made for every combination of the given numbers
+#  of particles and points, and the time taken by each path is measured:
+#     parseText       - trajectory.loadPoints on a text (repr) file, as done in main()
+#     loadBinary      - trajectory.loadPoints on a binary (.npy) file, as done in main()
+#     verifyPoints    - nbody.verifyPoints
+#     import          - importing nbody (which must not load the GUI), gui and trajectory, each in a
+#                       new interpreter
+#     calculateColors - Graph.calculateColors for every particle's whole trail
+#     initializeGraph - Graph.initializeGraph
+#     getNextPoints   - one step of playback (Graph.getNextPoints), averaged over many steps
+#     updateGraph     - one timer tick (Graph.updateGraph), averaged over many ticks
+#
+#  The import benchmarks fail the run if importing nbody loads PyQt4 or pyqtgraph, so changes
+#  that slow down starting the command line tools are caught.  The graph benchmarks need PyQt4
+#  and pyqtgraph.  The graph is never shown; Qt is asked for its offscreen platform (Qt builds
+#  without it need a virtual display such as xvfb-run).  If the GUI can't be imported, those
+#  benchmarks are listed as skipped.
+#
+#  The results are written to a JSON file so runs on different revisions can be compared.
+#     python3 benchmark.py --output before.json
+#     python3 benchmark.py --output after.json --compare before.json
+
+import sys
+import os
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+import nbody
+import trajectory
+
+#  Text files with more values than this aren't made (the text is about 25 bytes per value)
+textMaxValues = 3 * 10 ** 7
+
+#  The modules whose import is timed, and the GUI modules importing nbody must not load
+importModules = ["nbody", "trajectory", "gui"]
+guiModules = ["PyQt4", "pyqtgraph"]
+
+#  The number of playback steps timed for the per-frame benchmarks
+tickCount = 50
+
+def syntheticPoints(particleCount, pointCount, seed = 0):
+   '''Make points for particles moving on tilted circles of different sizes and speeds.
+      Input:  number of particles <int>,
+              number of points per particle <int>,
+              random seed <int>
+      Output: array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+   random = np.random.RandomState(seed)
+   radius = random.uniform(1.0, 10.0, size = (particleCount, 1))
+   phase = random.uniform(0.0, 2.0 * np.pi, size = (particleCount, 1))
+   tilt = random.uniform(-0.3, 0.3, size = (particleCount, 1))
+   angle = phase + np.linspace(0.0, 20.0 * np.pi, pointCount)[np.newaxis, :] / radius
+   
+   return(np.stack([radius * np.cos(angle), radius * np.sin(angle), tilt * radius * np.sin(angle)], axis = 1))
+
+def timeIt(function, repeat):
+   '''Time a function.
+      Input:  function to time <function()>,
+              number of times to run it <int>
+      Output: seconds taken by each run <list> [float]'''
+   seconds = []
+   for run in range(repeat):
+      begin = time.perf_counter()
+      function()
+      seconds.append(time.perf_counter() - begin)
+   return(seconds)
+
+def result(name, particleCount, pointCount, seconds, **extra):
+   '''Make the record of a benchmark.
+      Input:  benchmark name <str>,
+              number of particles <int>,
+              number of points <int>,
+              seconds taken by each run <list> [float],
+              anything else to record
+      Output: record <dict>'''
+   record = {"benchmark": name, "particles": particleCount, "points": pointCount, "repeats": len(seconds),
+             "min": min(seconds), "mean": sum(seconds) / len(seconds), "max": max(seconds)}
+   record.update(extra)
+   return(record)
+
+def skipped(name, particleCount, pointCount, reason):
+   '''Make the record of a benchmark that wasn't run.
+      Input:  benchmark name <str>,
+              number of particles <int>,
+              number of points <int>,
+              why it wasn't run <str>
+      Output: record <dict>'''
+   return({"benchmark": name, "particles": particleCount, "points": pointCount, "skipped": reason})
+
+def importBenchmarks(repeat):
+   '''Time importing modules, each run in a new interpreter so nothing is already imported.
+      Input:  number of runs <int>
+      Output: records <list> [dict]'''
+   #  The interpreter times the import and lists the GUI modules it loaded
+   code = "import sys, time\nbegin = time.perf_counter()\nimport {0}\nprint(time.perf_counter() - begin)\nprint(\",\".join(name for name in " + repr(guiModules) + " if name in sys.modules))"
+   directory = os.path.dirname(os.path.abspath(__file__))
+   
+   records = []
+   for module in importModules:
+      seconds = []
+      try:
+         for run in range(repeat):
+            output = subprocess.check_output([sys.executable, "-c", code.format(module)], cwd = directory, stderr = subprocess.PIPE).decode().split("\n")
+            seconds.append(float(output[0]))
+      except subprocess.CalledProcessError as error:
+         records.append(skipped("import " + module, 0, 0, error.stderr.decode().strip().split("\n")[-1]))
+         continue
+      records.append(result("import " + module, 0, 0, seconds, loaded = [name for name in output[1].split(",") if name != ""]))
+   
+   return(records)
+
+def loadBenchmarks(points, directory, repeat):
+   '''Time loading the points from text and binary files.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              directory for the files <str>,
+              number of runs <int>
+      Output: records <list> [dict]'''
+   particleCount, axisCount, pointCount = points.shape
+   records = []
+   
+   #  Write the text file the way the top of nbody.py says to (with every value in the repr)
+   if(points.size <= textMaxValues):
+      textFile = os.path.join(directory, "points.txt")
+      with np.printoptions(threshold = sys.maxsize):
+         with open(textFile, "w") as WRITE:
+            WRITE.write(repr(points))
+      records.append(result("parseText", particleCount, pointCount, timeIt(lambda: trajectory.loadPoints(textFile), repeat), bytes = os.path.getsize(textFile)))
+      os.remove(textFile)
+   else:
+      records.append(skipped("parseText", particleCount, pointCount, "more than " + str(textMaxValues) + " values"))
+   
+   #  Load the binary file and touch every point so the time includes reading it
+   binaryFile = os.path.join(directory, "points.npy")
+   trajectory.savePoints(binaryFile, points)
+   records.append(result("loadBinary", particleCount, pointCount, timeIt(lambda: float(trajectory.loadPoints(binaryFile).sum()), repeat), bytes = os.path.getsize(binaryFile)))
+   os.remove(binaryFile)
+   
+   records.append(result("verifyPoints", particleCount, pointCount, timeIt(lambda: nbody.verifyPoints(points), repeat)))
+   
+   return(records)
+
+def graphBenchmarks(points, repeat):
+   '''Time the graph's paths.  The graph is made once and reused for every run.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              number of runs <int>
+      Output: records <list> [dict]'''
+   particleCount, axisCount, pointCount = points.shape
+   names = ["calculateColors", "initializeGraph", "getNextPoints", "updateGraph"]
+   
+   #  The GUI is only imported here so the rest runs without it
+   try:
+      os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+      from PyQt4 import QtGui
+      app = QtGui.QApplication.instance()
+      if(app == None): app = QtGui.QApplication([sys.argv[0]])
+      graph = nbody.Graph()
+   except Exception as error:
+      return([skipped(name, particleCount, pointCount, "GUI not available: " + str(error)) for name in names])
+   
+   records = []
+   
+   #  The colors of every particle's whole trail
+   particles = np.arange(particleCount)
+   indexes = np.arange(pointCount)
+   records.append(result("calculateColors", particleCount, pointCount, timeIt(lambda: graph.calculateColors(particles, indexes), repeat)))
+   
+   #  Set up the graph for the points
+   def initialize():
+      graph.points = points
+      graph.initializeGraph()
+   records.append(result("initializeGraph", particleCount, pointCount, timeIt(initialize, repeat)))
+   
+   #  The way the graph ended up drawing the plots
+   mode = "gpu" if graph.gpuAction.isChecked() else "batch" if graph.batchAction.isChecked() else "separate"
+   
+   #  Steady-state steps: step through the trails from the start, a step size that covers them in tickCount steps
+   graph.stepSizeSpinBox.setValue(max(1, pointCount // tickCount))
+   def steps(function):
+      graph.timeSlider.setValue(1)
+      for tick in range(tickCount):
+         function()
+         app.processEvents()
+   seconds = timeIt(lambda: steps(graph.getNextPoints), repeat)
+   records.append(result("getNextPoints", particleCount, pointCount, [second / tickCount for second in seconds], mode = mode))
+   seconds = timeIt(lambda: steps(graph.updateGraph), repeat)
+   records.append(result("updateGraph", particleCount, pointCount, [second / tickCount for second in seconds], mode = mode))
+   
+   return(records)
+
+def compare(records, baseline):
+   '''Print how long each benchmark took compared to a baseline run.
+      Input:  records <list> [dict],
+              baseline records <list> [dict]
+      Output: None'''
+   #  Match the benchmarks by name and size
+   previous = {(record["benchmark"], record["particles"], record["points"]): record for record in baseline if "min" in record}
+   print("")
+   print("%-18s %9s %9s %12s %12s %8s" % ("benchmark", "particles", "points", "baseline", "now", "ratio"))
+   for record in records:
+      key = (record["benchmark"], record["particles"], record["points"])
+      if("min" not in record or key not in previous): continue
+      before = previous[key]["min"]
+      print("%-18s %9d %9d %12.6f %12.6f %8.2f" % (key + (before, record["min"], record["min"] / max(before, 1e-12))))
+
+def revision():
+   '''Find the git revision of this code, if it is in a git repository.
+      Input:  None
+      Output: revision <str> or None'''
+   try:
+      return(subprocess.check_output(["git", "rev-parse", "HEAD"], cwd = os.path.dirname(os.path.abspath(__file__)), stderr = subprocess.DEVNULL).decode().strip())
+   except Exception:
+      return(None)
+
+def main():
+   '''Run the benchmarks given on the command line and write the results.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Benchmark the nBody graph's load, color and per-frame update paths.")
+   parser.add_argument("--particles", type = int, nargs = "+", default = [10, 100, 1000], help = "numbers of particles")
+   parser.add_argument("--points", type = int, nargs = "+", default = [1000, 10000, 100000], help = "numbers of points per particle")
+   parser.add_argument("--repeat", type = int, default = 3, help = "runs of each benchmark")
+   parser.add_argument("--output", default = "benchmark.json", help = "JSON file for the results")
+   parser.add_argument("--compare", default = None, help = "JSON file of an earlier run to compare against")
+   parser.add_argument("--no-gui", dest = "gui", action = "store_false", help = "skip the graph benchmarks")
+   args = parser.parse_args()
+   
+   records = importBenchmarks(args.repeat)
+   directory = tempfile.mkdtemp(prefix = "nbody-benchmark-")
+   try:
+      for particleCount in args.particles:
+         for pointCount in args.points:
+            print("Benchmarking " + str(particleCount) + " particles x " + str(pointCount) + " points...")
+            points = syntheticPoints(particleCount, pointCount)
+            records.extend(loadBenchmarks(points, directory, args.repeat))
+            if(args.gui == True): records.extend(graphBenchmarks(points, args.repeat))
+   finally:
+      os.rmdir(directory)
+   
+   #  Write the results along with what they were measured on
+   report = {"revision": revision(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+             "numpy": np.__version__, "platform": platform.platform(), "processor": platform.processor(), "results": records}
+   with open(args.output, "w") as WRITE:
+      json.dump(report, WRITE, indent = 1)
+   print("Wrote " + str(len(records)) + " results to " + args.output)
+   
+   #  Compare against an earlier run
+   if(args.compare != None):
+      with open(args.compare) as READ:
+         compare(records, json.load(READ)["results"])
+   
+   #  Importing nbody must stay free of the GUI
+   for record in records:
+      if(record["benchmark"] == "import nbody" and len(record.get("loaded", [])) > 0):
+         print("ERROR: importing nbody loaded " + ", ".join(record["loaded"]))
+         sys.exit(1)
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
@@ -0,0 +1,226 @@
+#  A bounding box index of where every particle is over time.
+#
+#  The time axis is split into chunks, and for every particle and chunk the index keeps the
+#  smallest and largest x, y and z the particle reached in that chunk.  It is worked out in a
+#  single pass over the points, a block of time at a time, so the points never have to be in
+#  memory all at once.  Questions about where particles are over a range of time (the size of
+#  the axes, fitting the camera to the trails, which trails are off the screen) are then
+#  answered from the index without reading the points again.
+#
+#  The index is small: when it would use more than maxBytes the chunks are merged in pairs.
+#  For binary points files it is saved next to the file (points.npy -> points.npy.bounds.npz) and
+#  reused the next time the file is loaded, as long as the file hasn't changed.
+#
+#  Example
+#     index = bounds.BoundsIndex(points)
+#     minimum, maximum = index.boxes(np.arange(len(points)), 0, 1000)     <-- Every particle's box over the first 1000 points
+
+import os
+import numpy as np
+import store
+
+#  The fewest points in a chunk
+minChunkSize = 64
+
+#  The most memory the index may use (in bytes)
+defaultMaxBytes = 16 * 1024 * 1024
+
+#  The number of bytes of points read at a time while building the index
+blockBytes = 64 * 1024 * 1024
+
+#  The corners of a box: which corners take the maximum of each axis [corner [x, y, z]]
+cornerMask = ((np.arange(8)[:, np.newaxis] >> np.arange(3)) & 1).astype(bool)
+
+class BoundsIndex(object):
+   '''Per-particle, per-chunk bounding boxes of the points.  Only finite values are counted;
+      a chunk with none has a box of NaN.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              number of points per chunk (picked from maxBytes if None) <int>,
+              most memory the index may use (in bytes) <int>,
+              function called with the fraction done after each block of points <function(fraction <float>)>
+      Output: None'''
+   def __init__(self, points, chunkSize = None, maxBytes = defaultMaxBytes, progress = None):
+      particleCount, axisCount, pointCount = points.shape
+      
+      #  The bytes used by a chunk of every particle (a minimum and maximum float32 per axis)
+      self.chunkBytes = max(1, particleCount) * 24
+      self.maxBytes = maxBytes
+      
+      #  If no chunk size was given, pick the smallest one whose index fits in maxBytes
+      if(chunkSize == None):
+         chunkSize = minChunkSize
+         while(-(-pointCount // chunkSize) * self.chunkBytes > maxBytes): chunkSize *= 2
+      self.chunkSize = int(chunkSize)
+      
+      #  The boxes [particle [chunk [x, y, z]]] and the number of points indexed
+      self.minimum = np.empty((particleCount, 0, 3), dtype = np.float32)
+      self.maximum = np.empty((particleCount, 0, 3), dtype = np.float32)
+      self.pointCount = 0
+      
+      self.update(points, progress)
+
+   def axisLimit(self):
+      '''Get the largest distance from the origin along any axis.
+         Input:  None
+         Output: limit <float>'''
+      if(self.minimum.size == 0 or np.isnan(self.minimum).all()): return(0.0)
+      return(float(max(abs(np.nanmin(self.minimum)), abs(np.nanmax(self.maximum)))))
+
+   def boxes(self, particles, start, stop):
+      '''Get each particle's box over a range of points.  The boxes cover whole chunks, so they
+         may be a little bigger than the range needs.
+         Input:  particle numbers <np.ndarray> [int],
+                 first point <int>,
+                 index after the last point <int>
+         Output: minimums <np.ndarray> [particle [x, y, z]],
+                 maximums <np.ndarray> [particle [x, y, z]]'''
+      #  The chunks the range touches
+      first = max(0, start // self.chunkSize)
+      last = min(self.minimum.shape[1], -(-stop // self.chunkSize))
+      if(last <= first):
+         empty = np.full((len(particles), 3), np.nan, dtype = np.float32)
+         return(empty, empty.copy())
+      
+      return(np.fmin.reduce(self.minimum[particles, first:last], axis = 1), np.fmax.reduce(self.maximum[particles, first:last], axis = 1))
+
+   def coarsen(self):
+      '''Merge the chunks in pairs, halving the memory used.'''
+      if(self.minimum.shape[1] > 0):
+         starts = np.arange(0, self.minimum.shape[1], 2)
+         self.minimum = np.fmin.reduceat(self.minimum, starts, axis = 1)
+         self.maximum = np.fmax.reduceat(self.maximum, starts, axis = 1)
+      self.chunkSize *= 2
+
+   def save(self, fileName):
+      '''Save the index.
+         Input:  file name <str>
+         Output: None'''
+      with open(fileName, "wb") as WRITE:
+         np.savez(WRITE, minimum = self.minimum, maximum = self.maximum, chunkSize = self.chunkSize, pointCount = self.pointCount)
+
+   def update(self, points, progress = None):
+      '''Index the points added since the index was last built or updated (the last chunk is
+         redone since it may have been only part full).
+         Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+                 function called with the fraction done after each block of points <function(fraction <float>)>
+         Output: None'''
+      #  Read points kept on the disk straight from their source so the working set isn't flushed
+      source = points.source if isinstance(points, store.ChunkedTrajectory) else points
+      pointCount = points.shape[2]
+      
+      #  Start again at the last (maybe part full) chunk
+      first = min(self.pointCount // self.chunkSize, self.minimum.shape[1])
+      chunkCount = -(-pointCount // self.chunkSize)
+      minimum = np.empty((len(self.minimum), chunkCount, 3), dtype = np.float32)
+      maximum = np.empty((len(self.minimum), chunkCount, 3), dtype = np.float32)
+      minimum[:, :first] = self.minimum[:, :first]
+      maximum[:, :first] = self.maximum[:, :first]
+      
+      #  A block holds a whole number of chunks (every point in time is chunkBytes bytes of float64 points)
+      blockChunks = max(1, blockBytes // (self.chunkBytes * self.chunkSize))
+      
+      #  Go through each block of time
+      for blockStart in range(first, chunkCount, blockChunks):
+         blockStop = min(blockStart + blockChunks, chunkCount)
+         block = np.asarray(source[:, :, blockStart * self.chunkSize:min(blockStop * self.chunkSize, pointCount)])
+         
+         #  The box of every chunk in the block (fmin and fmax skip NaN) [particle [chunk [x, y, z]]]
+         offsets = np.arange(0, block.shape[2], self.chunkSize)
+         with np.errstate(invalid = "ignore"):
+            blockMinimum = np.fmin.reduceat(block, offsets, axis = 2)
+            blockMaximum = np.fmax.reduceat(block, offsets, axis = 2)
+         blockMinimum[~np.isfinite(blockMinimum)] = np.nan
+         blockMaximum[~np.isfinite(blockMaximum)] = np.nan
+         
+         #  Round outwards when going to float32 so the boxes still hold every point
+         minimum[:, blockStart:blockStop] = np.nextafter(blockMinimum.astype(np.float32), np.float32(-np.inf)).transpose(0, 2, 1)
+         maximum[:, blockStart:blockStop] = np.nextafter(blockMaximum.astype(np.float32), np.float32(np.inf)).transpose(0, 2, 1)
+         
+         if(progress != None): progress(blockStop / max(1, chunkCount))
+      
+      self.minimum = minimum
+      self.maximum = maximum
+      self.pointCount = pointCount
+      
+      #  Merge chunks until the index fits in the memory allowed
+      while(self.minimum.shape[1] > 1 and self.minimum.shape[1] * self.chunkBytes > self.maxBytes): self.coarsen()
+
+   def visible(self, particles, stop, matrix):
+      '''Check which particles' trails (from the first point up to the given one) could be on
+         the screen.  A trail is off the screen if every corner of its box is outside the same
+         side of the view.
+         Input:  particle numbers <np.ndarray> [int],
+                 index after the last point <int>,
+                 projection times view matrix <np.ndarray> [row [column]]
+         Output: on screen flags <np.ndarray> [bool]'''
+      minimum, maximum = self.boxes(particles, 0, stop)
+      
+      #  Every corner of every box in clip space [particle [corner [x, y, z, w]]]
+      corners = np.where(cornerMask, maximum[:, np.newaxis, :], minimum[:, np.newaxis, :])
+      clip = np.dot(corners, matrix[:, :3].T) + matrix[:, 3]
+      
+      #  A box is off the screen if all of its corners are past the same clipping plane (boxes of
+      #  NaN are never past a plane, so they are kept)
+      w = clip[:, :, 3]
+      outside = np.zeros(len(particles), dtype = bool)
+      for axis in range(3):
+         outside |= (clip[:, :, axis] < -w).all(axis = 1) | (clip[:, :, axis] > w).all(axis = 1)
+      
+      return(~outside)
+
+def indexFileName(fileName):
+   '''Get the name of the file an index is saved to next to a points file.
+      Input:  points file name <str>
+      Output: index file name <str>'''
+   #  The whole name is kept so files that differ only in extension (points.npy and points.nbz)
+   #  don't share an index
+   return(fileName + ".bounds.npz")
+
+def loadIndex(fileName, points, modified = None):
+   '''Load the index saved next to a points file, if there is one that is newer than the points
+      and matches them.
+      Input:  points file name <str>,
+              array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              time the points last changed (the file's modification time if None) <float>
+      Output: index <BoundsIndex> or None'''
+   indexFile = indexFileName(fileName)
+   try:
+      if(modified == None): modified = os.path.getmtime(fileName)
+      if(os.path.getmtime(indexFile) < modified): return(None)
+      with np.load(indexFile, allow_pickle = False) as saved:
+         minimum = saved["minimum"]
+         maximum = saved["maximum"]
+         chunkSize = int(saved["chunkSize"])
+         pointCount = int(saved["pointCount"])
+   except Exception:
+      return(None)
+   
+   #  The index must match the points
+   if(pointCount != points.shape[2] or minimum.shape != maximum.shape or minimum.shape[:1] != points.shape[:1] or minimum.shape[1] != -(-pointCount // chunkSize)):
+      return(None)
+   
+   #  Make the index without reading the points
+   index = BoundsIndex(np.empty(points.shape[:2] + (0,)), chunkSize)
+   index.minimum = minimum.astype(np.float32)
+   index.maximum = maximum.astype(np.float32)
+   index.pointCount = pointCount
+   return(index)
+
+def indexFile(fileName, points, progress = None, modified = None):
+   '''Get the index of a points file, loading it from next to the file or building it (and
+      trying to save it there).
+      Input:  points file name <str>,
+              array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              function called with the fraction done after each block of points <function(fraction <float>)>,
+              time the points last changed (the file's modification time if None) <float>
+      Output: index <BoundsIndex>'''
+   index = loadIndex(fileName, points, modified)
+   if(index != None): return(index)
+   
+   index = BoundsIndex(points, progress = progress)
+   
+   #  The index is only a cache, so it doesn't matter if it can't be saved (such as in a read only directory)
+   try: index.save(indexFileName(fileName))
+   except Exception: pass
+   
+   return(index)
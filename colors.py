@@ -0,0 +1,49 @@
+#  The colors the nBody graph draws the particles with.
+#
+#  Every particle gets an entry of the palette (wrapping around when there are more particles
+#  than entries).  Each entry has two colors; a trail starts with color #1 and then the two
+#  colors take turns every colorRunLength points, so when they differ the trail is striped.
+#
+#  This module only needs numpy so the colors can be worked out without a GUI (see export.py).
+
+import numpy as np
+
+#  The alpha color value
+colorAlpha = 1.0
+
+#  A list of color codes to use when displaying plots.  There are two colors (RGBA) per entry.
+#  This is so when those two colors are different, the plot's colors will alternate.
+colorCodes = [((0.8, 0.0, 0.0, colorAlpha), (0.8, 0.0, 0.0, colorAlpha)),
+              ((0.0, 0.8, 0.0, colorAlpha), (0.0, 0.8, 0.0, colorAlpha)),
+              ((0.0, 0.0, 0.8, colorAlpha), (0.0, 0.0, 0.8, colorAlpha)),
+              ((0.8, 0.8, 0.0, colorAlpha), (0.8, 0.8, 0.0, colorAlpha)),
+              ((0.8, 0.0, 0.8, colorAlpha), (0.8, 0.0, 0.8, colorAlpha)),
+              ((0.0, 0.8, 0.8, colorAlpha), (0.0, 0.8, 0.8, colorAlpha)),
+              ((255/255.0, 140/255.0, 0/255.0, colorAlpha), (255/255.0, 140/255.0, 0/255.0, colorAlpha)),
+              ((219/255.0, 112/255.0, 147/255.0, colorAlpha), (219/255.0, 112/255.0, 147/255.0, colorAlpha)),
+              ((105/255.0, 105/255.0, 105/255.0, colorAlpha), (105/255.0, 105/255.0, 105/255.0, colorAlpha)),
+              ((106/255.0, 90/255.0, 205/255.0, colorAlpha), (106/255.0, 90/255.0, 205/255.0, colorAlpha))]
+
+#  The color codes as an array [palette entry [color #1 or #2 [red, green, blue, alpha]]]
+palette = np.array(colorCodes, dtype = np.float32)
+
+#  The number of points drawn before a plot switches to its other color
+colorRunLength = 50
+
+def calculateColors(particleNum, indexes, palette = palette, runLength = colorRunLength):
+   '''Calculate the colors of a particle's points.  The colors are worked out from the
+      particle's palette entry and the point indexes, so they only take up memory for the
+      points being drawn.  An array of particle numbers gives one row of colors per particle.
+      Input:  particle number <int or np.ndarray>,
+              point indexes <np.ndarray> [point index] or [particle [point index]],
+              palette <np.ndarray> [palette entry [color #1 or #2 [red, green, blue, alpha]]],
+              number of points before switching colors <int>
+      Output: new color components <2D np.array> [point <int> [red <float>, green <float>, blue <float>, alpha <float>]]'''
+   #  There are only 10 colors, so wrap around when >10 particles are plotted
+   number = np.expand_dims(np.asarray(particleNum) % len(palette), -1)
+   
+   #  The first point uses color #1, after which the two colors take turns every runLength points
+   alternate = ((np.asarray(indexes) + runLength - 1) // runLength) % 2
+   
+   #  Look up the colors in the palette
+   return(palette[number, alternate])
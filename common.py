@@ -0,0 +1,53 @@
+#  Helpers shared by nbody.py and gui.py.
+#
+#  nbody.py is run as a script, so gui.py can't import it without loading it a second time (once
+#  as __main__ and once as nbody).  Both modules import what they share from here instead, and
+#  nbody.py passes the names on (nbody.verifyPoints still works).
+#
+#  Example
+#     shown = common.parsePlotSelection("1-10, 25, 40-", 100)     <-- Plots 1 to 10, 25 and 40 to 100
+
+import re
+import numpy as np
+import store
+
+def verifyPoints(points):
+   '''Verify the points are valid.  It needs to be a 3D numpy array.  The 2nd
+      dimension needs to be exactly 3 in size.
+      Array format is: 1st dimension is the particle
+                       2nd dimension is the axes (X, Y, Z)
+                       3rd dimension is the position value
+      Input:  array of points <np.ndarray or store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]]
+      Output: True/False <bool>'''
+   #  If the points' type, shape and 2nd dimension size is correct, return True
+   if(isinstance(points, (np.ndarray, store.ChunkedTrajectory)) and len(points.shape) == 3 and points.shape[1] == 3): return(True)
+   #  Otherwise, return False
+   else: return(False)
+
+def parsePlotSelection(text, plotCount):
+   '''Turn a list of plot numbers and ranges (such as "1-10, 25, 40-") into shown flags.  Plot
+      numbers start at 1; ranges include both ends and may leave either end open.  Numbers past
+      the last plot are ignored.
+      Input:  selection text <str>,
+              number of plots <int>
+      Output: shown flags <np.ndarray> [bool]'''
+   shown = np.zeros(plotCount, dtype = bool)
+   
+   #  Go through each number or range
+   for part in re.split(r"[,\s]+", text.strip()):
+      if(part == ""): continue
+      match = re.fullmatch(r"(\d*)-(\d*)|(\d+)", part)
+      if(match == None or match.group(0) == "-"): raise(ValueError("\"" + part + "\" is not a plot number or range"))
+      
+      #  A single plot number
+      if(match.group(3) != None):
+         first = last = int(match.group(3))
+      #  A range, from the first plot and to the last plot if an end is left out
+      else:
+         first = int(match.group(1)) if match.group(1) != "" else 1
+         last = int(match.group(2)) if match.group(2) != "" else plotCount
+      
+      #  Set the whole range at once
+      shown[max(first, 1) - 1:last] = True
+   
+   return(shown)
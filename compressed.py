@@ -0,0 +1,354 @@
+#  A compressed file format for nBody points.
+#
+#  The points are split into chunks along the time (3rd) axis and every chunk is compressed on
+#  its own with a standard library codec (zlib or lzma).  An index of where every chunk starts
+#  is kept at the end of the file, so any range of time can be read by decompressing only the
+#  chunks it covers.  The chunks of a range are decompressed in parallel threads (zlib and lzma
+#  let other threads run while they work).
+#
+#  Before a chunk is compressed, every particle's trail along each axis is delta encoded:
+#     Quantized - with a tolerance, the positions are rounded to a grid of 2 * tolerance (so
+#                 no position is off by more than the tolerance) and the second differences
+#                 of the grid numbers are stored in the smallest integer type that holds them
+#     Lossless  - without a tolerance (or if a chunk has NaN/Inf or huge values), each float's
+#                 bits are XORed with the previous float's bits, which is exactly undone
+#  The bytes of the numbers are then shuffled (every first byte, then every second byte, ...),
+#  which puts the bytes that change slowly next to each other so the codec can find them.
+#
+#  File layout
+#     magic (8 bytes) | index offset (uint64) | chunk | chunk | ... | index (JSON)
+#
+#  Example
+#     compressed.savePoints("points.nbz", points, tolerance = 1e-6)
+#     source = compressed.CompressedTrajectory("points.nbz")
+#     block = source[:, :, 5000:6000]     <-- Only the chunks covering points 5000-5999 are read
+
+import os
+import json
+import lzma
+import struct
+import threading
+import zlib
+import concurrent.futures
+import numpy as np
+
+#  Every compressed points file starts with this magic string
+compressedMagic = b"\x93NBODYZ\x01"
+
+#  The number of points per chunk
+defaultChunkSize = 1024
+
+#  The codecs that can compress the chunks
+codecs = {"zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+          "lzma": (lambda data: lzma.compress(data, preset = 6), lzma.decompress)}
+
+#  The order of the differences taken of quantized positions
+quantizedOrder = 2
+
+#  Quantized grid numbers must stay well inside an int64
+quantizedLimit = 2.0 ** 60
+
+def isCompressedFile(fileName):
+   '''Check if the given file is a compressed points file by looking at its magic string.
+      Input:  file name <str>
+      Output: True/False <bool>'''
+   with open(fileName, "rb") as READ:
+      magic = READ.read(len(compressedMagic))
+   
+   return(magic == compressedMagic)
+
+def shuffleBytes(values):
+   '''Put the first byte of every number first, then every second byte, and so on.
+      Input:  numbers <np.ndarray>
+      Output: shuffled bytes <bytes>'''
+   return(np.ascontiguousarray(values).reshape(-1).view(np.uint8).reshape(-1, values.dtype.itemsize).T.tobytes())
+
+def unshuffleBytes(data, dtype, count):
+   '''Undo shuffleBytes.
+      Input:  shuffled bytes <bytes>,
+              type of the numbers <np.dtype>,
+              number of numbers <int>
+      Output: numbers <np.ndarray>'''
+   dtype = np.dtype(dtype)
+   return(np.frombuffer(data, dtype = np.uint8, count = count * dtype.itemsize).reshape(dtype.itemsize, count).T.copy().view(dtype).reshape(-1))
+
+def encodeChunk(chunk, tolerance, compress):
+   '''Delta encode and compress a chunk.
+      Input:  chunk <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              position tolerance (0 for lossless) <float>,
+              compress function <function(bytes)>
+      Output: compressed chunk <bytes>,
+              how the chunk was encoded <dict>'''
+   chunk = np.asarray(chunk, dtype = np.float64)
+   length = chunk.shape[2]
+   
+   #  Quantize if asked to and every position fits on the grid
+   if(tolerance > 0.0 and np.isfinite(chunk).all() and np.abs(chunk).max(initial = 0.0) / (2.0 * tolerance) < quantizedLimit):
+      grid = np.round(chunk / (2.0 * tolerance)).astype(np.int64)
+      
+      #  The first value of every difference before the last, then the last differences
+      order = min(quantizedOrder, length - 1)
+      heads = []
+      for level in range(order):
+         heads.append(grid[:, :, 0].copy())
+         grid = np.diff(grid, axis = 2)
+      
+      #  The smallest integer type that holds the differences
+      largest = int(np.abs(grid).max(initial = 0))
+      for dtype in [np.int8, np.int16, np.int32, np.int64]:
+         if(largest <= np.iinfo(dtype).max): break
+      
+      data = b"".join(shuffleBytes(head) for head in heads) + shuffleBytes(grid.astype(dtype))
+      return(compress(data), {"mode": "quantized", "order": order, "dtype": np.dtype(dtype).name})
+   
+   #  Otherwise, XOR the bits of every position with the previous position's bits
+   bits = chunk.view(np.uint64)
+   deltas = bits.copy()
+   deltas[:, :, 1:] ^= bits[:, :, :-1]
+   return(compress(shuffleBytes(deltas)), {"mode": "lossless"})
+
+def decodeChunk(data, encoding, shape, tolerance, decompress):
+   '''Decompress and decode a chunk.
+      Input:  compressed chunk <bytes>,
+              how the chunk was encoded <dict>,
+              shape of the chunk <tuple> (particles, 3, points),
+              position tolerance <float>,
+              decompress function <function(bytes)>
+      Output: chunk <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+   data = decompress(data)
+   particleCount, axisCount, length = shape
+   trails = particleCount * axisCount
+   
+   #  Add the differences back up, from the last differences to the grid numbers
+   if(encoding["mode"] == "quantized"):
+      order = encoding["order"]
+      heads = [unshuffleBytes(data[level * trails * 8:(level + 1) * trails * 8], np.int64, trails) for level in reversed(range(order))]
+      grid = unshuffleBytes(data[order * trails * 8:], encoding["dtype"], trails * (length - order)).astype(np.int64).reshape(trails, length - order)
+      for head in heads:
+         grid = np.concatenate([head[:, np.newaxis], grid], axis = 1)
+         np.cumsum(grid, axis = 1, out = grid)
+      return((grid * (2.0 * tolerance)).reshape(shape))
+   
+   #  Undo the XOR of every position with the previous one
+   deltas = unshuffleBytes(data, np.uint64, trails * length).reshape(shape)
+   return(np.bitwise_xor.accumulate(deltas, axis = 2).view(np.float64))
+
+class CompressedWriter(object):
+   '''Writes a compressed points file a block of time at a time, so the points never have to be
+      in memory all at once.  Close it (or use it in a with statement) to write the index.
+      Input:  file name <str>,
+              number of particles <int>,
+              position tolerance (0 for lossless) <float>,
+              codec name ("zlib" or "lzma") <str>,
+              number of points per chunk <int>
+      Output: None'''
+   def __init__(self, fileName, particleCount, tolerance = 0.0, codec = "zlib", chunkSize = defaultChunkSize):
+      if(codec not in codecs): raise(ValueError("Unknown codec " + repr(codec) + "; use one of " + ", ".join(sorted(codecs))))
+      self.particleCount = particleCount
+      self.tolerance = float(tolerance)
+      self.codec = codec
+      self.chunkSize = int(chunkSize)
+      
+      #  The chunks written and the points waiting to fill a chunk
+      self.chunks = []
+      self.pointCount = 0
+      self.pending = []
+      self.pendingCount = 0
+      
+      #  Write the magic string and leave room for the index offset
+      self.WRITE = open(fileName, "wb")
+      self.WRITE.write(compressedMagic + struct.pack("<Q", 0))
+
+   def __enter__(self):
+      return(self)
+
+   def __exit__(self, kind, value, traceback):
+      self.close()
+
+   def append(self, points):
+      '''Add points to the end of the file.
+         Input:  points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]
+         Output: None'''
+      points = np.asarray(points, dtype = np.float64)
+      if(points.ndim != 3 or points.shape[:2] != (self.particleCount, 3)):
+         raise(ValueError("The points must have the shape (" + str(self.particleCount) + ", 3, points)"))
+      self.pending.append(points)
+      self.pendingCount += points.shape[2]
+      
+      #  Write every full chunk
+      if(self.pendingCount >= self.chunkSize):
+         joined = np.concatenate(self.pending, axis = 2)
+         full = (self.pendingCount // self.chunkSize) * self.chunkSize
+         for start in range(0, full, self.chunkSize): self.writeChunk(joined[:, :, start:start + self.chunkSize])
+         self.pending = [joined[:, :, full:]]
+         self.pendingCount -= full
+
+   def close(self):
+      '''Write the last chunk and the index, and close the file.'''
+      if(self.WRITE == None): return()
+      try:
+         if(self.pendingCount > 0): self.writeChunk(np.concatenate(self.pending, axis = 2))
+         self.pending = []
+         self.pendingCount = 0
+         
+         #  Write the index at the end, then its offset at the start
+         offset = self.WRITE.tell()
+         index = {"particles": self.particleCount, "points": self.pointCount, "chunkSize": self.chunkSize,
+                  "codec": self.codec, "tolerance": self.tolerance, "chunks": self.chunks}
+         self.WRITE.write(json.dumps(index).encode("utf-8"))
+         self.WRITE.seek(len(compressedMagic))
+         self.WRITE.write(struct.pack("<Q", offset))
+      finally:
+         self.WRITE.close()
+         self.WRITE = None
+
+   def writeChunk(self, chunk):
+      '''Compress a chunk and write it.
+         Input:  chunk <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]
+         Output: None'''
+      data, encoding = encodeChunk(chunk, self.tolerance, codecs[self.codec][0])
+      encoding.update({"offset": self.WRITE.tell(), "length": len(data), "points": chunk.shape[2]})
+      self.WRITE.write(data)
+      self.chunks.append(encoding)
+      self.pointCount += chunk.shape[2]
+
+class CompressedTrajectory(object):
+   '''Reads the points in a compressed file.  It is indexed like the (particle, axis, time)
+      numpy array it stands in for, and can be the source of a store.ChunkedTrajectory.
+      The file and the decompression threads belong to the process that made them; a forked
+      process (such as a multiprocessing worker) opens its own the first time it reads.
+      Input:  file name <str>,
+              number of decompression threads (defaults to the number of cores) <int>
+      Output: None'''
+   def __init__(self, fileName, threads = None):
+      self.fileName = fileName
+      self.threads = threads
+      self.READ = open(fileName, "rb")
+      
+      #  Only one thread at a time may seek and read the file
+      self.lock = threading.Lock()
+      
+      #  Read the index
+      if(self.READ.read(len(compressedMagic)) != compressedMagic): raise(ValueError(fileName + " is not a compressed points file"))
+      offset = struct.unpack("<Q", self.READ.read(8))[0]
+      if(offset == 0): raise(ValueError(fileName + " was not finished"))
+      self.READ.seek(offset)
+      index = json.loads(self.READ.read().decode("utf-8"))
+      self.chunks = index["chunks"]
+      self.chunkSize = index["chunkSize"]
+      self.tolerance = index["tolerance"]
+      self.codec = index["codec"]
+      self.decompress = codecs[self.codec][1]
+      
+      #  The array attributes the graph uses
+      self.shape = (index["particles"], 3, index["points"])
+      self.ndim = 3
+      self.dtype = np.dtype(np.float64)
+      
+      #  The threads the chunks are decompressed in (started when first needed) and the process
+      #  the file and threads belong to
+      self.pool = None
+      self.process = os.getpid()
+
+   def __getstate__(self):
+      '''Get what is sent to another process (the file and threads aren't; it opens its own).
+         Input:  None
+         Output: state <dict>'''
+      state = self.__dict__.copy()
+      for key in ["READ", "lock", "pool"]: del state[key]
+      return(state)
+
+   def __setstate__(self, state):
+      '''Open the file again in the process the points were sent to.
+         Input:  state <dict>
+         Output: None'''
+      self.__dict__.update(state)
+      self.READ = open(self.fileName, "rb")
+      self.lock = threading.Lock()
+      self.pool = None
+      self.process = os.getpid()
+
+   def __len__(self):
+      '''The number of particles.
+         Input:  None
+         Output: number of particles <int>'''
+      return(self.shape[0])
+
+   def __getitem__(self, key):
+      '''Get points the same way a (particle, axis, time) numpy array is indexed.  Only the
+         chunks covering the time asked for are decompressed.
+         Input:  index <int, slice or tuple>
+         Output: points <np.ndarray>'''
+      #  Split the index into a particle, axis and time index
+      if(not isinstance(key, tuple)): key = (key,)
+      if(len(key) > 3): raise(IndexError("too many indices for the points"))
+      particleKey, axisKey, timeKey = key + (slice(None),) * (3 - len(key))
+      
+      #  The points in time asked for and the chunks that hold them
+      times = np.arange(self.shape[2])[timeKey]
+      if(np.size(times) == 0):
+         return(np.empty(self.shape[:2] + (0,), dtype = self.dtype)[particleKey, axisKey])
+      first = int(np.min(times)) // self.chunkSize
+      last = int(np.max(times)) // self.chunkSize
+      
+      #  Decompress the chunks in parallel and pick out the points
+      block = np.concatenate(list(self.getPool().map(self.readChunk, range(first, last + 1))), axis = 2)
+      return(block[:, :, times - first * self.chunkSize][particleKey, axisKey])
+
+   def checkProcess(self):
+      '''If this is a forked copy of the process that opened the file, open the file again and
+         drop the threads (a forked process has none of them, and shares the file's position
+         with its parent).'''
+      if(self.process == os.getpid()): return()
+      self.READ = open(self.fileName, "rb")
+      self.lock = threading.Lock()
+      self.pool = None
+      self.process = os.getpid()
+
+   def close(self):
+      '''Close the file and stop the threads.'''
+      if(self.pool != None and self.process == os.getpid()): self.pool.shutdown()
+      self.pool = None
+      self.READ.close()
+
+   def compressedSize(self):
+      '''The number of bytes the compressed chunks take.
+         Input:  None
+         Output: number of bytes <int>'''
+      return(sum(chunk["length"] for chunk in self.chunks))
+
+   def getPool(self):
+      '''Get the decompression threads, starting them if this process hasn't yet.
+         Input:  None
+         Output: thread pool <concurrent.futures.ThreadPoolExecutor>'''
+      self.checkProcess()
+      with self.lock:
+         if(self.pool == None): self.pool = concurrent.futures.ThreadPoolExecutor(self.threads or os.cpu_count() or 1)
+      return(self.pool)
+
+   def readChunk(self, chunkNum):
+      '''Read and decode a chunk.
+         Input:  chunk number <int>
+         Output: chunk <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+      chunk = self.chunks[chunkNum]
+      self.checkProcess()
+      
+      #  Read the compressed bytes (the decompression runs outside the lock)
+      with self.lock:
+         self.READ.seek(chunk["offset"])
+         data = self.READ.read(chunk["length"])
+      
+      return(decodeChunk(data, chunk, self.shape[:2] + (chunk["points"],), self.tolerance, self.decompress))
+
+def savePoints(fileName, points, tolerance = 0.0, codec = "zlib", chunkSize = defaultChunkSize):
+   '''Save the points to a compressed file.  The points are read a chunk at a time, so they can
+      be memory-mapped or chunked.
+      Input:  file name <str>,
+              array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              position tolerance (0 for lossless) <float>,
+              codec name ("zlib" or "lzma") <str>,
+              number of points per chunk <int>
+      Output: None'''
+   with CompressedWriter(fileName, points.shape[0], tolerance, codec, chunkSize) as writer:
+      for start in range(0, points.shape[2], chunkSize):
+         writer.append(points[:, :, start:start + chunkSize])
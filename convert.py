@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+#  Convert and validate nBody points files without the GUI.
+#
+#  Each file is read (text, binary or compressed), checked while it is read, and written in the
+#  binary (.npy) or compressed (.nbz) format.  Files are done in parallel, one per worker
+#  process.  Only numpy and the standard library are used (nbody.py doesn't load the GUI until it
+#  is asked for), so this runs on machines without PyQt4, pyqtgraph or a display.
+#
+#  The checks are:
+#     shape     - a 3 dimensional array of [particle [axis X, Y, Z [point]]] where every axis
+#                 has the same number of points (a file that fails is not converted)
+#     NaN/Inf   - positions that aren't finite (fail unless --allow-nonfinite is given)
+#     jumps     - steps between points that aren't finite, or are more than --jump-factor times
+#                 the particle's median step (reported; fail with --strict)
+#
+#  Example
+#     python3 convert.py runs/*.txt --format nbz --tolerance 1e-6 --workers 8
+#     python3 convert.py runs/ --validate-only
+
+import os
+import sys
+import argparse
+import multiprocessing
+import time
+import numpy as np
+import nbody
+import trajectory
+
+#  The extensions of the formats that can be written
+formatExtensions = {"npy": ".npy", "nbz": ".nbz"}
+
+#  The number of values checked at a time in files that are already in memory or on the disk
+checkBlockValues = 2 ** 24
+
+class Validator(object):
+   '''Checks the contents of points a block of particles at a time.
+      Input:  how many times the median step a step may be before it counts as a jump <float>
+      Output: None'''
+   def __init__(self, jumpFactor = 100.0):
+      self.jumpFactor = jumpFactor
+      
+      #  The number of particles checked and what was found
+      self.checked = 0
+      self.nan = 0
+      self.inf = 0
+      self.nonfiniteSteps = 0
+      self.jumps = 0
+      self.largestJump = 0.0
+      self.firstJump = None
+
+   def check(self, particles):
+      '''Check a block of particles.
+         Input:  particles <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]
+         Output: None'''
+      particles = np.asarray(particles, dtype = np.float64)
+      self.nan += int(np.count_nonzero(np.isnan(particles)))
+      self.inf += int(np.count_nonzero(np.isinf(particles)))
+      
+      #  The length of every step from one point to the next [particle [step]]
+      if(particles.shape[2] > 1):
+         with np.errstate(invalid = "ignore", over = "ignore"):
+            steps = np.sqrt((np.diff(particles, axis = 2) ** 2).sum(axis = 1))
+         finite = np.isfinite(steps)
+         self.nonfiniteSteps += int(np.count_nonzero(~finite))
+         
+         #  Steps much longer than the particle's typical (median) step
+         median = np.nanmedian(np.where(finite, steps, np.nan), axis = 1) if finite.any() else np.zeros(len(steps))
+         with np.errstate(invalid = "ignore"):
+            jumps = finite & (steps > self.jumpFactor * median[:, np.newaxis]) & (median[:, np.newaxis] > 0)
+         if(jumps.any()):
+            self.jumps += int(np.count_nonzero(jumps))
+            self.largestJump = max(self.largestJump, float(steps[jumps].max()))
+            if(self.firstJump == None):
+               particle, step = np.argwhere(jumps)[0]
+               self.firstJump = (self.checked + int(particle), int(step))
+      
+      self.checked += len(particles)
+
+   def problems(self, allowNonfinite = False, strict = False):
+      '''List what was found, split into errors (the file is rejected) and warnings.
+         Input:  allow NaN/Inf flag <bool>,
+                 jumps are errors flag <bool>
+         Output: errors <list> [str],
+                 warnings <list> [str]'''
+      errors = []
+      warnings = []
+      
+      #  Positions that aren't finite
+      if(self.nan + self.inf > 0):
+         message = str(self.nan) + " NaN and " + str(self.inf) + " Inf positions"
+         if(allowNonfinite == True): warnings.append(message)
+         else: errors.append(message)
+      
+      #  Steps that are too long
+      if(self.jumps > 0):
+         message = str(self.jumps) + " jumps over " + str(self.jumpFactor) + "x the median step (largest " + "%.6g" % self.largestJump + ", first at particle " + str(self.firstJump[0] + 1) + " point " + str(self.firstJump[1] + 1) + ")"
+         if(strict == True): errors.append(message)
+         else: warnings.append(message)
+      if(self.nonfiniteSteps > 0 and allowNonfinite == False and self.nan + self.inf == 0):
+         errors.append(str(self.nonfiniteSteps) + " steps too large to represent")
+      
+      return(errors, warnings)
+
+def outputName(fileName, outputFormat, outputDirectory = None):
+   '''Get the name a converted file is written to.
+      Input:  input file name <str>,
+              output format ("npy" or "nbz") <str>,
+              directory to write to (next to the input if None) <str>
+      Output: output file name <str>'''
+   base = os.path.splitext(os.path.basename(fileName))[0] + formatExtensions[outputFormat]
+   return(os.path.join(outputDirectory if outputDirectory != None else os.path.dirname(fileName), base))
+
+def convertFile(task):
+   '''Read, check and (unless only validating) convert a file.  Run in a worker process.
+      Input:  (file name <str>, options <dict>)
+      Output: record of the file <dict>'''
+   fileName, options = task
+   record = {"file": fileName, "output": None, "bytesIn": 0, "bytesOut": 0, "seconds": 0.0, "errors": [], "warnings": []}
+   begin = time.perf_counter()
+   try:
+      record["bytesIn"] = os.path.getsize(fileName)
+      validator = Validator(options["jumpFactor"])
+      
+      #  Text files are checked a particle at a time as they are parsed
+      if(trajectory.isTextFile(fileName) == True):
+         def progress(fraction, particles):
+            if(particles is not None and len(particles) > validator.checked): validator.check(particles[validator.checked:])
+         points = trajectory.loadTextPoints(fileName, progress = progress)
+      #  Other files are checked a block of particles at a time after they are opened
+      else:
+         points = trajectory.loadPoints(fileName)
+         if(nbody.verifyPoints(points) == False): raise(ValueError("The points must have the shape (particles, 3, points)"))
+      
+      #  Check the particles that haven't been checked yet
+      blockSize = max(1, checkBlockValues // max(1, 3 * points.shape[2]))
+      for start in range(validator.checked, points.shape[0], blockSize):
+         validator.check(points[start:start + blockSize])
+      
+      record["particles"], record["points"] = points.shape[0], points.shape[2]
+      record["errors"], record["warnings"] = validator.problems(options["allowNonfinite"], options["strict"])
+      
+      #  Write the converted file (to a temporary name first, so a failure doesn't leave half a file)
+      if(len(record["errors"]) == 0 and options["validateOnly"] == False):
+         output = outputName(fileName, options["format"], options["outputDirectory"])
+         if(os.path.exists(output) and options["overwrite"] == False):
+            record["warnings"].append("skipped; " + output + " exists (use --overwrite)")
+         else:
+            partial = os.path.splitext(output)[0] + ".partial" + formatExtensions[options["format"]]
+            trajectory.savePoints(partial, points, options["tolerance"], options["codec"])
+            os.replace(partial, output)
+            record["output"] = output
+            record["bytesOut"] = os.path.getsize(output)
+   except Exception as error:
+      record["errors"].append(str(error))
+   
+   record["seconds"] = time.perf_counter() - begin
+   return(record)
+
+def findFiles(paths):
+   '''Get the files to convert from files and directories (every .txt file under a directory).
+      Input:  file and directory names <list> [str]
+      Output: file names <list> [str]'''
+   files = []
+   for path in paths:
+      if(os.path.isdir(path)):
+         for directory, subdirectories, names in os.walk(path):
+            files.extend(os.path.join(directory, name) for name in sorted(names) if name.lower().endswith(".txt"))
+      else:
+         files.append(path)
+   return(files)
+
+def printRecord(record):
+   '''Print a line about a file, then its errors and warnings.
+      Input:  record of the file <dict>
+      Output: None'''
+   status = "FAILED" if len(record["errors"]) > 0 else "ok"
+   throughput = record["bytesIn"] / max(record["seconds"], 1e-9) / 1e6
+   line = "%-6s %8.2f s %8.1f MB/s  %s" % (status, record["seconds"], throughput, record["file"])
+   if(record["output"] != None): line += " -> " + record["output"] + " (%.1fx smaller)" % (record["bytesIn"] / max(1, record["bytesOut"]))
+   print(line)
+   for error in record["errors"]: print("          error:   " + error)
+   for warning in record["warnings"]: print("          warning: " + warning)
+   sys.stdout.flush()
+
+def main():
+   '''Convert and validate the files given on the command line.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Validate nBody points files and convert them to the binary or compressed format.")
+   parser.add_argument("paths", nargs = "+", help = "points files, or directories to search for .txt files")
+   parser.add_argument("--format", choices = sorted(formatExtensions), default = "nbz", help = "format to write (default: nbz)")
+   parser.add_argument("--tolerance", type = float, default = 0.0, help = "position tolerance of compressed files (default: 0, lossless)")
+   parser.add_argument("--codec", choices = ["zlib", "lzma"], default = "zlib", help = "codec of compressed files")
+   parser.add_argument("--output-dir", dest = "outputDirectory", default = None, help = "directory to write to (default: next to each input)")
+   parser.add_argument("--workers", type = int, default = None, help = "worker processes (default: the number of cores)")
+   parser.add_argument("--validate-only", dest = "validateOnly", action = "store_true", help = "only check the files")
+   parser.add_argument("--overwrite", action = "store_true", help = "replace existing output files")
+   parser.add_argument("--allow-nonfinite", dest = "allowNonfinite", action = "store_true", help = "accept NaN/Inf positions")
+   parser.add_argument("--jump-factor", dest = "jumpFactor", type = float, default = 100.0, help = "steps longer than this many median steps are jumps")
+   parser.add_argument("--strict", action = "store_true", help = "reject files with jumps")
+   args = parser.parse_args()
+   
+   files = findFiles(args.paths)
+   if(len(files) == 0):
+      print("No files to convert.")
+      sys.exit(1)
+   if(args.outputDirectory != None): os.makedirs(args.outputDirectory, exist_ok = True)
+   options = {key: getattr(args, key) for key in ["format", "tolerance", "codec", "outputDirectory", "validateOnly", "overwrite", "allowNonfinite", "jumpFactor", "strict"]}
+   
+   #  Do the files in parallel, printing each one as it finishes
+   begin = time.perf_counter()
+   records = []
+   workers = min(args.workers or multiprocessing.cpu_count(), len(files))
+   with multiprocessing.Pool(workers) as pool:
+      for record in pool.imap_unordered(convertFile, [(fileName, options) for fileName in files]):
+         printRecord(record)
+         records.append(record)
+   seconds = time.perf_counter() - begin
+   
+   #  Print the summary
+   failed = [record for record in records if len(record["errors"]) > 0]
+   bytesIn = sum(record["bytesIn"] for record in records)
+   bytesOut = sum(record["bytesOut"] for record in records)
+   print("")
+   print("Files:      %d (%d ok, %d failed, %d with warnings)" % (len(records), len(records) - len(failed), len(failed), sum(1 for record in records if len(record["warnings"]) > 0)))
+   print("Read:       %.1f MB in %.2f s (%.1f MB/s with %d workers)" % (bytesIn / 1e6, seconds, bytesIn / max(seconds, 1e-9) / 1e6, workers))
+   if(args.validateOnly == False): print("Written:    %.1f MB (%.1fx smaller)" % (bytesOut / 1e6, sum(record["bytesIn"] for record in records if record["output"] != None) / max(1, bytesOut)))
+   
+   if(len(failed) > 0): sys.exit(1)
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
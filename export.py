@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+
+#  Headless export of the nBody graph to PNG frames or a raw video stream.
+#
+#  Every frame shows the same scene the graph draws when its time slider is at a given value:
+#  the x, y and z axes and grids sized to the points, every particle's trail up to that point
+#  and its start and end markers, blended additively on a black background.  The frames are
+#  split into runs that are rendered by a pool of processes, so an export scales with the
+#  number of cores.
+#
+#  Two renderers are available:
+#     software - a numpy rasterizer that needs no display or OpenGL (the default)
+#     gl       - the graph itself rendered offscreen through OpenGL; this needs PyQt4,
+#                pyqtgraph and a working OpenGL context, and falls back to the software
+#                renderer if one can't be made
+#
+#  The software renderer keeps the camera still for the whole export, so each frame only adds
+#  the trail segments drawn since the frame before it.  A run of frames costs about as much as
+#  drawing its last frame once.
+#
+#  Example
+#     python3 export.py points.npy frames --step 50 --size 1280x720
+#     python3 export.py points.npy movie.rgb --format raw --size 1280x720
+#     python3 export.py "run/checkpoint-*.nbz" frames          <-- A run split into shards
+#     ffmpeg -f rawvideo -pix_fmt rgb24 -s 1280x720 -r 25 -i movie.rgb movie.mp4
+
+import sys
+import os
+import argparse
+import multiprocessing
+import struct
+import zlib
+import numpy as np
+import colors
+import trajectory
+import store
+import shards
+
+#  The color and width of the axes and grids (the same as the graph's)
+axisColors = np.array([[1.0, 0.0, 0.0, 0.4], [0.0, 1.0, 0.0, 0.4], [0.0, 0.0, 1.0, 0.4]], dtype = np.float32)
+axisWidth = 3
+gridColor = np.array([1.0, 1.0, 1.0, 0.3], dtype = np.float32)
+gridWidth = 1
+
+#  The width of the trails and the size of the start and end markers (in pixels)
+trailWidth = 2
+startSize = 7.0
+endSize = 10.0
+
+#  The most line samples drawn at a time (keeps the temporary arrays small)
+sampleBlockSize = 4 * 1024 * 1024
+
+#  Set in each worker process by initializeWorker
+workerRenderer = None
+
+def axisLimitOf(points):
+   '''Work out how far the axes and grids reach, the same way the graph does (the largest
+      absolute value plus 20%).
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]
+      Output: axis limit <float>'''
+   return(max(abs(float(points.max())), abs(float(points.min()))) * 1.20)
+
+def frameValues(start, stop, step):
+   '''List the time slider values of the frames, the same way playback steps through them
+      (the last value is always included).
+      Input:  first slider value <int>,
+              last slider value <int>,
+              step size <int>
+      Output: slider values <list> [int]'''
+   values = list(range(start, stop, max(1, step)))
+   return(values + [stop])
+
+def writePng(fileName, image):
+   '''Write an image to a PNG file (8 bit RGB, no extra packages needed).
+      Input:  file name <str>,
+              image <np.ndarray> [row [column [red, green, blue <uint8>]]]
+      Output: None'''
+   height, width = image.shape[:2]
+   
+   #  Every row starts with a filter type of 0 (none)
+   rows = np.concatenate([np.zeros((height, 1), dtype = np.uint8), image.reshape(height, -1)], axis = 1)
+
+   def chunk(kind, data):
+      return(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+   
+   with open(fileName, "wb") as WRITE:
+      WRITE.write(b"\x89PNG\r\n\x1a\n")
+      WRITE.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+      WRITE.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+      WRITE.write(chunk(b"IEND", b""))
+
+class Camera(object):
+   '''A camera placed the same way as a pyqtgraph GLViewWidget's (orbiting the center at a
+      distance, elevation and azimuth, with a horizontal field of view).
+      Input:  image width <int>,
+              image height <int>,
+              distance from the center <float>,
+              elevation (in degrees) <float>,
+              azimuth (in degrees) <float>,
+              horizontal field of view (in degrees) <float>
+      Output: None'''
+   def __init__(self, width, height, distance, elevation = 30.0, azimuth = 45.0, fov = 60.0):
+      self.width = width
+      self.height = height
+      self.distance = distance
+      self.elevation = elevation
+      self.azimuth = azimuth
+      self.fov = fov
+      
+      #  Move the world in front of the camera: turn it by the azimuth and elevation, then push it
+      #  back by the distance
+      azimuthTurn = np.radians(-(azimuth + 90.0))
+      elevationTurn = np.radians(elevation - 90.0)
+      turnZ = np.array([[np.cos(azimuthTurn), -np.sin(azimuthTurn), 0.0], [np.sin(azimuthTurn), np.cos(azimuthTurn), 0.0], [0.0, 0.0, 1.0]])
+      turnX = np.array([[1.0, 0.0, 0.0], [0.0, np.cos(elevationTurn), -np.sin(elevationTurn)], [0.0, np.sin(elevationTurn), np.cos(elevationTurn)]])
+      self.rotation = np.dot(turnX, turnZ)
+      
+      #  Points closer than this to the camera aren't drawn
+      self.nearClip = distance * 0.001
+      
+      #  The half width of the view one unit in front of the camera
+      self.halfWidth = np.tan(np.radians(fov) / 2.0)
+
+   def project(self, positions):
+      '''Project points onto the image.
+         Input:  points <np.ndarray> [..., [x, y, z]]
+         Output: pixel positions <np.ndarray> [..., [column, row]],
+                 in front of the camera flags <np.ndarray> [..., bool]'''
+      #  The points relative to the camera
+      eye = np.dot(positions, self.rotation.T)
+      depth = self.distance - eye[..., 2]
+      front = depth > self.nearClip
+      depth = np.where(front, depth, 1.0)
+      
+      #  Perspective divide, then scale to pixels (the vertical view keeps the aspect ratio)
+      column = (eye[..., 0] / (depth * self.halfWidth) + 1.0) * 0.5 * self.width
+      row = (1.0 - eye[..., 1] / (depth * self.halfWidth * self.height / self.width)) * 0.5 * self.height
+      
+      return(np.stack([column, row], axis = -1).astype(np.float32), front)
+
+class SoftwareRenderer(object):
+   '''Draws the graph's scene with numpy.  The segments are sampled about once per pixel and
+      added into a floating point image, which is the same as OpenGL's additive blending.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              camera <Camera>
+      Output: None'''
+   def __init__(self, points, camera):
+      self.points = points
+      self.camera = camera
+      self.width = camera.width
+      self.height = camera.height
+      
+      #  The axes and grids don't change, so draw them once
+      self.background = np.zeros((self.height * self.width, 3), dtype = np.float32)
+      self.drawAxes(self.background, axisLimitOf(points))
+      
+      #  The trails drawn so far and the slider value they were drawn up to
+      self.trails = np.zeros_like(self.background)
+      self.value = 0
+
+   def drawAxes(self, image, axisLimit):
+      '''Draw the x, y and z axes and grids.  The grids have 20 squares along each side and are
+         scaled like the graph's.
+         Input:  image <np.ndarray> [pixel [red, green, blue]],
+                 axis limit <float>
+         Output: None'''
+      #  The axes reach from -limit to +limit along each direction
+      limit = float(int(axisLimit))
+      for axis in range(3):
+         ends = np.zeros((2, 3))
+         ends[:, axis] = [-limit, limit]
+         self.drawSegments(image, ends[:1], ends[1:], axisColors[axis:axis + 1], axisWidth)
+      
+      #  Each grid lies in the plane across its axis
+      lines = np.linspace(-limit, limit, 21)
+      for axis in range(3):
+         across, along = [other for other in range(3) if other != axis]
+         for first, second in [(across, along), (along, across)]:
+            starts = np.zeros((len(lines), 3))
+            ends = np.zeros((len(lines), 3))
+            starts[:, first] = lines
+            ends[:, first] = lines
+            starts[:, second] = -limit
+            ends[:, second] = limit
+            self.drawSegments(image, starts, ends, np.broadcast_to(gridColor, (len(lines), 4)), gridWidth)
+
+   def drawMarkers(self, image, positions, spotColors, size):
+      '''Draw round markers.
+         Input:  image <np.ndarray> [pixel [red, green, blue]],
+                 positions <np.ndarray> [marker [x, y, z]],
+                 spotColors <np.ndarray> [marker [red, green, blue, alpha]],
+                 marker size (in pixels) <float>
+         Output: None'''
+      #  The pixels covered by a marker centered on the origin
+      radius = size / 2.0
+      reach = int(np.ceil(radius))
+      columns, rows = np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1))
+      inside = columns ** 2 + rows ** 2 <= radius ** 2
+      offsets = np.stack([columns[inside], rows[inside]], axis = 1)
+      
+      #  Put the stencil on every marker in front of the camera
+      pixels, front = self.camera.project(positions)
+      pixels = np.round(pixels[front]).astype(np.int64)
+      spotColors = spotColors[front]
+      covered = pixels[:, np.newaxis, :] + offsets[np.newaxis, :, :]
+      self.splat(image, covered.reshape(-1, 2), np.repeat(spotColors, len(offsets), axis = 0))
+
+   def drawSegments(self, image, starts, ends, spotColors, width):
+      '''Draw line segments, each in the color of its first point.
+         Input:  image <np.ndarray> [pixel [red, green, blue]],
+                 first points <np.ndarray> [segment [x, y, z]],
+                 last points <np.ndarray> [segment [x, y, z]],
+                 spotColors <np.ndarray> [segment [red, green, blue, alpha]],
+                 line width (in pixels) <int>
+         Output: None'''
+      #  Project the segments and drop any that reach behind the camera
+      first, firstFront = self.camera.project(starts)
+      last, lastFront = self.camera.project(ends)
+      front = firstFront & lastFront
+      first = first[front]
+      last = last[front]
+      spotColors = spotColors[front]
+      
+      #  Drop the segments that are completely off the image
+      low = np.minimum(first, last)
+      high = np.maximum(first, last)
+      shown = (high[:, 0] >= -width) & (low[:, 0] <= self.width + width) & (high[:, 1] >= -width) & (low[:, 1] <= self.height + width)
+      first = first[shown]
+      last = last[shown]
+      spotColors = spotColors[shown]
+      
+      #  Sample each segment about once per pixel along its longer side
+      delta = last - first
+      sampleCounts = np.maximum(1, np.ceil(np.abs(delta).max(axis = 1)).astype(np.int64))
+      
+      #  Widen each line across its shorter side
+      acrossRows = np.abs(delta[:, 0]) >= np.abs(delta[:, 1])
+      offsets = np.arange(width) - (width - 1) // 2
+      
+      #  Draw a block of segments at a time so the samples fit in memory
+      ends = np.cumsum(sampleCounts)
+      begin = 0
+      while(begin < len(sampleCounts)):
+         end = int(np.searchsorted(ends, ends[begin] - sampleCounts[begin] + sampleBlockSize, side = "right"))
+         end = max(end, begin + 1)
+         
+         #  The position of every sample along its segment (0 at the first point)
+         counts = sampleCounts[begin:end]
+         owners = np.repeat(np.arange(begin, end), counts)
+         steps = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+         fraction = (steps / counts.repeat(counts))[:, np.newaxis]
+         samples = first[owners] + delta[owners] * fraction
+         
+         #  Add each sample once for every pixel of the line's width
+         for offset in offsets:
+            shift = np.zeros_like(samples)
+            shift[:, 1] = np.where(acrossRows[owners], offset, 0)
+            shift[:, 0] = np.where(acrossRows[owners], 0, offset)
+            self.splat(image, np.floor(samples + shift).astype(np.int64), spotColors[owners])
+         
+         begin = end
+
+   def render(self, value):
+      '''Render the frame for a time slider value.  If the value is past the last one rendered,
+         only the new part of the trails is drawn.
+         Input:  time slider value <int>
+         Output: image <np.ndarray> [row [column [red, green, blue <uint8>]]]'''
+      #  Start over if time went backwards
+      if(value < self.value):
+         self.trails[:] = 0
+         self.value = 0
+      
+      #  Draw the segments between the last value drawn and this one, a block of particles at a time
+      first = max(0, self.value - 1)
+      if(value - first > 1):
+         particleCount = self.points.shape[0]
+         blockSize = max(1, sampleBlockSize // (value - first))
+         for start in range(0, particleCount, blockSize):
+            particles = np.arange(start, min(start + blockSize, particleCount))
+            trails = np.transpose(self.points[particles, :, first:value], (0, 2, 1)).astype(np.float32)
+            segmentColors = colors.calculateColors(particles, np.arange(first, value - 1))
+            self.drawSegments(self.trails, trails[:, :-1].reshape(-1, 3), trails[:, 1:].reshape(-1, 3), segmentColors.reshape(-1, 4), trailWidth)
+      self.value = value
+      
+      #  The markers move every frame, so they are drawn on a copy
+      image = self.background + self.trails
+      particles = np.arange(self.points.shape[0])
+      self.drawMarkers(image, np.asarray(self.points[:, :, 0], dtype = np.float32), colors.calculateColors(particles, np.zeros(1, dtype = int))[:, 0], startSize)
+      self.drawMarkers(image, np.asarray(self.points[:, :, value - 1], dtype = np.float32), colors.calculateColors(particles, np.full(1, value - 1))[:, 0], endSize)
+      
+      #  Clamp the colors like the frame buffer does
+      return(np.round(np.clip(image, 0.0, 1.0) * 255).astype(np.uint8).reshape(self.height, self.width, 3))
+
+   def splat(self, image, pixels, spotColors):
+      '''Add colors to pixels, skipping the pixels off the image.
+         Input:  image <np.ndarray> [pixel [red, green, blue]],
+                 pixel positions <np.ndarray> [sample [column, row]],
+                 spotColors <np.ndarray> [sample [red, green, blue, alpha]]
+         Output: None'''
+      #  Keep the pixels on the image
+      inside = (pixels[:, 0] >= 0) & (pixels[:, 0] < self.width) & (pixels[:, 1] >= 0) & (pixels[:, 1] < self.height)
+      index = pixels[inside, 1] * self.width + pixels[inside, 0]
+      spotColors = spotColors[inside]
+      
+      #  Additive blending weighs each color by its alpha
+      for channel in range(3):
+         image[:, channel] += np.bincount(index, weights = spotColors[:, channel] * spotColors[:, 3], minlength = len(image)).astype(np.float32)
+
+class GLRenderer(object):
+   '''Renders the graph itself offscreen through OpenGL.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              camera <Camera>
+      Output: None'''
+   def __init__(self, points, camera):
+      #  The GUI is only imported when it is used
+      from PyQt4 import QtGui
+      import nbody
+      
+      #  A graph needs an application, but it is never shown
+      self.app = QtGui.QApplication.instance()
+      if(self.app == None): self.app = QtGui.QApplication([])
+      self.graph = nbody.Graph(points)
+      self.camera = camera
+      
+      #  Size the view and place its camera
+      self.graph.view.resize(camera.width, camera.height)
+      self.graph.view.setCameraPosition(distance = camera.distance, elevation = camera.elevation, azimuth = camera.azimuth)
+      self.graph.view.opts["fov"] = camera.fov
+      
+      #  Make the OpenGL context and set up the items
+      self.graph.view.glInit()
+
+   def render(self, value):
+      '''Render the frame for a time slider value.
+         Input:  time slider value <int>
+         Output: image <np.ndarray> [row [column [red, green, blue <uint8>]]]'''
+      #  Move the slider, which sets the plots' points
+      self.graph.timeSlider.setValue(value)
+      
+      #  Render into an offscreen buffer [column [row (bottom up) [blue, green, red, alpha]]]
+      image = self.graph.view.renderToArray((self.camera.width, self.camera.height))
+      return(np.ascontiguousarray(np.transpose(image, (1, 0, 2))[::-1, :, 2::-1]))
+
+def initializeWorker(source, camera, rendererName):
+   '''Load the points and create the renderer in a worker process.
+      Input:  file name, shard names or pattern <str or list> or array of points <np.ndarray>,
+              camera <Camera>,
+              renderer name <str>
+      Output: None'''
+   global workerRenderer
+   
+   #  Binary files are memory-mapped and compressed files opened again in each worker; text files
+   #  were parsed once and passed in
+   points = source
+   if(isinstance(source, (str, list, tuple))): points = trajectory.loadPoints(source)
+   
+   #  Use OpenGL if asked, falling back to the software renderer
+   if(rendererName == "gl"):
+      try:
+         workerRenderer = GLRenderer(points, camera)
+         return()
+      except Exception as error:
+         sys.stderr.write("OpenGL rendering is not available (" + str(error) + "); using the software renderer\n")
+   
+   workerRenderer = SoftwareRenderer(points, camera)
+
+def renderRun(task):
+   '''Render a run of frames and write them out.
+      Input:  (frame numbers <list> [int], slider values <list> [int], output name <str>, output format <str>)
+      Output: number of frames written <int>'''
+   frameNums, values, output, outputFormat = task
+   
+   #  Raw frames are written into their place in the video file
+   if(outputFormat == "raw"): WRITE = open(output, "r+b")
+   try:
+      for frameNum, value in zip(frameNums, values):
+         image = workerRenderer.render(value)
+         if(outputFormat == "raw"):
+            WRITE.seek(frameNum * image.nbytes)
+            WRITE.write(image.tobytes())
+         else:
+            writePng(os.path.join(output, "frame_%06d.png" % frameNum), image)
+   finally:
+      if(outputFormat == "raw"): WRITE.close()
+   
+   return(len(frameNums))
+
+def exportFrames(pointsFile, output, start = 1, stop = None, step = 50, width = 800, height = 600, outputFormat = "png",
+                 renderer = "software", workers = None, distance = None, elevation = 30.0, azimuth = 45.0, progress = None):
+   '''Render the graph for a range of time slider values and write the frames.
+      Input:  points file name, shard manifest or pattern <str> or shard file names <list> [str],
+              output directory (png) or file (raw) <str>,
+              first slider value <int>,
+              last slider value (defaults to the number of points) <int>,
+              step size <int>,
+              image width <int>,
+              image height <int>,
+              output format ("png" or "raw") <str>,
+              renderer ("software" or "gl") <str>,
+              number of worker processes (defaults to the number of cores) <int>,
+              camera distance (defaults to fitting the axes) <float>,
+              camera elevation (in degrees) <float>,
+              camera azimuth (in degrees) <float>,
+              function called with the number of frames written and the total <function(done <int>, total <int>)>
+      Output: number of frames written <int>'''
+   #  Load the points (binary files are memory-mapped, text files are parsed)
+   points = trajectory.loadPoints(pointsFile)
+   if(len(points.shape) != 3 or points.shape[1] != 3): raise(ValueError("The points must be a 3 dimensional array"))
+   
+   #  The slider values to render
+   if(stop == None): stop = points.shape[2]
+   start = max(1, min(start, points.shape[2]))
+   stop = max(start, min(stop, points.shape[2]))
+   values = frameValues(start, stop, step)
+   
+   #  Place the camera so the axes fit in the view unless told otherwise
+   if(distance == None): distance = 3.0 * max(axisLimitOf(points), 1e-12)
+   camera = Camera(width, height, distance, elevation, azimuth)
+   
+   #  Make room for the frames
+   if(outputFormat == "raw"):
+      with open(output, "wb") as WRITE:
+         WRITE.truncate(len(values) * width * height * 3)
+   elif(not os.path.isdir(output)):
+      os.makedirs(output)
+   
+   #  Split the frames into runs, a few per worker so the workers stay busy until the end
+   if(workers == None): workers = multiprocessing.cpu_count()
+   runCount = max(1, min(len(values), workers * 2))
+   runs = np.array_split(np.arange(len(values)), runCount)
+   tasks = [(list(run), [values[frameNum] for frameNum in run], output, outputFormat) for run in runs if len(run) > 0]
+   
+   #  Binary and compressed files and shards are opened by each worker instead of being copied to
+   #  it, and the files opened here are closed first (an open compressed file's reader threads
+   #  don't survive being forked)
+   if(shards.isShardName(pointsFile) or trajectory.isTextFile(pointsFile) == False):
+      source = pointsFile
+      reader = points.source if isinstance(points, store.ChunkedTrajectory) else points
+      if(hasattr(reader, "close")): reader.close()
+   else:
+      source = points
+   
+   #  Render the runs in parallel
+   done = 0
+   if(workers <= 1):
+      initializeWorker(source, camera, renderer)
+      results = map(renderRun, tasks)
+   else:
+      pool = multiprocessing.Pool(workers, initializer = initializeWorker, initargs = (source, camera, renderer))
+      results = pool.imap_unordered(renderRun, tasks)
+   try:
+      for count in results:
+         done += count
+         if(progress != None): progress(done, len(values))
+   finally:
+      if(workers > 1):
+         pool.close()
+         pool.join()
+   
+   return(done)
+
+def main():
+   '''Export the frames given on the command line.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Render nBody points to PNG frames or a raw RGB video stream without a display.")
+   parser.add_argument("points", help = "points file (text, binary or compressed), shard manifest or quoted pattern")
+   parser.add_argument("output", help = "output directory (png) or file (raw)")
+   parser.add_argument("--start", type = int, default = 1, help = "first time slider value")
+   parser.add_argument("--stop", type = int, default = None, help = "last time slider value (default: the number of points)")
+   parser.add_argument("--step", type = int, default = 50, help = "time slider step between frames")
+   parser.add_argument("--size", default = "800x600", help = "image size as WIDTHxHEIGHT")
+   parser.add_argument("--format", dest = "outputFormat", choices = ["png", "raw"], default = "png", help = "write PNG frames or raw RGB24 frames")
+   parser.add_argument("--renderer", choices = ["software", "gl"], default = "software", help = "how the frames are drawn")
+   parser.add_argument("--workers", type = int, default = None, help = "number of worker processes (default: the number of cores)")
+   parser.add_argument("--distance", type = float, default = None, help = "camera distance (default: fit the axes)")
+   parser.add_argument("--elevation", type = float, default = 30.0, help = "camera elevation in degrees")
+   parser.add_argument("--azimuth", type = float, default = 45.0, help = "camera azimuth in degrees")
+   args = parser.parse_args()
+   
+   #  Split the image size
+   width, height = [int(size) for size in args.size.lower().split("x")]
+   
+   #  Show how many frames are done
+   def progress(done, total):
+      sys.stdout.write("\rExported " + str(done) + " of " + str(total) + " frames")
+      sys.stdout.flush()
+   
+   try:
+      count = exportFrames(args.points, args.output, args.start, args.stop, args.step, width, height, args.outputFormat,
+                           args.renderer, args.workers, args.distance, args.elevation, args.azimuth, progress)
+   except Exception as error:
+      print("ERROR exporting the frames.\n")
+      print("   Error Message: " + str(error))
+      sys.exit(1)
+   print("")
+   
+   #  Raw frames need the size to be read back
+   if(args.outputFormat == "raw"):
+      print("Wrote " + str(count) + " raw RGB24 frames; encode them with")
+      print("   ffmpeg -f rawvideo -pix_fmt rgb24 -s " + str(width) + "x" + str(height) + " -r 25 -i " + args.output + " movie.mp4")
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
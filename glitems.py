@@ -0,0 +1,160 @@
+#  OpenGL graph items used by the nBody graph.
+#
+#  TrajectoryItem keeps every particle's trail in vertex buffers on the GPU.  The points and their
+#  colors are uploaded once; moving through time only changes how many of each trail's points are
+#  drawn, so almost nothing is sent to the GPU while the graph is playing.
+#
+#  TimedViewWidget is a GLViewWidget that reports how long each paint takes.
+
+import time
+from OpenGL.GL import *
+from OpenGL.arrays import vbo
+from pyqtgraph.opengl import GLViewWidget
+from pyqtgraph.opengl.GLGraphicsItem import GLGraphicsItem
+import numpy as np
+
+class TimedViewWidget(GLViewWidget):
+   '''A 3D view that calls a function with the seconds each paint took.  When waitForPaint is
+      set, the time includes waiting for the GPU to finish drawing.
+      Input:  function called after every paint <function(seconds <float>)>
+      Output: None'''
+   def __init__(self, paintTimed = None):
+      #  Initialize the parent
+      GLViewWidget.__init__(self)
+      
+      #  The function told how long each paint took and whether to wait for the GPU
+      self.paintTimed = paintTimed
+      self.waitForPaint = False
+
+   def paintGL(self, *args, **kwds):
+      '''Paint the view and report how long it took.'''
+      begin = time.perf_counter()
+      GLViewWidget.paintGL(self, *args, **kwds)
+      
+      #  Wait for the GPU so the time covers the drawing, not just issuing the commands
+      if(self.waitForPaint == True): glFinish()
+      
+      if(self.paintTimed != None): self.paintTimed(time.perf_counter() - begin)
+
+class TrajectoryItem(GLGraphicsItem):
+   '''Draws every particle's trail and its start/end markers straight from GPU vertex buffers.
+      Input:  line width <float>,
+              start marker size (in pixels) <float>,
+              end marker size (in pixels) <float>
+      Output: None'''
+   def __init__(self, width = 2.0, startSize = 7.0, endSize = 10.0):
+      #  Initialize the parent
+      GLGraphicsItem.__init__(self)
+      
+      #  Blend the trails the same way the line plots do
+      self.setGLOptions("additive")
+      
+      #  The line width and marker sizes
+      self.width = width
+      self.startSize = startSize
+      self.endSize = endSize
+      
+      #  The vertex buffers for the points and colors (created when the trails are set)
+      self.positionBuffer = None
+      self.colorBuffer = None
+      
+      #  The number of points in each trail
+      self.pointCount = 0
+      
+      #  The index of the first vertex of each shown trail
+      self.firsts = np.zeros(0, dtype = np.int32)
+      
+      #  The range of points drawn for each trail
+      self.start = 0
+      self.stop = 0
+
+   def paint(self):
+      '''Draw the shown trails and markers for the current range of points.'''
+      #  If there is nothing to draw, return
+      if(self.positionBuffer == None or len(self.firsts) == 0 or self.stop <= self.start): return()
+      
+      #  Set up the blending options
+      self.setupGLState()
+      
+      #  The number of trails drawn and the number of points drawn for each
+      drawCount = len(self.firsts)
+      counts = np.full(drawCount, self.stop - self.start, dtype = np.int32)
+      ones = np.ones(drawCount, dtype = np.int32)
+      
+      #  Read the points and colors from the vertex buffers
+      glEnableClientState(GL_VERTEX_ARRAY)
+      glEnableClientState(GL_COLOR_ARRAY)
+      try:
+         self.positionBuffer.bind()
+         glVertexPointer(3, GL_FLOAT, 0, self.positionBuffer)
+         self.colorBuffer.bind()
+         glColorPointer(4, GL_UNSIGNED_BYTE, 0, self.colorBuffer)
+         
+         #  Draw every trail as a line strip with one call
+         if(self.stop - self.start > 1):
+            glLineWidth(self.width)
+            glMultiDrawArrays(GL_LINE_STRIP, self.firsts + self.start, counts, drawCount)
+         
+         #  Draw round start and end markers
+         glEnable(GL_POINT_SMOOTH)
+         glPointSize(self.startSize)
+         glMultiDrawArrays(GL_POINTS, self.firsts + self.start, ones, drawCount)
+         glPointSize(self.endSize)
+         glMultiDrawArrays(GL_POINTS, self.firsts + self.stop - 1, ones, drawCount)
+      finally:
+         self.colorBuffer.unbind()
+         self.positionBuffer.unbind()
+         glDisableClientState(GL_COLOR_ARRAY)
+         glDisableClientState(GL_VERTEX_ARRAY)
+
+   def setDrawRange(self, stop, start = 0):
+      '''Set the range of points drawn for every trail.  Nothing is uploaded to the GPU.
+         Input:  index after the last point drawn <int>,
+                 index of the first point drawn <int>
+         Output: None'''
+      #  Keep the range inside the trails
+      self.start = max(0, min(start, self.pointCount))
+      self.stop = max(self.start, min(stop, self.pointCount))
+      
+      #  Redraw the item
+      self.update()
+
+   def setTrajectories(self, points, colorFunction, renderPoints = None):
+      '''Upload every particle's points and colors to the GPU.  This is only done when new
+         points are loaded.  If the points are also given in the render layout, it is uploaded
+         as it is.
+         Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+                 function giving the colors of particles' points <function(particle numbers, point indexes)>,
+                 render layout <np.ndarray> [particle [point [x, y, z <np.float32>]]]
+         Output: None'''
+      #  The number of particles and the number of points in each trail
+      particleCount, axisCount, self.pointCount = points.shape
+      
+      #  The points and colors laid out trail after trail [vertex [x, y, z]], [vertex [red, green, blue, alpha]]
+      positions = renderPoints
+      if(positions is None): positions = np.empty((particleCount, self.pointCount, 3), dtype = np.float32)
+      colors = np.empty((particleCount, self.pointCount, 4), dtype = np.uint8)
+      
+      #  Convert a block of particles at a time to keep the temporary arrays small
+      blockSize = max(1, 2 ** 22 // max(1, self.pointCount))
+      for start in range(0, particleCount, blockSize):
+         particles = np.arange(start, min(start + blockSize, particleCount))
+         if(renderPoints is None): positions[particles] = np.transpose(points[particles, :, :], (0, 2, 1))
+         colors[particles] = np.round(colorFunction(particles, np.arange(self.pointCount)) * 255)
+      
+      #  Put the points and colors in vertex buffers; they are uploaded the next time they are bound
+      self.positionBuffer = vbo.VBO(positions.reshape(-1, 3))
+      self.colorBuffer = vbo.VBO(colors.reshape(-1, 4))
+      
+      #  Show every trail
+      self.setVisibleParticles(np.ones(particleCount, dtype = bool))
+
+   def setVisibleParticles(self, visible):
+      '''Set which particles' trails and markers are drawn.
+         Input:  shown flag for every particle <np.ndarray> [bool]
+         Output: None'''
+      #  The first vertex of every shown trail
+      self.firsts = (np.flatnonzero(visible) * self.pointCount).astype(np.int32)
+      
+      #  Redraw the item
+      self.update()
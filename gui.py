@@ -0,0 +1,1882 @@
+#  The nBody 3D graph GUI: the application, its main window, the graph widget and the thread
+#  that loads points files.  The points are in the format described at the top of nbody.py.
+#
+#  Importing this module imports PyQt4 and pyqtgraph's OpenGL items, which is slow and needs a
+#  display, so nbody.py only imports it when the GUI is used.
+#
+#  Example
+#     python3 nbody.py points.npy                 <-- Run the application
+#     graph = nbody.Graph(points)                 <-- Or use the widget (loads this module)
+
+import sys
+import time
+from PyQt4 import QtGui, QtCore
+import pyqtgraph as pg
+import pyqtgraph.opengl as gl
+import numpy as np
+import colors
+import store
+import trajectory
+import glitems
+import lod
+import ringbuffer
+import bounds
+import profiling
+import scheduler
+import shards
+import analysis
+from common import verifyPoints, parsePlotSelection
+
+class App(QtGui.QApplication):
+   '''This is a main application.
+      Input:  command line arguments <list>
+      Output: None'''
+   def __init__(self, points, liveName = None):
+      #  Initialize the parent widget
+      QtGui.QApplication.__init__(self, sys.argv)
+      
+      #  Set the application name
+      self.setApplicationName("Submit Document")
+      
+      #  Create the main window
+      self.mainWindow = MainWindow(points, liveName)
+      
+      #  Show the main window
+      self.mainWindow.show()
+
+class MainWindow(QtGui.QMainWindow):
+   '''This is the main GUI window.  This is what contains all the QWidgets seen in the application.'''
+   def __init__(self, points, liveName = None):
+      '''Initialize the main window.
+         Input:  points <np.array> [particle index [xyz coordinate [point <float>]]],
+                 name of a ring buffer to show live points from <str>
+         Output: None'''
+      #  Initialize the parent widget
+      QtGui.QMainWindow.__init__(self)
+      
+      #  Initialize this window
+      self.setWindowTitle("nBody 3D Graph")
+      
+      #  Set the size of the main window
+      self.resize(800, 600)
+      
+      #  Create a graph object
+      self.graph = Graph(points)
+      
+      #  Set the graph object as the central widget of the main window
+      self.setCentralWidget(self.graph)
+      
+      #  If a ring buffer is given, show the points streamed into it
+      if(liveName != None): self.graph.startLive(liveName)
+
+class Graph(QtGui.QWidget):
+   '''This is the graph widget.  It contains the 3D graph, the playback controls and
+      status.'''
+   #  The alpha color value
+   colorAlpha = colors.colorAlpha
+
+#    #  A list of color codes to use when displaying plots.  There are two colors (RGBA) per entry.
+#    #  This is so when those two colors are different, the plot's colors will alternate.
+#    colorCodes = [((0.8, 0.0, 0.0, colorAlpha), (0.8, 0.0, 0.0, colorAlpha)),
+#                  ((0.0, 0.8, 0.0, colorAlpha), (0.0, 0.8, 0.0, colorAlpha)),
+#                  ((0.0, 0.0, 0.8, colorAlpha), (0.0, 0.0, 0.8, colorAlpha)),
+#                  ((0.8, 0.8, 0.0, colorAlpha), (0.8, 0.8, 0.0, colorAlpha)),
+#                  ((0.8, 0.0, 0.8, colorAlpha), (0.8, 0.0, 0.8, colorAlpha)),
+#                  ((0.0, 0.8, 0.8, colorAlpha), (0.0, 0.8, 0.8, colorAlpha)),
+#                  ((0.8, 0.0, 0.0, colorAlpha), (0.0, 0.8, 0.0, colorAlpha)),
+#                  ((0.0, 0.8, 0.0, colorAlpha), (0.0, 0.0, 0.8, colorAlpha)),
+#                  ((0.0, 0.0, 0.8, colorAlpha), (0.8, 0.8, 0.0, colorAlpha)),
+#                  ((0.8, 0.8, 0.0, colorAlpha), (0.8, 0.0, 0.8, colorAlpha))]
+   
+   #  A list of color codes to use when displaying plots (see colors.py)
+   colorCodes = colors.colorCodes
+   
+   #  The color codes as an array [palette entry [color #1 or #2 [red, green, blue, alpha]]]
+   palette = colors.palette
+   
+   #  The number of points drawn before a plot switches to its other color
+   colorRunLength = colors.colorRunLength
+   
+   #  When at least this many particles are loaded, their plots are batched into a single line
+   #  plot and a single scatter plot
+   batchPlotCount = 50
+   
+   #  The most memory (in bytes) the points and colors may use on the GPU for GPU playback
+   gpuMaxBytes = 1024 * 1024 * 1024
+   
+   #  When the trails have at least this many points, they are drawn at a level of detail that
+   #  fits the zoom, with only the last lodHeadPoints points of each trail at full resolution
+   lodPointCount = 10000
+   lodHeadPoints = 1000
+   
+   #  The most memory (in bytes) the decimated copies of the trails may use
+   lodMaxBytes = 1024 * 1024 * 1024
+   
+   #  The most memory the points' render layout may use (in bytes)
+   renderMaxBytes = 2 * 1024 * 1024 * 1024
+   
+   #  How often (in ms) a live ring buffer is checked for new frames
+   livePollInterval = 100
+   
+   #  The most memory (in bytes) the live frames may use before the oldest are written to the disk
+   liveMaxBytes = 512 * 1024 * 1024
+   
+   #  How often (in ms) the performance overlay is refreshed
+   performanceInterval = 250
+
+   def __init__(self, points = None):
+      '''Initialize this class.
+         Input:  points <np.array> [particle index [xyz coordinate [point <float>]]]
+         Output: None'''
+      #  Initialize the parent
+      QtGui.QWidget.__init__(self)
+      
+      #  All of the points for all of the particles (these are precalculated)
+      self.points = points
+      
+      #  Create a counter frame and set the frame's attributes
+      self.counterFrame = QtGui.QFrame()
+      self.counterFrame.setFrameShadow(QtGui.QFrame.Sunken)
+      self.counterFrame.setFrameShape(QtGui.QFrame.Box)
+      
+      #  Create a controls frame and set the frame's attributes
+      self.controlsFrame = QtGui.QFrame()
+      self.controlsFrame.setFrameShadow(QtGui.QFrame.Raised)
+      self.controlsFrame.setFrameShape(QtGui.QFrame.Panel)
+      
+      #  Create the layouts
+      self.mainLayout = QtGui.QVBoxLayout(self)
+      self.counterLayout = QtGui.QHBoxLayout(self.counterFrame)
+      self.controlsLayout = QtGui.QHBoxLayout(self.controlsFrame)
+      self.viewLayout = QtGui.QHBoxLayout()
+      
+      #  The starting time index (i.e. of the X number of points given, start at this one)
+      self.initialPointIndex = 1
+      
+      #  The initial step size
+      self.initialStepSize = 50
+      
+      #  The initial delay when "playing" the graph
+      self.initialDelay = 40
+      
+      #  When fast-forwarding or rewinding, increase/decrease the timer's interval by this amount
+      self.timerStepSize = 20
+      
+      #  Create a bold font
+      self.boldFont = QtGui.QFont()
+      self.boldFont.setBold(True)
+      
+      #  Create a counter label
+      self.counterLabel = QtGui.QLabel("Counter")
+      self.counterLabel.setFont(self.boldFont)
+      
+      #  Create a counter line edit
+      self.counterLineEdit = QtGui.QLineEdit()
+      self.counterLineEdit.setReadOnly(True)
+      self.counterLineEdit.setAlignment(QtCore.Qt.AlignRight)
+      self.counterLineEdit.setFixedWidth(QtGui.QFontMetrics(self.counterLineEdit.font()).width("0000000") + 20)
+      
+      #  Create a step size label
+      self.stepSizeLabel = QtGui.QLabel("Step")
+      self.stepSizeLabel.setFont(self.boldFont)
+      
+      #  Create a step size spin box
+      self.stepSizeSpinBox = QtGui.QSpinBox()
+      self.stepSizeSpinBox.setValue(self.initialStepSize)
+      
+      #  Create a timer label
+      self.timerLabel = QtGui.QLabel("Time Interval (ms)")
+      self.timerLabel.setFont(self.boldFont)
+      
+      #  Create a timer spin box
+      self.timerSpinBox = QtGui.QSpinBox()
+      self.timerSpinBox.setRange(0, 10000)
+      self.timerSpinBox.setValue(self.initialDelay)
+      
+      #  Create a time slider
+      self.timeSlider = QtGui.QSlider()
+      self.timeSlider.setSingleStep(1)
+      self.timeSlider.setOrientation(QtCore.Qt.Horizontal)
+      self.timeSlider.setEnabled(False)
+      
+      #  Create a plot of a quantity derived from the points (such as the kinetic energy) over
+      #  time, with a line that follows the time slider and can be dragged to move it
+      self.analysisComboBox = QtGui.QComboBox()
+      self.analysisComboBox.addItems([label for name, label, size in analysis.quantities])
+      self.analysisPlot = pg.PlotWidget()
+      self.analysisPlot.setFixedHeight(140)
+      self.analysisPlot.showGrid(x = True, y = True, alpha = 0.3)
+      self.analysisPlot.setDownsampling(auto = True, mode = "peak")
+      self.analysisPlot.setClipToView(True)
+      self.analysisMarker = pg.InfiniteLine(angle = 90, movable = True)
+      self.analysisPlot.addItem(self.analysisMarker)
+      
+      #  Put the quantity picker and the plot in a frame
+      self.analysisFrame = QtGui.QFrame()
+      self.analysisLayout = QtGui.QHBoxLayout(self.analysisFrame)
+      self.analysisLayout.setContentsMargins(0, 0, 0, 0)
+      self.analysisLayout.addWidget(self.analysisComboBox, 0, QtCore.Qt.AlignTop)
+      self.analysisLayout.addWidget(self.analysisPlot)
+      self.analysisFrame.setVisible(False)
+      
+      #  The per-frame timings of playback
+      self.profiler = profiling.FrameProfiler()
+      
+      #  Paces playback at a steady number of steps per second however long frames take to draw
+      self.scheduler = scheduler.PlaybackScheduler()
+      
+      #  Create the graph view (its painting is timed)
+      self.view = glitems.TimedViewWidget(paintTimed = self.viewPainted)
+      
+      #  Create the performance overlay in the top left corner of the view
+      self.performanceLabel = QtGui.QLabel(self.view)
+      self.performanceLabel.setStyleSheet("QLabel { background: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px; }")
+      self.performanceLabel.move(8, 8)
+      self.performanceLabel.hide()
+      
+      #  Create the x, y, and z grids
+      self.xGrid = gl.GLGridItem()
+      self.yGrid = gl.GLGridItem()
+      self.zGrid = gl.GLGridItem()
+      
+      #  Rotate the x and y grid
+      self.xGrid.rotate(90, 0, 1, 0)
+      self.yGrid.rotate(90, 1, 0, 0)
+      
+      #  Create x, y, and z axis (drawn as line plots)
+      self.xAxis = gl.GLLinePlotItem(pos = np.array([[-10.0, 0.0, 0.0], [10.0, 0.0, 0.0]]), color = np.array([[1.0, 0.0, 0.0, 0.4], [1.0, 0.0, 0.0, 0.4]]), width = 3.0)
+      self.yAxis = gl.GLLinePlotItem(pos = np.array([[0.0, -10.0, 0.0], [0.0, 10.0, 0.0]]), color = np.array([[0.0, 1.0, 0.0, 0.4], [0.0, 1.0, 0.0, 0.4]]), width = 3.0)
+      self.zAxis = gl.GLLinePlotItem(pos = np.array([[0.0, 0.0, -10.0], [0.0, 0.0, 10.0]]), color = np.array([[0.0, 0.0, 1.0, 0.4], [0.0, 0.0, 1.0, 0.4]]), width = 3.0)
+      
+      #  Add the x, y, and z line plots to the view
+      self.view.addItem(self.xAxis)
+      self.view.addItem(self.yAxis)
+      self.view.addItem(self.zAxis)
+      
+      #  A list of scatter plots
+      self.scatterList = []
+      
+      #  A list of line plots
+      self.lineList = []
+      
+      #  The line plot and scatter plot used when the plots are batched
+      self.batchLine = None
+      self.batchScatter = None
+      
+      #  The item that draws every trail from the GPU during GPU playback
+      self.gpuPlot = None
+      
+      #  The decimated copies of the trails used for the level of detail
+      self.trailPyramid = None
+      
+      #  The points in the render layout [particle [point [x, y, z]]] (None if they don't fit in memory)
+      self.renderPoints = None
+      
+      #  Reads the chunks of points kept on the disk ahead of playback
+      self.prefetcher = None
+      
+      #  Which particles' plots are shown
+      self.plotVisible = np.ones(0, dtype = bool)
+      
+      #  Which particles' plots are left out because they are entirely off the screen
+      self.plotCulled = np.zeros(0, dtype = bool)
+      
+      #  The quantities derived from the points over time (worked out when they are first plotted)
+      self.analysis = None
+      
+      #  The bounding boxes of every particle over time and the view the culling was last worked out for
+      self.boundsIndex = None
+      self.cullMatrix = None
+      
+      #  The thread loading points in the background, its progress dialog and the points shown
+      #  before it started
+      self.loader = None
+      self.progressDialog = None
+      self.previousPoints = None
+      
+      #  The ring buffer live points are read from, the number of frames read from it and the
+      #  points read so far
+      self.liveBuffer = None
+      self.liveFrames = 0
+      self.liveTrajectory = None
+      
+      #  How far the axes and grids reach
+      self.axisLimit = 10
+      
+      #  Add graph items to the view
+      self.view.addItem(self.xGrid)
+      self.view.addItem(self.yGrid)
+      self.view.addItem(self.zGrid)
+      
+      #  Set the view's resize policy
+      self.view.setSizePolicy(QtGui.QSizePolicy.MinimumExpanding, QtGui.QSizePolicy.MinimumExpanding)
+      
+      #  Create play and pause icons
+      self.playIcon = QtGui.QIcon(sys.path[0] + "/icons/play.png")
+      self.pauseIcon = QtGui.QIcon(sys.path[0] + "/icons/pause.png")
+      
+      #  Create control buttons and disable them by default
+      self.playPauseButton = self.createIconButton(self.playIcon, tooltip = "Play")
+      self.playPauseButton.setEnabled(False)
+      self.ffButton = self.createIconButton(QtGui.QIcon(sys.path[0] + "/icons/fastforward.png"), tooltip = "Faster")
+      self.ffButton.setEnabled(False)
+      self.rewindButton = self.createIconButton(QtGui.QIcon(sys.path[0] + "/icons/rewind.png"), tooltip = "Slower")
+      self.rewindButton.setEnabled(False)
+      self.stepForwardButton = self.createIconButton(QtGui.QIcon(sys.path[0] + "/icons/stepforward.png"), tooltip = "Step Forward")
+      self.stepForwardButton.setEnabled(False)
+      self.stepBackwardButton = self.createIconButton(QtGui.QIcon(sys.path[0] + "/icons/stepbackward.png"), tooltip = "Step Backward")
+      self.stepBackwardButton.setEnabled(False)
+      
+      #  Create the reverse button
+      self.reverseButton = QtGui.QCheckBox("Reverse")
+      self.reverseButton.setFont(self.boldFont)
+      
+      #  Create the reverse button
+      self.loopButton = QtGui.QCheckBox("Loop")
+      self.loopButton.setFont(self.boldFont)
+      
+      #  Create an exit button
+      self.exitButton = QtGui.QPushButton("Exit")
+      self.exitButton.setToolTip("Exit this application")
+      self.exitButton.setFont(self.boldFont)
+      
+      #  Create a load button
+      self.loadButton = QtGui.QPushButton("Load Points")
+      self.loadButton.setToolTip("Load points to be shown on the graph")
+      self.loadButton.setFont(self.boldFont)
+      
+      #  Turn on the main context menu
+      self.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+      
+      #  Create the plot list's model (backed by the plots' shown flags) and its view; the rows
+      #  are all the same height so thousands of plots scroll quickly
+      self.plotListModel = PlotListModel()
+      self.plotListView = QtGui.QListView()
+      self.plotListView.setModel(self.plotListModel)
+      self.plotListView.setUniformItemSizes(True)
+      self.plotListView.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
+      self.plotListView.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+      
+      #  Create buttons to show all, none or the opposite of the shown plots
+      self.showAllButton = QtGui.QPushButton("All")
+      self.showAllButton.setToolTip("Show every plot")
+      self.showNoneButton = QtGui.QPushButton("None")
+      self.showNoneButton.setToolTip("Hide every plot")
+      self.invertButton = QtGui.QPushButton("Invert")
+      self.invertButton.setToolTip("Show the hidden plots and hide the shown plots")
+      
+      #  Create a line edit that shows only the plots typed into it
+      self.plotFilterLineEdit = QtGui.QLineEdit()
+      self.plotFilterLineEdit.setPlaceholderText("e.g. 1-10, 25, 40-")
+      self.plotFilterLineEdit.setToolTip("Show only these plots (press Enter)")
+      
+      #  Create actions to show or hide the plots selected in the list
+      self.showSelectedAction = QtGui.QAction("Show Selected", self)
+      self.hideSelectedAction = QtGui.QAction("Hide Selected", self)
+      self.plotListView.addActions([self.showSelectedAction, self.hideSelectedAction])
+      
+      #  Put the plot list's controls and view in a frame
+      self.plotListFrame = QtGui.QFrame()
+      self.plotListLayout = QtGui.QVBoxLayout(self.plotListFrame)
+      self.plotListLayout.setContentsMargins(0, 0, 0, 0)
+      self.plotButtonsLayout = QtGui.QHBoxLayout()
+      self.plotButtonsLayout.addWidget(self.showAllButton)
+      self.plotButtonsLayout.addWidget(self.showNoneButton)
+      self.plotButtonsLayout.addWidget(self.invertButton)
+      self.plotListLayout.addLayout(self.plotButtonsLayout)
+      self.plotListLayout.addWidget(self.plotFilterLineEdit)
+      self.plotListLayout.addWidget(self.plotListView)
+      self.plotListFrame.setSizePolicy(QtGui.QSizePolicy.Maximum, QtGui.QSizePolicy.Preferred)
+      self.plotListFrame.setVisible(False)
+      
+      #  Create context menu actions
+      self.showPlotListAction = QtGui.QAction("Show Plot List", self)
+      self.showPlotListAction.setCheckable(True)
+      self.analysisAction = QtGui.QAction("Show Analysis", self)
+      self.analysisAction.setCheckable(True)
+      self.separateAction = QtGui.QAction("Separate Plots", self)
+      self.separateAction.setCheckable(True)
+      self.separateAction.setChecked(True)
+      self.batchAction = QtGui.QAction("Batch Plots", self)
+      self.batchAction.setCheckable(True)
+      self.gpuAction = QtGui.QAction("GPU Playback", self)
+      self.gpuAction.setCheckable(True)
+      self.lodAction = QtGui.QAction("Level of Detail", self)
+      self.lodAction.setCheckable(True)
+      self.adaptiveAction = QtGui.QAction("Adaptive Playback", self)
+      self.adaptiveAction.setCheckable(True)
+      self.adaptiveAction.setChecked(True)
+      self.plotSeparator = QtGui.QAction(self)
+      self.plotSeparator.setSeparator(True)
+      
+      #  Only one way of drawing the plots can be picked at a time
+      self.plotModeGroup = QtGui.QActionGroup(self)
+      self.plotModeGroup.addAction(self.separateAction)
+      self.plotModeGroup.addAction(self.batchAction)
+      self.plotModeGroup.addAction(self.gpuAction)
+      self.xAction = QtGui.QAction("Show X Grid", self)
+      self.xAction.setCheckable(True)
+      self.xAction.setChecked(True)
+      self.yAction = QtGui.QAction("Show Y Grid", self)
+      self.yAction.setCheckable(True)
+      self.yAction.setChecked(True)
+      self.zAction = QtGui.QAction("Show Z Grid", self)
+      self.zAction.setCheckable(True)
+      self.zAction.setChecked(True)
+      self.fitViewAction = QtGui.QAction("Fit View", self)
+      self.autoFitAction = QtGui.QAction("Auto Fit View", self)
+      self.autoFitAction.setCheckable(True)
+      self.cullAction = QtGui.QAction("Cull Off-Screen Plots", self)
+      self.cullAction.setCheckable(True)
+      self.cullAction.setChecked(True)
+      self.viewSeparator = QtGui.QAction(self)
+      self.viewSeparator.setSeparator(True)
+      self.separator = QtGui.QAction(self)
+      self.separator.setSeparator(True)
+      self.performanceAction = QtGui.QAction("Show Performance", self)
+      self.performanceAction.setCheckable(True)
+      self.saveTimingsAction = QtGui.QAction("Save Timings...", self)
+      self.performanceSeparator = QtGui.QAction(self)
+      self.performanceSeparator.setSeparator(True)
+      
+      #  Add the actions to the context menu
+      self.addActions([self.showPlotListAction, self.analysisAction, self.plotSeparator, self.separateAction, self.batchAction, self.gpuAction, self.lodAction, self.adaptiveAction, self.separator, self.xAction, self.yAction, self.zAction,
+                       self.viewSeparator, self.fitViewAction, self.autoFitAction, self.cullAction, self.performanceSeparator, self.performanceAction, self.saveTimingsAction])
+      
+      #  Add widgets to the counter layout
+      self.counterLayout.addWidget(self.counterLabel)
+      self.counterLayout.addWidget(self.counterLineEdit)
+      self.counterLayout.addSpacing(20)
+      self.counterLayout.addWidget(self.stepSizeLabel)
+      self.counterLayout.addWidget(self.stepSizeSpinBox)
+      self.counterLayout.addStretch(0)
+      self.counterLayout.addWidget(self.timerLabel)
+      self.counterLayout.addWidget(self.timerSpinBox)
+      
+      #  Add widgets to the controls layout
+      self.controlsLayout.addWidget(self.reverseButton)
+      self.controlsLayout.addWidget(self.loopButton)
+      self.controlsLayout.addStretch(0)
+      self.controlsLayout.addWidget(self.stepBackwardButton)
+      self.controlsLayout.addWidget(self.rewindButton)
+      self.controlsLayout.addWidget(self.playPauseButton)
+      self.controlsLayout.addWidget(self.ffButton)
+      self.controlsLayout.addWidget(self.stepForwardButton)
+      self.controlsLayout.addStretch(0)
+      self.controlsLayout.addWidget(self.loadButton)
+      self.controlsLayout.addWidget(self.exitButton)
+      
+      #  Add widgets to the view layout
+      self.viewLayout.addWidget(self.view)
+      self.viewLayout.addWidget(self.plotListFrame)
+      
+      #  Make sure the counter and controls don't take up too much vertical space
+      self.counterFrame.setSizePolicy(QtGui.QSizePolicy.Preferred, QtGui.QSizePolicy.Fixed)
+      self.controlsFrame.setSizePolicy(QtGui.QSizePolicy.Preferred, QtGui.QSizePolicy.Fixed)
+      
+      #  Add widgets and layouts to the main layout
+      self.mainLayout.addWidget(self.counterFrame)
+      self.mainLayout.addLayout(self.viewLayout)
+      self.mainLayout.addWidget(self.analysisFrame)
+      self.mainLayout.addWidget(self.timeSlider)
+      self.mainLayout.addWidget(self.controlsFrame)
+      
+      #  Initialize the counter
+      self.counterLineEdit.setText(str(self.timeSlider.value()))
+      
+      #  Create a timer (when this times out, the graph updates)
+      self.timer = QtCore.QTimer()
+      
+      #  Set the timer's interval (in ms)
+      self.timer.setInterval(self.timerSpinBox.value())
+      
+      #  Create a timer that checks a live ring buffer for new frames, even when playback is paused
+      self.liveTimer = QtCore.QTimer()
+      self.liveTimer.setInterval(self.livePollInterval)
+      
+      #  Create a timer that refreshes the performance overlay while it is shown
+      self.performanceTimer = QtCore.QTimer()
+      self.performanceTimer.setInterval(self.performanceInterval)
+      
+      #  Initilize the graph
+      self.initializeGraph()
+      
+      #  Connect all the signals
+      self.timer.timeout.connect(self.timeout)
+      self.liveTimer.timeout.connect(self.readLiveFrames)
+      self.performanceTimer.timeout.connect(self.updatePerformanceOverlay)
+      self.playPauseButton.clicked.connect(self.playPause)
+      self.ffButton.clicked.connect(self.fastForward)
+      self.rewindButton.clicked.connect(self.rewind)
+      self.stepForwardButton.clicked.connect(self.stepForward)
+      self.stepBackwardButton.clicked.connect(self.stepBackward)
+      self.timerSpinBox.valueChanged[int].connect(self.timer.setInterval)
+      self.loadButton.clicked.connect(self.loadPointsButtonClicked)
+      self.exitButton.clicked.connect(exit)
+      self.xAction.toggled.connect(self.showHideXGrid)
+      self.yAction.toggled.connect(self.showHideYGrid)
+      self.zAction.toggled.connect(self.showHideZGrid)
+      self.showPlotListAction.toggled.connect(self.plotListFrame.setVisible)
+      self.analysisAction.toggled.connect(self.showHideAnalysis)
+      self.analysisComboBox.currentIndexChanged.connect(self.plotAnalysis)
+      self.analysisMarker.sigPositionChangeFinished.connect(self.analysisMarkerMoved)
+      self.plotModeGroup.triggered.connect(self.plotModeChanged)
+      self.lodAction.toggled.connect(self.levelOfDetailToggled)
+      self.adaptiveAction.toggled.connect(self.adaptivePlaybackToggled)
+      self.fitViewAction.triggered.connect(self.fitView)
+      self.autoFitAction.toggled.connect(self.autoFitToggled)
+      self.cullAction.toggled.connect(self.cullingToggled)
+      self.performanceAction.toggled.connect(self.showHidePerformance)
+      self.saveTimingsAction.triggered.connect(self.saveTimingsClicked)
+      self.timeSlider.valueChanged.connect(self.timeSliderChanged)
+      self.reverseButton.toggled.connect(self.prefetchAhead)
+      self.loopButton.toggled.connect(self.prefetchAhead)
+      self.stepSizeSpinBox.valueChanged.connect(self.prefetchAhead)
+      self.timerSpinBox.valueChanged.connect(self.prefetchAhead)
+      self.plotListModel.visibilityChanged.connect(self.plotVisibilityChanged)
+      self.showAllButton.clicked.connect(self.plotListModel.showAll)
+      self.showNoneButton.clicked.connect(self.plotListModel.showNone)
+      self.invertButton.clicked.connect(self.plotListModel.invert)
+      self.plotFilterLineEdit.returnPressed.connect(self.plotFilterEntered)
+      self.showSelectedAction.triggered.connect(self.showSelectedPlots)
+      self.hideSelectedAction.triggered.connect(self.hideSelectedPlots)
+
+   def adaptivePlaybackToggled(self, adaptive):
+      '''Turn adaptive playback on or off.  When it is off, the timer goes back to firing at the
+         time interval and every tick moves one step size.
+         Input:  adaptive flag <bool>
+         Output: None'''
+      self.timer.setInterval(self.timerSpinBox.value())
+      self.scheduler.reset()
+
+   def analysisMarkerMoved(self, marker):
+      '''When the line on the analysis plot is dragged, move the time slider to it.
+         Input:  marker line <pg.InfiniteLine>
+         Output: None'''
+      if(verifyPoints(self.points) == True):
+         self.timeSlider.setValue(min(max(int(round(marker.value())) + 1, 1), self.points.shape[2]))
+      
+      #  Snap the line to the point shown
+      self.updateAnalysisMarker()
+
+   def autoFitToggled(self, fit):
+      '''Turn fitting the camera to the trails as they are drawn on or off.
+         Input:  auto fit flag <bool>
+         Output: None'''
+      if(fit == True): self.fitView()
+
+   def calculateAnalysis(self):
+      '''Work out the quantities derived from the points in one pass, showing the progress.  If
+         it is cancelled, the analysis is hidden again.'''
+      #  Create a progress dialog (only shown if it takes a while)
+      progressDialog = QtGui.QProgressDialog("Analyzing points...", "Cancel", 0, 1000, self)
+      progressDialog.setWindowTitle("Analyzing Points")
+      progressDialog.setMinimumDuration(500)
+      
+      #  Show the progress after every block of points and stop if cancelled
+      def progress(fraction):
+         progressDialog.setValue(int(fraction * progressDialog.maximum()))
+         QtGui.QApplication.processEvents()
+         if(progressDialog.wasCanceled() == True): raise(trajectory.LoadCancelled())
+      
+      try:
+         self.analysis = analysis.TrajectoryAnalysis(self.points, progress = progress)
+      except trajectory.LoadCancelled:
+         self.analysis = None
+         self.analysisAction.setChecked(False)
+      
+      progressDialog.close()
+
+   def calculateColors(self, particleNum, indexes):
+      '''Calculate the colors of a particle's points.  The colors are worked out from the
+         particle's palette entry and the point indexes, so they only take up memory for the
+         points being drawn.  An array of particle numbers gives one row of colors per particle.
+         Input:  particle number <int or np.ndarray>,
+                 point indexes <np.ndarray> [point index] or [particle [point index]]
+         Output: new color components <2D np.array> [point <int> [red <float>, green <float>, blue <float>, alpha <float>]]'''
+      return(colors.calculateColors(particleNum, indexes, self.palette, self.colorRunLength))
+
+   def createIconButton(self, icon, text = "", tooltip = "", width = None, height = None, border = False):
+      """Create a button that is only an icon.
+         Input:  button icon (QIcon), tooltip text (string)
+         Output: button (QPushButton)"""
+      #  Create a button based on the given icon and text
+      button = QtGui.QPushButton(icon, text)
+      
+      #  Set the button's tooltip
+      button.setToolTip(tooltip)
+      
+      #  If the border flag is False
+      if(border == False):
+         #  Remove the button's border
+         button.setStyleSheet("QPushButton { background: rgba(0,0,0,0); border-radius: 6px } QToolTip { opacity: 255 }")
+      
+      #  Remove any focus
+      button.setFocusPolicy(QtCore.Qt.NoFocus)
+      
+      #  If specified set the button's size
+      if(width != None and height != None):
+         button.setIconSize(QtCore.QSize(width, height))
+      elif(width != None):
+         buttonHeight = int(button.size().height() * (width / button.size().width()))
+         button.setIconSize(QtCore.QSize(width, buttonHeight))
+      elif(height != None):
+         buttonWidth = int(button.size().width() * (height / button.size().height()))
+         button.setIconSize(QtCore.QSize(buttonWidth, height))
+      
+      return(button)
+
+   def createPlots(self):
+      '''Create the line and scatter plots for the loaded points.  For GPU playback, every
+         trail is uploaded to the GPU once and drawn by a single item.  When batching is turned
+         on, every trail goes into one line plot and every marker into one scatter plot.
+         Otherwise each particle gets its own line and scatter plot.'''
+      #  Remove all the line plots and scatter plots from the view
+      for item in self.lineList + self.scatterList:
+         self.view.removeItem(item)
+      
+      #  Remove the batched plots and the GPU plot from the view
+      for item in [self.batchLine, self.batchScatter, self.gpuPlot]:
+         if(item != None): self.view.removeItem(item)
+      
+      #  A list of scatter plots
+      self.scatterList = []
+      
+      #  A list of line plots
+      self.lineList = []
+      
+      #  The batched plots and the GPU plot
+      self.batchLine = None
+      self.batchScatter = None
+      self.gpuPlot = None
+      
+      #  The new plots start out with every particle on the screen
+      self.plotCulled[:] = False
+      
+      #  If the plots are played back from the GPU
+      if(self.gpuAction.isChecked() == True):
+         #  Create the GPU plot and upload every particle's points and colors to it
+         self.gpuPlot = glitems.TrajectoryItem()
+         self.gpuPlot.setTrajectories(self.points, self.calculateColors, self.renderPoints)
+         self.gpuPlot.setVisibleParticles(self.plotVisible)
+         
+         #  Add the GPU plot to the graph view
+         self.view.addItem(self.gpuPlot)
+      #  If the plots are batched
+      elif(self.batchAction.isChecked() == True):
+         #  Create one line plot that draws each trail as separate line segments
+         self.batchLine = gl.GLLinePlotItem(mode = "lines")
+         
+         #  Create one scatter plot for every particle's markers
+         self.batchScatter = gl.GLScatterPlotItem()
+         
+         #  Add the batched plots to the graph view
+         self.view.addItem(self.batchLine)
+         self.view.addItem(self.batchScatter)
+      #  Otherwise, create plots for every particle
+      else:
+         #  For every particle to track
+         for index in range(len(self.points)):
+            #  Create a scatter plot
+            scatter = gl.GLScatterPlotItem()
+            
+            #  Create a line plot
+            line = gl.GLLinePlotItem()
+            
+            #  Add the scatter plot to the list
+            self.scatterList.append(scatter)
+            
+            #  Add the line plot to the list
+            self.lineList.append(line)
+            
+            #  Show the plots only if the particle is shown
+            line.setVisible(bool(self.plotVisible[index]))
+            scatter.setVisible(bool(self.plotVisible[index]))
+            
+            #  Add the line plot to the graph view
+            self.view.addItem(line)
+            
+            #  Add the scatter plot to the graph view
+            self.view.addItem(scatter)
+
+   def cullingToggled(self, cull):
+      '''Turn leaving out the plots of particles that are off the screen on or off.
+         Input:  culling flag <bool>
+         Output: None'''
+      #  Redraw the plots
+      if(verifyPoints(self.points) == True): self.getNextPoints(initialize = True)
+
+   def fastForward(self):
+      '''Decrease the timer's timeout interval.'''
+      self.timerSpinBox.setValue(self.timerSpinBox.value() - self.timerStepSize)
+
+   def fitView(self):
+      '''Point the camera at the shown trails up to the current point and move it back until
+         they fit in the view.  The trails' box comes from the bounding box index, so no points
+         are read.'''
+      #  If there are no points or none are shown, there is nothing to fit
+      if(verifyPoints(self.points) == False or self.boundsIndex == None): return()
+      particles = np.flatnonzero(self.plotVisible)
+      if(len(particles) == 0): return()
+      
+      #  The box around the shown trails
+      minimum, maximum = self.boundsIndex.boxes(particles, 0, self.timeSlider.value())
+      minimum = np.fmin.reduce(minimum, axis = 0)
+      maximum = np.fmax.reduce(maximum, axis = 0)
+      if(np.isnan(minimum).any() or np.isnan(maximum).any()): return()
+      center = (minimum + maximum) / 2.0
+      radius = max(float(np.linalg.norm(maximum - minimum)) / 2.0, 1e-6)
+      
+      #  Half of the view's angle across its narrower side (the field of view is horizontal)
+      halfWidth = np.radians(self.view.opts["fov"]) / 2.0
+      halfAngle = min(halfWidth, np.arctan(np.tan(halfWidth) * self.view.height() / max(1, self.view.width())))
+      
+      #  Move the camera back far enough for a sphere around the box to fit
+      self.view.opts["center"] = QtGui.QVector3D(float(center[0]), float(center[1]), float(center[2]))
+      self.view.setCameraPosition(distance = radius / np.sin(halfAngle))
+
+   def getDetailLevel(self):
+      '''Pick the level of detail to draw the trails at for the current zoom.
+         Input:  None
+         Output: level (0 is full resolution) <int>'''
+      #  If there are no decimated trails, draw them at full resolution
+      if(self.trailPyramid == None): return(0)
+      
+      #  The size of a pixel at the center of the view, in world units
+      opts = self.view.opts
+      worldPerPixel = 2.0 * opts["distance"] * np.tan(np.radians(opts["fov"]) / 2.0) / max(1, self.view.height())
+      
+      #  Pick the coarsest level that still has about one point per pixel
+      return(self.trailPyramid.pickLevel(worldPerPixel))
+
+   def getNextPoints(self, reverse = False, initialize = False, step = None):
+      '''Recalculate the plot arrays so they add or remove a point depending on the reverse flag.
+         When the initialize flag is True, only set the plot points based on the current slider value.
+         When the initialize flag is False, increment/decrement the slider and then set the plot points.
+         Input:  reverse flag <bool>,
+                 initialize flag <bool>,
+                 number of points to move (defaults to the step size) <int>
+         Output: None'''
+      #  If the initialize flag is False
+      if(initialize == False):
+         #  Get the step size
+         if(step == None): step = self.stepSizeSpinBox.value()
+         
+         #  If not reversed (time is going forward)
+         if(not reverse):
+            #  Increment the time slider by the step size; maxing out at the number of points
+            self.timeSlider.setValue(min(self.timeSlider.value() + step, self.points.shape[2]))
+         #  Decrement the time slider by the step size; bottoming out at 1
+         else:
+            self.timeSlider.setValue(max(self.timeSlider.value() - step, 1))
+      
+      #  Fit the camera to the trails if asked to
+      if(self.autoFitAction.isChecked() == True): self.fitView()
+      
+      #  If the plots are played back from the GPU, only change how much of each trail is drawn
+      if(self.gpuAction.isChecked() == True):
+         begin = time.perf_counter()
+         self.gpuPlot.setDrawRange(self.timeSlider.value())
+         self.profiler.add("upload", time.perf_counter() - begin)
+         return()
+      
+      #  If the plots are batched, set all of the particles' points at once
+      if(self.batchAction.isChecked() == True):
+         self.setBatchedData()
+         return()
+      
+      #  The level of detail to draw the trails at
+      level = self.getDetailLevel()
+      
+      #  Which particles could be on the screen
+      onScreen = self.getOnScreen(self.timeSlider.value())
+      
+      #  Go through each particle number
+      for particleNum in range(len(self.points)):
+         #  Leave out the plots of particles that are entirely off the screen (their data is set
+         #  again once they are back on the screen)
+         culled = not onScreen[particleNum]
+         if(culled != self.plotCulled[particleNum]):
+            self.plotCulled[particleNum] = culled
+            self.lineList[particleNum].setVisible(bool(self.plotVisible[particleNum]) and not culled)
+            self.scatterList[particleNum].setVisible(bool(self.plotVisible[particleNum]) and not culled)
+         if(culled == True): continue
+         
+         #  Get the trail and its color list
+         begin = time.perf_counter()
+         trails, colors = self.getTrails(np.array([particleNum]), self.timeSlider.value(), level)
+         pos = trails[0]
+         color = colors[0]
+         sliced = time.perf_counter()
+         self.profiler.add("slice", sliced - begin)
+         
+         #  Set the data for the current particle's line plot
+         self.lineList[particleNum].setData(pos = pos, color = color, width = 2.0)
+         
+         #  The size of the scatter plot point
+         size = np.array([7.0, 10.0])
+         
+         #  Get the beginning and ending positions for the scatter plot
+         posScatter = np.array([pos[0], pos[-1]])
+         
+         #  Get the two colors
+         colorScatter = np.array([color[0], color[-1]])
+         
+         #  Set the data for the current particle's scatter plot
+         self.scatterList[particleNum].setData(pos = posScatter, color = colorScatter, size = size)
+         self.profiler.add("upload", time.perf_counter() - sliced)
+
+   def getOnScreen(self, stop):
+      '''Find which particles' trails up to the given point could be on the screen, using the
+         bounding box index.  Every trail counts as on the screen when culling is turned off.
+         Input:  index after the last point <int>
+         Output: on screen flags <np.ndarray> [bool]'''
+      #  Remember the view the culling is worked out for
+      self.cullMatrix = self.getViewMatrix()
+      
+      if(self.cullAction.isChecked() == False or self.boundsIndex == None): return(np.ones(len(self.points), dtype = bool))
+      return(self.boundsIndex.visible(np.arange(len(self.points)), stop, self.cullMatrix))
+
+   def getSelectedPlots(self):
+      '''Get which plots are selected in the plot list.
+         Input:  None
+         Output: selected flags <np.ndarray> [bool]'''
+      selected = np.zeros(len(self.plotVisible), dtype = bool)
+      
+      #  Set each range of selected rows at once (row 0 is "All Plots")
+      for selection in self.plotListView.selectionModel().selection():
+         selected[max(selection.top(), 1) - 1:selection.bottom()] = True
+      
+      return(selected)
+
+   def getTrails(self, particles, stop, level):
+      '''Get the particles' trails up to the given point and their colors.  Above level 0 the
+         trails are decimated except for the points near their head.
+         Input:  particle numbers <np.ndarray> [int],
+                 index after the last point <int>,
+                 level of detail <int>
+         Output: trails <np.ndarray> [particle [point [x, y, z]]],
+                 colors <np.ndarray> [particle [point [red, green, blue, alpha]]]'''
+      #  If a decimated level is used, join it to the full resolution head of the trails
+      if(level > 0):
+         trails, indexes = self.trailPyramid.trails(self.points, particles, stop, level, self.lodHeadPoints)
+      #  Otherwise, get the full trails from the render layout (a single trail is a view of it, not a copy)
+      elif(self.renderPoints is not None):
+         if(len(particles) == 1): trails = self.renderPoints[particles[0]:particles[0] + 1, 0:stop]
+         else: trails = self.renderPoints[particles, 0:stop]
+         indexes = np.arange(0, stop)
+      #  Otherwise, get the full trails from the points (live points written to the disk are only
+      #  drawn as far back as the frames that are always kept in memory)
+      else:
+         first = 0
+         if(self.liveTrajectory != None and self.points is self.liveTrajectory.chunked): first = max(0, stop - self.liveTrajectory.tailFrames)
+         trails = np.transpose(self.points[particles, :, first:stop], (0, 2, 1))
+         indexes = np.arange(first, stop)
+      
+      #  Work out the colors from the point indexes
+      return(trails, self.calculateColors(particles, indexes))
+
+   def getViewMatrix(self):
+      '''Get the matrix that takes a point in the graph to the view's clip space.
+         Input:  None
+         Output: projection times view matrix <np.ndarray> [row [column]]'''
+      matrix = self.view.projectionMatrix() * self.view.viewMatrix()
+      return(np.array(matrix.copyDataTo()).reshape(4, 4))
+
+   def hideSelectedPlots(self):
+      '''Hide the plots selected in the plot list.'''
+      self.plotListModel.setRowsShown(self.getSelectedPlots(), False)
+
+   def initializeGraph(self, trailPyramid = None, boundsIndex = None, renderPoints = None):
+      '''Using the currently loaded points, initialize the graph.  If the trails were already
+         decimated, their bounding boxes found or the points put in the render layout (by the
+         loader), those are used.
+         Input:  decimated trails <lod.TrailPyramid>,
+                 bounding box index <bounds.BoundsIndex>,
+                 render layout <np.ndarray> [particle [point [x, y, z <np.float32>]]]
+         Output: None'''
+      #  Block signals to the slider
+      self.timeSlider.blockSignals(True)
+      
+      #  If there are points loaded
+      if(verifyPoints(self.points) == True):
+         #  If the timer is running, pause the timer (playback)
+         if(self.timer.isActive() == True): self.playPause()
+         
+         #  Reset the slider to the initial value (0)
+         self.timeSlider.setValue(0)
+         self.counterLineEdit.setText("0")
+         
+         #  Set the spin box's range
+         self.stepSizeSpinBox.setRange(1, self.points.shape[2])
+         
+         #  Set the time slider's range
+         self.timeSlider.setRange(1, self.points.shape[2])
+         
+         #  Show every particle's plots
+         self.plotVisible = np.ones(len(self.points), dtype = bool)
+         self.plotCulled = np.zeros(len(self.points), dtype = bool)
+         
+         #  Use the given bounding boxes, or find them in one pass over the points
+         if(boundsIndex != None): self.boundsIndex = boundsIndex
+         else: self.boundsIndex = bounds.BoundsIndex(self.points)
+         
+         #  Turn on the level of detail if the trails are long (live points keep growing, so
+         #  their trails can't be decimated ahead of time)
+         self.lodAction.blockSignals(True)
+         if(self.liveBuffer != None): self.lodAction.setChecked(False)
+         elif(self.points.shape[2] >= self.lodPointCount): self.lodAction.setChecked(True)
+         self.lodAction.setEnabled(self.liveBuffer == None)
+         self.lodAction.blockSignals(False)
+         
+         #  Use the given decimated trails, or decimate the trails if the level of detail is turned
+         #  on (unless the points are still loading; the loader decimates them)
+         if(trailPyramid != None): self.trailPyramid = trailPyramid
+         elif(self.lodAction.isChecked() == True and self.loader == None): self.trailPyramid = lod.TrailPyramid(self.points, self.lodMaxBytes)
+         else: self.trailPyramid = None
+         
+         #  Read the chunks of points kept on the disk ahead of playback
+         if(self.prefetcher != None): self.prefetcher.close()
+         if(isinstance(self.points, store.ChunkedTrajectory)): self.prefetcher = store.Prefetcher(self.points)
+         else: self.prefetcher = None
+         
+         #  Use the given render layout, or copy the points into it if they fit in memory (unless
+         #  the points are still loading or growing)
+         if(renderPoints is not None): self.renderPoints = renderPoints
+         elif(self.loader == None and self.liveBuffer == None and isinstance(self.points, np.ndarray) and self.points.size * 4 <= self.renderMaxBytes):
+            self.renderPoints = trajectory.renderLayout(self.points)
+         else: self.renderPoints = None
+         
+         #  GPU playback is only possible if the points and colors fit in the GPU's memory (and
+         #  aren't still growing)
+         self.gpuAction.setEnabled(self.points.shape[0] * self.points.shape[2] * 16 <= self.gpuMaxBytes and self.liveBuffer == None)
+         if(self.gpuAction.isChecked() == True and self.gpuAction.isEnabled() == False): self.batchAction.setChecked(True)
+         
+         #  Batch the plots if there are too many particles to draw them one at a time
+         if(self.separateAction.isChecked() == True and len(self.points) >= self.batchPlotCount): self.batchAction.setChecked(True)
+         
+         #  Create the line and scatter plots
+         self.createPlots()
+         
+         #  Point the plot list at the plots' shown flags (the model shares the array)
+         self.plotListModel.setVisibility(self.plotVisible)
+         
+         #  The widest text that goes into the plot list is the last plot's
+         maxTextWidth = len("Plot " + str(len(self.points)))
+         
+         #  Margin value
+         margins = 40
+         
+         #  Resize the width of the plot list to fit its text and buttons
+         self.plotListFrame.setFixedWidth(max(QtGui.QFontMetrics(self.plotListView.font()).width("X" * maxTextWidth) + margins, self.plotButtonsLayout.sizeHint().width()))
+         
+         #  Get the intial points for each plot
+         self.getNextPoints(initialize = True)
+         
+         #  Enable the controls
+         self.playPauseButton.setEnabled(True)
+         self.ffButton.setEnabled(True)
+         self.rewindButton.setEnabled(True)
+         self.stepBackwardButton.setEnabled(True)
+         self.stepForwardButton.setEnabled(True)
+         self.timeSlider.setEnabled(True)
+         
+         #  Work out the derived quantities again if they are plotted (unless the points are still loading)
+         self.analysis = None
+         if(self.analysisAction.isChecked() == True and self.loader == None): self.calculateAnalysis()
+         self.plotAnalysis()
+         
+         #  Calculate what the range of each axis should be (+axisLimit, -axisLimit) by finding the maximum value
+         #  in the bounding boxes and then adding 20% to it
+         axisLimit = self.boundsIndex.axisLimit()
+         self.resizeAxes(int(axisLimit * 1.20))
+      #  Otherwise, there is nothing to show (such as when the first points loaded were cancelled)
+      else:
+         #  If the timer is running, pause the timer (playback)
+         if(self.timer.isActive() == True): self.playPause()
+         
+         #  Remove every plot from the view
+         for item in self.lineList + self.scatterList + [self.batchLine, self.batchScatter, self.gpuPlot]:
+            if(item != None): self.view.removeItem(item)
+         self.lineList = []
+         self.scatterList = []
+         self.batchLine = None
+         self.batchScatter = None
+         self.gpuPlot = None
+         
+         #  Let go of everything worked out from the points
+         if(self.prefetcher != None): self.prefetcher.close()
+         self.prefetcher = None
+         self.trailPyramid = None
+         self.boundsIndex = None
+         self.renderPoints = None
+         self.analysis = None
+         self.plotAnalysis()
+         
+         #  Empty the plot list
+         self.plotVisible = np.zeros(0, dtype = bool)
+         self.plotCulled = np.zeros(0, dtype = bool)
+         self.plotListModel.setVisibility(self.plotVisible)
+         
+         #  Reset the slider and disable the controls
+         self.timeSlider.setRange(0, 0)
+         self.timeSlider.setValue(0)
+         self.counterLineEdit.setText("0")
+         self.playPauseButton.setEnabled(False)
+         self.ffButton.setEnabled(False)
+         self.rewindButton.setEnabled(False)
+         self.stepBackwardButton.setEnabled(False)
+         self.stepForwardButton.setEnabled(False)
+         self.timeSlider.setEnabled(False)
+      
+      #  Unblock signals to the slider
+      self.timeSlider.blockSignals(False)
+
+   def levelOfDetailToggled(self, show):
+      '''Turn drawing the trails at a level of detail on or off.
+         Input:  level of detail flag <bool>
+         Output: None'''
+      #  If there are points loaded
+      if(verifyPoints(self.points) == True):
+         #  Decimate the trails, or drop the decimated trails
+         if(show == True): self.trailPyramid = lod.TrailPyramid(self.points, self.lodMaxBytes)
+         else: self.trailPyramid = None
+         
+         #  Redraw the plots
+         self.getNextPoints(initialize = True)
+
+   def loadPointsButtonClicked(self):
+      '''When the load button is clicked, show a file dialog and open the new points.'''
+      #  Create a file dialog
+      dialog = QtGui.QFileDialog()
+      
+      #  Show binary, compressed, text and shard manifest files by default
+      dialog.setNameFilters(["Points Files (*.npy *.nbz *.txt *.shards)", "All Files (*)"])
+      
+      #  Several files can be selected; they are joined into one timeline as shards
+      dialog.setFileMode(QtGui.QFileDialog.ExistingFiles)
+      
+      #  If the user clicked on Select
+      if(dialog.exec_() == dialog.Accepted):
+         #  Get the selected file name (or the list of shard files)
+         selectedFiles = [str(fileName) for fileName in dialog.selectedFiles()]
+         selectedFile = selectedFiles[0] if len(selectedFiles) == 1 else shards.sortShards(selectedFiles)
+         
+         #  Stop showing live points
+         self.stopLive()
+         
+         #  Remember the current points in case loading is cancelled
+         self.previousPoints = self.points
+         
+         #  Create a loader that reads and prepares the points in the background
+         self.loader = PointsLoader(selectedFile, self.lodAction.isChecked())
+         
+         #  Create a progress dialog that doesn't block the rest of the window
+         self.progressDialog = QtGui.QProgressDialog("Loading points...", "Cancel", 0, 1000, self)
+         self.progressDialog.setWindowTitle("Loading Points")
+         self.progressDialog.setWindowModality(QtCore.Qt.NonModal)
+         self.progressDialog.setMinimumDuration(0)
+         
+         #  Connect the loader's and the progress dialog's signals
+         self.loader.progressed.connect(self.loaderProgressed)
+         self.loader.partial.connect(self.loaderPartial)
+         self.loader.loaded.connect(self.loaderLoaded)
+         self.loader.failed.connect(self.loaderFailed)
+         self.loader.cancelled.connect(self.loaderCancelled)
+         self.progressDialog.canceled.connect(self.loader.cancel)
+         
+         #  Don't load another file until this one is done
+         self.loadButton.setEnabled(False)
+         
+         #  Start loading
+         self.loader.start()
+
+   def loaderCancelled(self):
+      '''When loading is cancelled, put back the points shown before loading started.'''
+      #  Loading is done
+      self.loaderDone()
+      
+      #  If part of the new points are shown, show the previous points again
+      if(self.points is not self.previousPoints):
+         self.points = self.previousPoints
+         self.initializeGraph()
+
+   def loaderDone(self):
+      '''Clean up after the loader is done, whether it loaded, failed or was cancelled.'''
+      #  Close the progress dialog
+      self.progressDialog.canceled.disconnect(self.loader.cancel)
+      self.progressDialog.close()
+      self.progressDialog = None
+      
+      #  Wait for the loader's thread to end and let another file be loaded
+      self.loader.wait()
+      self.loader = None
+      self.loadButton.setEnabled(True)
+
+   def loaderFailed(self, error):
+      '''When loading fails, show an error message.
+         Input:  error message <str>
+         Output: None'''
+      #  Put back the previous points
+      self.loaderCancelled()
+      
+      #  The title of the error message
+      title = "Error Loading Points"
+      
+      #  The message of the error message
+      message = "There was an error loading the points:\n\n" + error
+      
+      #  Create and show the error message
+      QtGui.QMessageBox.critical(self, title, message)
+
+   def loaderLoaded(self, points, trailPyramid, boundsIndex, renderPoints):
+      '''When the loader is done, show the new points.
+         Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+                 decimated trails <lod.TrailPyramid>,
+                 bounding box index <bounds.BoundsIndex>,
+                 render layout (None if it doesn't fit in memory) <np.ndarray> [particle [point [x, y, z <np.float32>]]]
+         Output: None'''
+      #  Loading is done
+      self.loaderDone()
+      
+      #  Set the new points and (re)initialize the graph
+      self.points = points
+      self.initializeGraph(trailPyramid, boundsIndex, renderPoints)
+
+   def loaderPartial(self, points, boundsIndex):
+      '''Show the first part of the points while the rest are loading.
+         Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+                 bounding box index (None if it isn't known yet) <bounds.BoundsIndex>
+         Output: None'''
+      #  Set the partial points and initialize the graph
+      self.points = points
+      self.initializeGraph(boundsIndex = boundsIndex)
+
+   def loaderProgressed(self, stage, fraction):
+      '''Show the loader's progress.
+         Input:  what the loader is doing <str>,
+                 fraction done <float>
+         Output: None'''
+      #  If the progress dialog is still open, update it
+      if(self.progressDialog != None):
+         self.progressDialog.setLabelText(stage)
+         self.progressDialog.setValue(int(fraction * self.progressDialog.maximum()))
+
+   def playPause(self):
+      '''Start the timer so the graph gets updated with the data points.  Update the player icon.'''
+      #  If the timer is active (running)
+      if(self.timer.isActive()):
+         #  Stop the timer
+         self.timer.stop()
+         
+         #  Stop timing the frames until playback starts again
+         self.profiler.stop()
+         
+         #  Change the play/pause button to play
+         self.playPauseButton.setIcon(self.playIcon)
+         
+         #  Set the tooltip
+         self.playPauseButton.setToolTip("Play")
+      #  Otherwise the timer is inactive (stopped)
+      else:
+         #  Start pacing the playback from now
+         self.scheduler.reset()
+         
+         #  Start the timer
+         self.timer.start()
+         
+         #  Read ahead at the playback rate
+         self.prefetchAhead()
+         
+         #  Change the play/pause button to pause
+         self.playPauseButton.setIcon(self.pauseIcon)
+         
+         #  Set the tooltip
+         self.playPauseButton.setToolTip("Pause")
+
+   def plotAnalysis(self, index = None):
+      '''Plot the picked derived quantity over time (one curve, or one per axis colored like the
+         axes).
+         Input:  index of the quantity (the picked one if None) <int>
+         Output: None'''
+      #  Drop the previous curves but keep the line that follows the slider
+      for item in self.analysisPlot.listDataItems(): self.analysisPlot.removeItem(item)
+      if(self.analysis == None): return()
+      
+      #  The quantity picked and its values over time
+      if(index == None or index < 0): index = self.analysisComboBox.currentIndex()
+      name, label, size = analysis.quantities[index]
+      series = self.analysis.series[name]
+      
+      #  Plot the curves
+      if(size == 1): self.analysisPlot.plot(series, pen = "w")
+      else:
+         for axis, pen in enumerate(["r", "g", "b"]): self.analysisPlot.plot(series[:, axis], pen = pen)
+      self.analysisPlot.setLabel("left", label)
+      self.updateAnalysisMarker()
+
+   def plotFilterEntered(self):
+      '''When a list of plots is entered in the filter line edit, show only those plots (or
+         every plot if the line edit is empty).'''
+      text = str(self.plotFilterLineEdit.text())
+      
+      #  An empty filter shows every plot
+      if(text.strip() == ""):
+         self.plotListModel.showAll()
+         return()
+      
+      try:
+         self.plotListModel.setShown(parsePlotSelection(text, len(self.plotVisible)))
+      except ValueError as error:
+         QtGui.QMessageBox.warning(self, "Error Filtering Plots", "The plots could not be filtered:\n\n" + str(error))
+
+   def plotModeChanged(self, action):
+      '''When a different way of drawing the plots is picked, recreate the plots and redraw them.
+         Input:  picked action <QAction>
+         Output: None'''
+      #  If there are points loaded
+      if(verifyPoints(self.points) == True):
+         #  Recreate the plots for the new mode
+         self.createPlots()
+         
+         #  Set the plots' points for the current slider value
+         self.getNextPoints(initialize = True)
+
+   def plotVisibilityChanged(self, particles):
+      '''When plots are shown or hidden in the plot list, redraw the graph once.
+         Input:  particle numbers that changed <np.ndarray> [int]
+         Output: None'''
+      #  A single plot only needs its own plots shown/hidden
+      if(len(particles) == 1): self.showHidePlot(int(particles[0]), bool(self.plotVisible[particles[0]]))
+      #  Otherwise, show/hide all the plots at once
+      else: self.updatePlotVisibility()
+
+   def prefetchAhead(self):
+      '''Tell the prefetcher where playback is, which way it is going and how fast.  Called
+         whenever any of those change, so reversing, looping or scrubbing replaces the chunks
+         it was going to read.'''
+      if(self.prefetcher == None): return()
+      
+      #  Steps per second while playing; when paused, only the next step is read ahead
+      rate = 0.0
+      if(self.timer.isActive() == True): rate = 1000.0 / max(1, self.timerSpinBox.value())
+      
+      direction = -1 if self.reverseButton.isChecked() else 1
+      self.prefetcher.follow(self.timeSlider.value() - 1, direction, self.stepSizeSpinBox.value(), rate, self.loopButton.isChecked())
+
+   def readLiveFrames(self):
+      '''Add the frames written to the live ring buffer since it was last read.  Nothing waits
+         on the producer; if there are no new frames, nothing changes.'''
+      #  If there is no live ring buffer, there is nothing to read
+      if(self.liveBuffer == None): return()
+      
+      #  Copy the new frames out of the ring buffer
+      frames, self.liveFrames = self.liveBuffer.read(self.liveFrames)
+      if(len(frames) == 0): return()
+      
+      #  Add the frames to the points read so far
+      first = self.liveTrajectory.count == 0
+      self.liveTrajectory.extend(frames)
+      self.points = self.liveTrajectory.points()
+      
+      #  The first frames set up the graph
+      if(first == True):
+         self.initializeGraph()
+         return()
+      
+      #  Add the new frames to the bounding boxes and to the derived quantities if they are plotted
+      self.boundsIndex.update(self.points)
+      if(self.analysis != None):
+         self.analysis.update(self.points)
+         self.plotAnalysis()
+      
+      #  Let the slider and step size reach the new frames
+      self.timeSlider.blockSignals(True)
+      self.stepSizeSpinBox.setRange(1, self.points.shape[2])
+      self.timeSlider.setRange(1, self.points.shape[2])
+      self.timeSlider.blockSignals(False)
+      
+      #  Grow the axes and grids if the particles moved past them
+      axisLimit = int(np.abs(frames).max() * 1.20)
+      if(axisLimit > self.axisLimit): self.resizeAxes(axisLimit)
+
+   def resizeAxes(self, axisLimit):
+      '''Size the x, y, and z axes and grids so they reach the given limit.
+         Input:  axis limit <int>
+         Output: None'''
+      #  Remember how far the axes reach
+      self.axisLimit = axisLimit
+      
+      #  Adjust the side of the x, y, and z axis so they fit the data
+      self.xAxis.setData(pos = np.array([[-1 * axisLimit, 0.0, 0.0], [axisLimit, 0.0, 0.0]]), color = np.array([[1.0, 0.0, 0.0, 0.4], [1.0, 0.0, 0.0, 0.4]]), width = 3.0)
+      self.yAxis.setData(pos = np.array([[0.0, -1 * axisLimit, 0.0], [0.0, axisLimit, 0.0]]), color = np.array([[0.0, 1.0, 0.0, 0.4], [0.0, 1.0, 0.0, 0.4]]), width = 3.0)
+      self.zAxis.setData(pos = np.array([[0.0, 0.0, -1 * axisLimit], [0.0, 0.0, axisLimit]]), color = np.array([[0.0, 0.0, 1.0, 0.4], [0.0, 0.0, 1.0, 0.4]]), width = 3.0)
+      
+      #  Adjust the x grid to fit the data
+      self.xGrid.resetTransform()
+      self.xGrid.rotate(90, 0, 1, 0)
+      self.xGrid.scale(x = axisLimit / 10.0, y = axisLimit / 10.0, z = axisLimit / 10.0)
+      
+      #  Adjust the y grid to fit the data
+      self.yGrid.resetTransform()
+      self.yGrid.rotate(90, 1, 0, 0)
+      self.yGrid.scale(x = axisLimit / 10.0, y = axisLimit / 10.0, z = axisLimit / 10.0)
+      
+      #  Adjust the z grid to fit the data
+      self.zGrid.resetTransform()
+      self.zGrid.scale(x = axisLimit / 10.0, y = axisLimit / 10.0, z = axisLimit / 10.0)
+
+   def rewind(self):
+      '''Increase the timer's timeout interval by the timer step size.'''
+      self.timerSpinBox.setValue(self.timerSpinBox.value() + self.timerStepSize)
+
+   def saveTimingsClicked(self):
+      '''When Save Timings is clicked, write the frame timings to a CSV or JSON file.'''
+      #  Ask for the file to write
+      fileName = QtGui.QFileDialog.getSaveFileName(self, "Save Timings", "timings.csv", "CSV Files (*.csv);;JSON Files (*.json)")
+      if(fileName == None or str(fileName) == ""): return()
+      fileName = str(fileName)
+      
+      #  Write the timings in the format picked by the file's extension
+      try:
+         if(fileName.lower().endswith(".json")): self.profiler.writeJson(fileName)
+         else: self.profiler.writeCsv(fileName)
+      except Exception as error:
+         QtGui.QMessageBox.critical(self, "Error Saving Timings", "There was an error saving the timings:\n\n" + str(error))
+
+   def setBatchedData(self):
+      '''Set the points of the batched line and scatter plots to the shown particles' trails
+         up to the current slider value.'''
+      #  The current slider value and the shown particles that could be on the screen
+      value = self.timeSlider.value()
+      self.plotCulled = ~self.getOnScreen(value)
+      particles = np.flatnonzero(self.plotVisible & ~self.plotCulled)
+      
+      #  Only show the batched plots when there is something to draw
+      self.batchLine.setVisible(len(particles) > 0 and value > 1)
+      self.batchScatter.setVisible(len(particles) > 0)
+      if(len(particles) == 0): return()
+      
+      #  Get the trails and their colors [particle [point [x, y, z]]], [particle [point [red, green, blue, alpha]]]
+      begin = time.perf_counter()
+      trails, colors = self.getTrails(particles, value, self.getDetailLevel())
+      
+      #  Pair every point with the next one so each trail is drawn as separate line segments
+      pos = np.stack([trails[:, :-1], trails[:, 1:]], axis = 2).reshape(-1, 3)
+      color = np.stack([colors[:, :-1], colors[:, 1:]], axis = 2).reshape(-1, 4)
+      
+      #  Get the beginning and ending positions and colors for every particle's markers
+      posScatter = np.stack([trails[:, 0], trails[:, -1]], axis = 1).reshape(-1, 3)
+      colorScatter = np.stack([colors[:, 0], colors[:, -1]], axis = 1).reshape(-1, 4)
+      
+      #  The size of the scatter plot points
+      size = np.tile([7.0, 10.0], len(particles))
+      sliced = time.perf_counter()
+      self.profiler.add("slice", sliced - begin)
+      
+      #  Set the data for the batched line plot if the trails have at least two points
+      if(trails.shape[1] > 1): self.batchLine.setData(pos = pos, color = color, width = 2.0)
+      
+      #  Set the data for the batched scatter plot
+      self.batchScatter.setData(pos = posScatter, color = colorScatter, size = size)
+      self.profiler.add("upload", time.perf_counter() - sliced)
+
+   def showHideAnalysis(self, show):
+      '''Show or hide the plot of the derived quantities, working them out the first time.
+         Input:  show flag <bool>
+         Output: None'''
+      self.analysisFrame.setVisible(show)
+      if(show == True and self.analysis == None and verifyPoints(self.points) == True and self.loader == None):
+         self.calculateAnalysis()
+         self.plotAnalysis()
+
+   def showHidePerformance(self, show):
+      '''Show or hide the performance overlay.
+         Input:  show flag <bool>
+         Output: None'''
+      self.performanceLabel.setVisible(show)
+      
+      #  While the overlay is shown, wait for the painting to finish so its time is measured
+      self.view.waitForPaint = show
+      
+      #  Refresh the overlay while it is shown
+      if(show == True):
+         self.updatePerformanceOverlay()
+         self.performanceTimer.start()
+      else:
+         self.performanceTimer.stop()
+
+   def showHidePlot(self, index, show):
+      '''Show or hide the plots on the graph.
+         Input:  index of plot <int>,
+                 show flag <bool>
+         Output: None'''
+      #  Set the plot's shown state
+      self.plotVisible[index] = show
+      
+      #  If the plots are played back from the GPU, stop/start drawing the plot
+      if(self.gpuAction.isChecked() == True):
+         self.gpuPlot.setVisibleParticles(self.plotVisible)
+      #  If the plots are batched, redraw them without the hidden plots
+      elif(self.batchAction.isChecked() == True):
+         self.setBatchedData()
+      #  Otherwise, show/hide the plot's own line and scatter plots
+      else:
+         #  Show/hide the line plot at the given index (plots off the screen stay hidden)
+         self.lineList[index].setVisible(show and not self.plotCulled[index])
+         
+         #  Show/hide the scatter plot at the given index
+         self.scatterList[index].setVisible(show and not self.plotCulled[index])
+
+   def showHideXGrid(self, show):
+      '''Show or hide the X grid.
+         Input:  show flag <bool>
+         Output: None'''
+      #  If show is True, add the X grid item
+      if(show == True): self.view.addItem(self.xGrid)
+      #  Otherwise, remove the X grid item
+      elif(show == False): self.view.removeItem(self.xGrid)
+
+   def showHideYGrid(self, show):
+      '''Show or hide the Y grid.
+         Input:  show flag <bool>
+         Output: None'''
+      #  If show is True, add the Y grid item to the view
+      if(show == True): self.view.addItem(self.yGrid)
+      #  Otherwise, remove the Y grid item from the view
+      elif(show == False): self.view.removeItem(self.yGrid)
+
+   def showHideZGrid(self, show):
+      '''Show or hide the Z grid.
+         Input:  show flag <bool>
+         Output: None'''
+      #  If show is True, add the Z grid item to the view
+      if(show == True): self.view.addItem(self.zGrid)
+      #  Otherwise, remove the Z grid item from the view
+      elif(show == False): self.view.removeItem(self.zGrid)
+
+   def showSelectedPlots(self):
+      '''Show the plots selected in the plot list.'''
+      self.plotListModel.setRowsShown(self.getSelectedPlots(), True)
+
+   def startLive(self, name):
+      '''Show the points a running simulation streams into a ring buffer.
+         Input:  name of the ring buffer <str>
+         Output: None'''
+      #  Stop showing any earlier live points
+      self.stopLive()
+      
+      try:
+         #  Attach to the ring buffer
+         self.liveBuffer = ringbuffer.RingBuffer.attach(name)
+      #  If the ring buffer doesn't exist, show an error message and return
+      except Exception as error:
+         QtGui.QMessageBox.critical(self, "Error Showing Live Points", "There was an error attaching to the ring buffer \"" + name + "\":\n\n" + str(error))
+         return()
+      
+      #  Start with no frames and check for new frames regularly
+      self.liveFrames = 0
+      self.liveTrajectory = ringbuffer.GrowingTrajectory(self.liveBuffer.particleCount, maxBytes = self.liveMaxBytes)
+      self.liveTimer.start()
+      self.readLiveFrames()
+
+   def stepBackward(self):
+      '''Step the graph backwards in time if the timer isn't started.'''
+      #  If the timer isn't running, update the graph with the reverse flag set to True
+      if(not self.timer.isActive()): self.updateGraph(reverse = True)
+
+   def stepForward(self):
+      '''Step the graph forwards in time if the timer isn't started.'''
+      #  If the timer isn't running, update the graph with the reverse flag set to False
+      if(not self.timer.isActive()): self.updateGraph(reverse = False)
+
+   def stopLive(self):
+      '''Stop reading live points.  The points read so far stay on the graph.'''
+      #  If there is no live ring buffer, there is nothing to stop
+      if(self.liveBuffer == None): return()
+      
+      #  Stop checking for frames and let go of the ring buffer
+      self.liveTimer.stop()
+      self.liveBuffer.close()
+      self.liveBuffer = None
+      self.lodAction.setEnabled(True)
+
+   def timeout(self):
+      '''When the timer times out, update the graph with the current state of the reverse button.'''
+      #  Start timing this frame
+      self.profiler.startTick(self.timerSpinBox.value() / 1000.0)
+      
+      #  Pick up any new live frames first so playback can move on to them
+      self.readLiveFrames()
+      
+      #  Without adaptive playback, every tick moves one step size
+      if(self.adaptiveAction.isChecked() == False):
+         self.updateGraph(reverse = self.reverseButton.isChecked())
+         return()
+      
+      #  The rate asked for by the step size and time interval (in steps per second)
+      requested = self.timerSpinBox.value() / 1000.0
+      rate = self.stepSizeSpinBox.value() / max(requested, self.scheduler.minInterval)
+      
+      #  Move the steps that are due (coalesced into one frame), or skip the frame if none are
+      begin = time.perf_counter()
+      step = self.scheduler.tick(rate, begin)
+      if(step > 0): self.updateGraph(reverse = self.reverseButton.isChecked(), step = step)
+      else: self.profiler.skipTick()
+      self.scheduler.addCost(time.perf_counter() - begin)
+      
+      #  Wait at least as long as a frame takes before the next tick, so ticks don't queue up
+      if(self.timer.isActive() == True): self.timer.start(int(round(self.scheduler.interval(requested) * 1000.0)))
+
+   def timeSliderChanged(self, value):
+      '''When the slider's value changes.
+         Input:  slider value <int>
+         Output: None'''
+      #  Move the read ahead to the new point before drawing it
+      self.prefetchAhead()
+      
+      #  Set each of the plots' next points but don't update the slider
+      self.getNextPoints(initialize = True)
+      
+      #  Update the counter and the analysis plot's line with the current slider value
+      self.counterLineEdit.setText(str(self.timeSlider.value()))
+      self.updateAnalysisMarker()
+      
+      #  If the points are joined from shards, say which shard the point is in
+      if(isinstance(self.points, store.ChunkedTrajectory) and isinstance(self.points.source, shards.ShardedTrajectory)):
+         self.timeSlider.setToolTip(self.points.source.describe(self.timeSlider.value() - 1))
+      else: self.timeSlider.setToolTip("")
+
+   def updateAnalysisMarker(self):
+      '''Move the analysis plot's line to the point the time slider is at.'''
+      if(self.analysisFrame.isVisible() == False): return()
+      self.analysisMarker.blockSignals(True)
+      self.analysisMarker.setValue(max(self.timeSlider.value() - 1, 0))
+      self.analysisMarker.blockSignals(False)
+
+   def updateGraph(self, reverse = False, step = None):
+      '''Update the graph with the current data points taking into account the
+         given reverse flag.
+         Input:  reverse flag <bool>,
+                 number of points to move (defaults to the step size) <int>
+         Output: None'''
+      #  If the time slider has reached its lowest value and playback is going in reverse
+      if(self.timeSlider.value() <= 1 and reverse == True):
+         #  If the looping button has not been checked and the timer is active (playback is running)
+         if(self.loopButton.isChecked() == False and self.timer.isActive() == True):
+            #  Pause the playback
+            self.playPause()
+         
+         #  Uncheck the reverse button
+         self.reverseButton.setChecked(False)
+      #  Else if live points are shown and playback has caught up with them, wait for more frames
+      elif(self.liveBuffer != None and self.liveBuffer.isFinished() == False and self.timeSlider.value() >= self.points.shape[2] and reverse == False):
+         pass
+      #  Else if the time slider has reached its highest value and playback is going forward
+      elif(self.timeSlider.value() >= self.points.shape[2] and reverse == False):
+         #  If the looping button has not been checked and the timer is active (playback is running)
+         if(self.loopButton.isChecked() == False and self.timer.isActive() == True):
+            #  Pause the playback
+            self.playPause()
+         
+         #  Check the reverse button
+         self.reverseButton.setChecked(True)
+      #  Otherwise, get the next set of points with the given reverse flag
+      else:
+         self.getNextPoints(reverse = reverse, step = step)
+      
+      #  Update the counter's value and the analysis plot's line
+      self.counterLineEdit.setText(str(self.timeSlider.value()))
+      self.updateAnalysisMarker()
+
+   def updatePerformanceOverlay(self):
+      '''Show the frames per second and the percentiles of every stage of the recent frames.'''
+      count, fps, percentiles = self.profiler.summary()
+      
+      #  A line for the frame rate, then one per stage
+      lines = ["%.1f fps over %d frames" % (fps, count), "%-9s %7s %7s %7s" % ("ms", "p50", "p95", "p99")]
+      for stage in profiling.stages:
+         if(stage in percentiles): lines.append("%-9s %7.2f %7.2f %7.2f" % ((stage,) + percentiles[stage]))
+      
+      self.performanceLabel.setText("\n".join(lines))
+      self.performanceLabel.adjustSize()
+
+   def updatePlotVisibility(self):
+      '''Show or hide every particle's plots to match their shown state.'''
+      #  If the plots are played back from the GPU, draw only the shown plots
+      if(self.gpuAction.isChecked() == True):
+         self.gpuPlot.setVisibleParticles(self.plotVisible)
+      #  If the plots are batched, redraw them once without the hidden plots
+      elif(self.batchAction.isChecked() == True):
+         self.setBatchedData()
+      #  Otherwise, show/hide each particle's own line and scatter plots
+      else:
+         for index in range(len(self.lineList)):
+            self.lineList[index].setVisible(bool(self.plotVisible[index] and not self.plotCulled[index]))
+            self.scatterList[index].setVisible(bool(self.plotVisible[index] and not self.plotCulled[index]))
+
+   def viewPainted(self, seconds):
+      '''When the view has been painted, add the time taken to the current frame.
+         Input:  seconds taken to paint <float>
+         Output: None'''
+      self.profiler.add("paint", seconds)
+      self.scheduler.addCost(seconds)
+      
+      #  If the camera was moved while paused, work out again which plots are off the screen
+      if(self.cullMatrix is not None and self.cullAction.isChecked() == True and self.gpuAction.isChecked() == False and self.timer.isActive() == False):
+         if(np.array_equal(self.cullMatrix, self.getViewMatrix()) == False):
+            self.cullMatrix = None
+            QtCore.QTimer.singleShot(0, lambda: self.getNextPoints(initialize = True))
+
+class PlotListModel(QtCore.QAbstractListModel):
+   '''The rows of the plot list: an "All Plots" row followed by a row for every plot.  The rows
+      are backed by an array of the plots' shown flags, so no item is stored for each plot, and
+      any number of plots can be shown or hidden at once with a single update.
+      Input:  None
+      Output: None'''
+   #  Emitted with the particle numbers whose shown state changed
+   visibilityChanged = QtCore.pyqtSignal(object)
+
+   def __init__(self):
+      #  Initialize the parent
+      QtCore.QAbstractListModel.__init__(self)
+      
+      #  The plots' shown flags and how many are shown
+      self.visible = np.ones(0, dtype = bool)
+      self.shownCount = 0
+
+   def data(self, index, role = QtCore.Qt.DisplayRole):
+      '''Get the text or check state of a row.
+         Input:  row <QModelIndex>,
+                 role <int>
+         Output: text <str>, check state <int> or None'''
+      row = index.row()
+      
+      #  The text of the row
+      if(role == QtCore.Qt.DisplayRole):
+         if(row == 0): return("All Plots")
+         return("Plot " + str(row))
+      
+      #  The check state of the row ("All Plots" is partly checked when only some plots are shown)
+      if(role == QtCore.Qt.CheckStateRole):
+         if(row == 0):
+            if(self.shownCount == len(self.visible)): return(QtCore.Qt.Checked)
+            if(self.shownCount == 0): return(QtCore.Qt.Unchecked)
+            return(QtCore.Qt.PartiallyChecked)
+         return(QtCore.Qt.Checked if self.visible[row - 1] else QtCore.Qt.Unchecked)
+      
+      return(None)
+
+   def flags(self, index):
+      '''Every row can be checked and selected.
+         Input:  row <QModelIndex>
+         Output: flags <int>'''
+      return(QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable)
+
+   def invert(self):
+      '''Show the hidden plots and hide the shown plots.'''
+      self.setShown(~self.visible)
+
+   def rowCount(self, parent = QtCore.QModelIndex()):
+      '''The number of rows ("All Plots" and every plot).
+         Input:  parent <QModelIndex>
+         Output: number of rows <int>'''
+      if(parent.isValid()): return(0)
+      return(len(self.visible) + 1)
+
+   def setData(self, index, value, role = QtCore.Qt.EditRole):
+      '''Show or hide the plots of a row when it is checked or unchecked.
+         Input:  row <QModelIndex>,
+                 check state <int>,
+                 role <int>
+         Output: True if the row was changed <bool>'''
+      if(role != QtCore.Qt.CheckStateRole): return(False)
+      show = value == QtCore.Qt.Checked
+      
+      #  "All Plots" shows/hides every plot, any other row just its own plot
+      if(index.row() == 0): self.setShown(np.full(len(self.visible), show))
+      else: self.setRowsShown(np.arange(len(self.visible)) == index.row() - 1, show)
+      return(True)
+
+   def setRowsShown(self, rows, show):
+      '''Show or hide some of the plots.
+         Input:  flags of the plots to change <np.ndarray> [bool],
+                 show flag <bool>
+         Output: None'''
+      shown = self.visible.copy()
+      shown[rows] = show
+      self.setShown(shown)
+
+   def setShown(self, shown):
+      '''Set the shown state of every plot in one step.  The list is updated and
+         visibilityChanged is emitted once, with the plots that changed.
+         Input:  shown flags <np.ndarray> [bool]
+         Output: None'''
+      changed = np.flatnonzero(shown != self.visible)
+      if(len(changed) == 0): return()
+      
+      #  Change the flags in place (the graph shares the array)
+      self.visible[:] = shown
+      self.shownCount = int(np.count_nonzero(self.visible))
+      
+      #  Update the rows that changed and "All Plots"
+      self.dataChanged.emit(self.index(0), self.index(0))
+      self.dataChanged.emit(self.index(int(changed[0]) + 1), self.index(int(changed[-1]) + 1))
+      self.visibilityChanged.emit(changed)
+
+   def setVisibility(self, visible):
+      '''Use a new array of shown flags (when new points are shown).
+         Input:  shown flags <np.ndarray> [bool]
+         Output: None'''
+      self.beginResetModel()
+      self.visible = visible
+      self.shownCount = int(np.count_nonzero(visible))
+      self.endResetModel()
+
+   def showAll(self):
+      '''Show every plot.'''
+      self.setShown(np.ones(len(self.visible), dtype = bool))
+
+   def showNone(self):
+      '''Hide every plot.'''
+      self.setShown(np.zeros(len(self.visible), dtype = bool))
+
+class PointsLoader(QtCore.QThread):
+   '''Loads a points file and prepares it for the graph in a background thread, so the window
+      keeps responding and loading can be cancelled.
+      Input:  file name, or shard file names, manifest or pattern <str or list>,
+              level of detail flag <bool>
+      Output: None'''
+   #  Emitted with what the loader is doing and the fraction done
+   progressed = QtCore.pyqtSignal(str, float)
+   
+   #  Emitted once with the first points that can be shown while the rest are loading and their
+   #  bounding box index (or None)
+   partial = QtCore.pyqtSignal(object, object)
+   
+   #  Emitted with the points, their decimated trails (or None), their bounding box index and
+   #  their render layout (or None) when loading is done
+   loaded = QtCore.pyqtSignal(object, object, object, object)
+   
+   #  Emitted with an error message if loading fails
+   failed = QtCore.pyqtSignal(str)
+   
+   #  Emitted if loading is cancelled
+   cancelled = QtCore.pyqtSignal()
+
+   def __init__(self, fileName, levelOfDetail = False):
+      #  Initialize the parent
+      QtCore.QThread.__init__(self)
+      
+      #  The file to load and whether the trails should be decimated
+      self.fileName = fileName
+      self.levelOfDetail = levelOfDetail
+      
+      #  Set when loading should stop
+      self.stopRequested = False
+      
+      #  Set once the first points have been sent to the graph
+      self.partialSent = False
+
+   def cancel(self):
+      '''Ask the loader to stop at the next chance it gets.'''
+      self.stopRequested = True
+
+   def indexProgress(self, fraction):
+      '''Report the progress of finding the bounding boxes of the points.
+         Input:  fraction done <float>
+         Output: None'''
+      #  Stop if loading was cancelled
+      if(self.stopRequested == True): raise(trajectory.LoadCancelled())
+      
+      #  Report the progress
+      self.progressed.emit("Finding bounds...", fraction)
+
+   def layoutProgress(self, fraction):
+      '''Report the progress of copying the points into the render layout.
+         Input:  fraction done <float>
+         Output: None'''
+      #  Stop if loading was cancelled
+      if(self.stopRequested == True): raise(trajectory.LoadCancelled())
+      
+      #  Report the progress
+      self.progressed.emit("Arranging points...", fraction)
+
+   def prepareProgress(self, fraction):
+      '''Report the progress of preparing the points.
+         Input:  fraction done <float>
+         Output: None'''
+      #  Stop if loading was cancelled
+      if(self.stopRequested == True): raise(trajectory.LoadCancelled())
+      
+      #  Report the progress
+      self.progressed.emit("Preparing trails...", fraction)
+
+   def readProgress(self, fraction, points):
+      '''Report the progress of reading the points and send the first points read to the graph.
+         Input:  fraction done <float>,
+                 particles read so far <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]
+         Output: None'''
+      #  Stop if loading was cancelled
+      if(self.stopRequested == True): raise(trajectory.LoadCancelled())
+      
+      #  Report the progress
+      self.progressed.emit("Reading points...", fraction)
+      
+      #  Send a copy of the first particles read so they can be shown right away
+      if(self.partialSent == False and points is not None):
+         self.partialSent = True
+         self.partial.emit(np.array(points), None)
+
+   def run(self):
+      '''Load the points, then decimate their trails if needed.'''
+      try:
+         #  Load the points (binary files are memory-mapped, text files are parsed)
+         points = trajectory.loadPoints(self.fileName, progress = self.readProgress)
+         
+         #  The points must be verified
+         if(verifyPoints(points) == False): raise(ValueError("Verfication Failed"))
+         
+         #  Find the bounding boxes of the points in one pass (for binary, compressed and shard
+         #  manifest files they are saved next to the file, so this is only done once)
+         if(shards.isShardName(self.fileName) == True): boundsIndex = shards.indexShards(self.fileName, points, self.indexProgress)
+         elif(trajectory.isTextFile(self.fileName) == False): boundsIndex = bounds.indexFile(self.fileName, points, self.indexProgress)
+         else: boundsIndex = bounds.BoundsIndex(points, progress = self.indexProgress)
+         
+         #  Show the points while the trails are prepared
+         if(self.partialSent == False):
+            self.partialSent = True
+            self.partial.emit(points, boundsIndex)
+         
+         #  Decimate the trails if the level of detail is (or will be) turned on
+         trailPyramid = None
+         if(self.levelOfDetail == True or points.shape[2] >= Graph.lodPointCount):
+            trailPyramid = lod.TrailPyramid(points, Graph.lodMaxBytes, progress = self.prepareProgress)
+         
+         #  Copy the points into the render layout if it fits in memory
+         renderPoints = None
+         if(isinstance(points, np.ndarray) and points.size * 4 <= Graph.renderMaxBytes):
+            renderPoints = trajectory.renderLayout(points, self.layoutProgress)
+         
+         #  Send the points to the graph
+         self.loaded.emit(points, trailPyramid, boundsIndex, renderPoints)
+      #  If loading was cancelled, say so
+      except trajectory.LoadCancelled:
+         self.cancelled.emit()
+      #  If loading fails, send the error message
+      except Exception as error:
+         self.failed.emit(str(error))
+
+def run(points, liveName = None):
+   '''Start the application and run it until it is closed.
+      Input:  array of points or None <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              name of a ring buffer to show live points from <str>
+      Output: None'''
+   #  Set the graphics system to native
+   QtGui.QApplication.setGraphicsSystem("native")
+   
+   #  Create the application
+   app = App(points, liveName)
+   
+   #  Start the application loop
+   sys.exit(app.exec_())
@@ -0,0 +1,243 @@
+#  Level of detail (LOD) for long particle trails.
+#
+#  A trail with millions of points drawn in a window a few hundred pixels wide puts many points on
+#  every pixel.  TrailPyramid keeps smaller copies of every trail, each with half the points of the
+#  one before it.  The trails are split into buckets of points and each bucket keeps its first point
+#  and the point farthest from the line between its first and last points, so the bends of an
+#  orbit survive.  When a trail is drawn, the coarsest copy whose points are still about a pixel
+#  apart is used, joined to the points near the head of the trail at full resolution.
+#
+#  Level 0 is the full trail.  Level k keeps 2 points out of every 2^(k + 1).
+#
+#  The levels are built in a single pass over the time axis, a block of points at a time, so
+#  points kept on the disk are read once.  A block holds whole buckets of the finer levels; the
+#  buckets of the coarser levels span several blocks, so the farthest point found so far is
+#  carried from block to block (the bucket's last point is read ahead when the bucket starts).
+
+import numpy as np
+import store
+
+#  The number of values read at a time while building the levels
+blockValues = 2 ** 21
+
+class TrailPyramid(object):
+   '''Decimated copies of every particle's trail.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              most memory the copies may use (in bytes) <int>,
+              function called with the fraction done after each block of points <function(fraction <float>)>
+      Output: None'''
+   def __init__(self, points, maxBytes = None, progress = None):
+      #  The number of particles and the number of points in each trail
+      particleCount, axisCount, pointCount = points.shape
+      
+      #  The decimated trails and the index of every kept point for each level
+      #  [level [particle [point [x, y, z]]]], [level [particle [point index]]]
+      self.positions = [None]
+      self.indexes = [None]
+      
+      #  Add levels while the trails still have at least two buckets
+      level = 1
+      while(pointCount // self.bucketSize(level) >= 2):
+         self.positions.append(None)
+         self.indexes.append(None)
+         level += 1
+      
+      #  The bytes used by each point kept (3 float32 values and an int32 index)
+      pointBytes = particleCount * 16
+      
+      #  Leave out the finest levels until the rest fit in the memory allowed (the coarsest level
+      #  is always kept, so there is something to draw instead of the full trails)
+      self.firstLevel = 1
+      if(maxBytes != None):
+         while(self.firstLevel < len(self.positions) - 1 and pointBytes * 2 * pointCount // self.bucketSize(self.firstLevel) > maxBytes):
+            self.firstLevel += 1
+      
+      #  Create the arrays for the kept levels
+      for level in range(self.firstLevel, len(self.positions)):
+         bucketCount = pointCount // self.bucketSize(level)
+         self.positions[level] = np.empty((particleCount, 2 * bucketCount, 3), dtype = np.float32)
+         self.indexes[level] = np.empty((particleCount, 2 * bucketCount), dtype = np.int32)
+      
+      #  Whether the full trails can be drawn instead of a left out level without reading the disk
+      self.inMemory = isinstance(points, np.ndarray) and not isinstance(points, np.memmap)
+      
+      #  The sum of the distances between points of the trails
+      stepTotal = 0.0
+      
+      #  Read points kept on the disk straight from their source so the working set isn't flushed
+      source = points.source if isinstance(points, store.ChunkedTrajectory) else points
+      
+      #  The number of points in a block (a power of 2, so a block holds whole buckets of the
+      #  fine levels and lies inside a single bucket of each coarse level)
+      blockPoints = 4
+      while(blockPoints * 2 * max(1, particleCount) * 3 <= blockValues): blockPoints *= 2
+      levels = range(self.firstLevel, len(self.positions))
+      fineLevels = [level for level in levels if self.bucketSize(level) <= blockPoints]
+      coarseLevels = [level for level in levels if self.bucketSize(level) > blockPoints]
+      
+      #  For each coarse level, the current bucket's first and last points and the farthest point
+      #  found in it so far (its distance, index and position)
+      buckets = {}
+      
+      #  The last points of coarse buckets that have been read ahead, by point index
+      lastPoints = {}
+      
+      #  The last point of the previous block (for the step across the join)
+      previous = None
+      
+      #  Go through each block of time
+      for start in range(0, pointCount, blockPoints):
+         stop = min(start + blockPoints, pointCount)
+         
+         #  Get the block's trails [particle [point [x, y, z]]]
+         trails = np.transpose(np.asarray(source[:, :, start:stop]), (0, 2, 1)).astype(np.float32)
+         
+         #  Add the block's step lengths (including the one from the previous block)
+         joined = trails if previous is None else np.concatenate([previous, trails], axis = 1)
+         if(joined.shape[1] > 1): stepTotal += float(np.sqrt((np.diff(joined, axis = 1) ** 2).sum(axis = 2)).sum())
+         previous = trails[:, -1:]
+         
+         #  Fill in the fine levels' buckets that are in the block
+         for level in fineLevels:
+            size = self.bucketSize(level)
+            positions, indexes = self.decimate(trails, size)
+            first = 2 * (start // size)
+            self.positions[level][:, first:first + positions.shape[1]] = positions
+            self.indexes[level][:, first:first + indexes.shape[1]] = indexes + start
+         
+         #  Carry the coarse levels' buckets on through the block
+         for level in coarseLevels:
+            size = self.bucketSize(level)
+            bucketNum = start // size
+            
+            #  Points after the last whole bucket aren't kept
+            if(bucketNum >= self.positions[level].shape[1] // 2): continue
+            
+            #  When a bucket starts, read its last point ahead
+            if(start % size == 0):
+               end = start + size - 1
+               if(end not in lastPoints): lastPoints[end] = np.asarray(source[:, :, end], dtype = np.float32)
+               buckets[level] = [trails[:, 0], lastPoints[end], np.full(particleCount, -np.inf, dtype = np.float32), np.zeros(particleCount, dtype = np.int64), trails[:, 0]]
+            first, last, farthest, farthestIndex, farthestPosition = buckets[level]
+            
+            #  Each point's distance from the line between the bucket's first and last points (the
+            #  first point itself is never picked)
+            distance = chordDistance(trails - first[:, np.newaxis], (last - first)[:, np.newaxis])
+            if(start % size == 0): distance[:, 0] = -np.inf
+            
+            #  Keep the block's farthest point if it is farther (np.argmax picks the first NaN, so
+            #  a NaN found earlier is kept and a NaN found now replaces a number)
+            blockIndex = np.argmax(distance, axis = 1)
+            blockDistance = distance[np.arange(particleCount), blockIndex]
+            farther = ~np.isnan(farthest) & ((blockDistance > farthest) | np.isnan(blockDistance))
+            farthest[farther] = blockDistance[farther]
+            farthestIndex[farther] = start + blockIndex[farther]
+            farthestPosition = np.where(farther[:, np.newaxis], trails[np.arange(particleCount), blockIndex], farthestPosition)
+            buckets[level][4] = farthestPosition
+            
+            #  When the bucket ends, store its first and farthest points
+            if(stop == start - start % size + size):
+               self.positions[level][:, 2 * bucketNum] = first
+               self.positions[level][:, 2 * bucketNum + 1] = farthestPosition
+               self.indexes[level][:, 2 * bucketNum] = bucketNum * size
+               self.indexes[level][:, 2 * bucketNum + 1] = farthestIndex
+               lastPoints.pop(stop - 1, None)
+         
+         #  Report the progress
+         if(progress != None): progress(float(stop) / pointCount)
+      
+      #  The average distance between two points of a trail
+      self.stepLength = 0.0
+      if(pointCount > 1 and particleCount > 0): self.stepLength = stepTotal / (particleCount * (pointCount - 1))
+
+   def bucketSize(self, level):
+      '''The number of points in a bucket at the given level.
+         Input:  level <int>
+         Output: bucket size <int>'''
+      return(2 ** (level + 1))
+
+   def decimate(self, trails, bucketSize):
+      '''Keep the first point of every bucket and the point farthest from the line between the
+         bucket's first and last points.
+         Input:  trails <np.ndarray> [particle [point [x, y, z]]],
+                 bucket size <int>
+         Output: kept points <np.ndarray> [particle [point [x, y, z]]],
+                 index of every kept point <np.ndarray> [particle [point index]]'''
+      #  Split the trails into buckets [particle [bucket [point [x, y, z]]]]
+      particleCount, pointCount, axisCount = trails.shape
+      bucketCount = pointCount // bucketSize
+      buckets = trails[:, :bucketCount * bucketSize].reshape(particleCount, bucketCount, bucketSize, 3)
+      
+      #  The line from each bucket's first point to its last point and each point's offset from the first point
+      first = buckets[:, :, :1]
+      chord = buckets[:, :, -1:] - first
+      offsets = buckets - first
+      
+      #  Each point's distance from the line
+      distance = chordDistance(offsets, chord)
+      
+      #  The farthest point after the first one in each bucket
+      farthest = np.argmax(distance[:, :, 1:], axis = 2) + 1
+      
+      #  Put the first and farthest points of each bucket one after the other
+      kept = np.stack([np.zeros_like(farthest), farthest], axis = 2)
+      positions = np.take_along_axis(buckets, kept[:, :, :, np.newaxis], axis = 2)
+      indexes = kept + (np.arange(bucketCount) * bucketSize)[np.newaxis, :, np.newaxis]
+      
+      return(positions.reshape(particleCount, -1, 3), indexes.reshape(particleCount, -1))
+
+   def pickLevel(self, worldPerPixel, pixels = 1.0):
+      '''Pick the coarsest level whose points are still no more than the given number of pixels
+         apart.  If that level was left out to save memory, the full trail (level 0) is used when
+         the points are in memory, and the finest level kept is used when they are on the disk
+         (so zooming in never reads the whole run).
+         Input:  size of a pixel in world units <float>,
+                 most pixels between drawn points <float>
+         Output: level <int>'''
+      #  If the trails don't move, any level looks the same
+      if(self.stepLength <= 0): return(len(self.positions) - 1)
+      
+      #  The points of level k are about 2^k steps apart
+      level = int(np.floor(np.log2(max(1.0, pixels * worldPerPixel / self.stepLength))))
+      level = min(level, len(self.positions) - 1)
+      
+      #  If the level wasn't kept, use the full trail if it is in memory or the finest level kept
+      if(level < self.firstLevel): return(0 if self.inMemory == True else self.firstLevel)
+      return(level)
+
+   def trails(self, points, particles, stop, level, headPoints):
+      '''Get the particles' trails up to the given point at the given level.  The last headPoints
+         points (or more, up to the next bucket) are always at full resolution.
+         Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+                 particle numbers <np.ndarray> [int],
+                 index after the last point <int>,
+                 level <int>,
+                 number of points at full resolution near the head of the trail <int>
+         Output: points <np.ndarray> [particle [point [x, y, z]]],
+                 index of every point <np.ndarray> [particle [point index]]'''
+      #  The buckets that end before the head of the trail come from the level's copy
+      bucketCount = 0
+      if(level > 0): bucketCount = max(0, stop - headPoints) // self.bucketSize(level)
+      cut = bucketCount * self.bucketSize(level)
+      
+      #  The head of the trail at full resolution
+      head = np.transpose(points[particles, :, cut:stop], (0, 2, 1))
+      headIndexes = np.broadcast_to(np.arange(cut, stop), head.shape[:2])
+      
+      #  If nothing comes from the level's copy, return the head only
+      if(bucketCount == 0): return(head, headIndexes)
+      
+      #  Join the decimated points to the head
+      positions = np.concatenate([self.positions[level][particles, :2 * bucketCount], head], axis = 1)
+      indexes = np.concatenate([self.indexes[level][particles, :2 * bucketCount], headIndexes], axis = 1)
+      return(positions, indexes)
+
+def chordDistance(offsets, chord):
+   '''Get the distance of points from a line through the origin (or from the origin if the line
+      has no length).
+      Input:  points' offsets from the line's start <np.ndarray> [... [x, y, z]],
+              the line's direction and length <np.ndarray> [... [x, y, z]]
+      Output: distances <np.ndarray> [...]'''
+   chordLength = np.sqrt((chord ** 2).sum(axis = -1))
+   distance = np.sqrt((np.cross(offsets, chord) ** 2).sum(axis = -1)) / np.maximum(chordLength, np.finfo(np.float32).tiny)
+   return(np.where(chordLength > 0, distance, np.sqrt((offsets ** 2).sum(axis = -1))))
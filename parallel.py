@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+#  Force evaluation spread over many cores.
+#
+#  The particles whose accelerations are worked out (the targets) are split into runs, and each
+#  run is given to a worker process.  The positions, masses and accelerations live in shared
+#  memory (multiprocessing.shared_memory), so a step only sends each worker the range of targets
+#  to do; nothing else is pickled.  Any force kernel that takes a targets slice works
+#  (simulation.accelerations and barneshut.accelerations both do), and every target is worked
+#  out the same way it would be in a single process.
+#
+#  Example
+#     import simulation, parallel
+#     with parallel.ParallelAccelerations(len(positions)) as acceleration:
+#        points = simulation.simulate(positions, velocities, masses, 0.001, 2000, acceleration = acceleration)
+#
+#  Check the speedup and the difference from a single process with
+#     python3 parallel.py --particles 20000 --workers 1 2 4 8
+
+import argparse
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import simulation
+
+#  Set in each worker process by initializeWorker
+workerArrays = None
+workerKernel = None
+
+def attachArrays(names, particleCount):
+   '''Make numpy arrays on top of the shared memory blocks.
+      Input:  names of the position, mass and acceleration blocks <tuple> [str],
+              number of particles <int>
+      Output: shared memory blocks <list> [SharedMemory],
+              positions <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              accelerations <np.ndarray> [particle [x, y, z]]'''
+   blocks = [shared_memory.SharedMemory(name = name) for name in names]
+   positions = np.ndarray((particleCount, 3), dtype = np.float64, buffer = blocks[0].buf)
+   masses = np.ndarray((particleCount,), dtype = np.float64, buffer = blocks[1].buf)
+   accelerations = np.ndarray((particleCount, 3), dtype = np.float64, buffer = blocks[2].buf)
+   return(blocks, positions, masses, accelerations)
+
+def initializeWorker(names, particleCount, kernel):
+   '''Attach a worker process to the shared arrays.
+      Input:  names of the position, mass and acceleration blocks <tuple> [str],
+              number of particles <int>,
+              force kernel <function(positions, masses, G, softening, targets = slice)>
+      Output: None'''
+   global workerArrays, workerKernel
+   workerArrays = attachArrays(names, particleCount)
+   workerKernel = kernel
+
+def computeTargets(task):
+   '''Work out the accelerations of a run of targets into the shared accelerations.
+      Input:  (first target <int>, last target + 1 <int>, gravitational constant <float>, softening length <float>)
+      Output: None'''
+   start, stop, G, softening = task
+   blocks, positions, masses, accelerations = workerArrays
+   accelerations[start:stop] = workerKernel(positions, masses, G, softening, targets = slice(start, stop))
+
+class ParallelAccelerations(object):
+   '''An acceleration function for simulation.simulate that spreads the targets over a pool of
+      processes sharing the particle arrays.  Close it (or use it in a with statement) to end
+      the processes and free the shared memory.
+      Input:  number of particles <int>,
+              number of worker processes (defaults to the number of cores) <int>,
+              force kernel <function(positions, masses, G, softening, targets = slice)>,
+              number of runs the targets are split into per worker <int>
+      Output: None'''
+   def __init__(self, particleCount, workers = None, kernel = simulation.accelerations, runsPerWorker = 4):
+      if(workers == None): workers = multiprocessing.cpu_count()
+      self.particleCount = particleCount
+      self.workers = workers
+      
+      #  The shared blocks for the positions, masses and accelerations
+      sizes = [particleCount * 3 * 8, particleCount * 8, particleCount * 3 * 8]
+      self.blocks = [shared_memory.SharedMemory(create = True, size = max(1, size)) for size in sizes]
+      names = tuple(block.name for block in self.blocks)
+      self.positions = np.ndarray((particleCount, 3), dtype = np.float64, buffer = self.blocks[0].buf)
+      self.masses = np.ndarray((particleCount,), dtype = np.float64, buffer = self.blocks[1].buf)
+      self.accelerations = np.ndarray((particleCount, 3), dtype = np.float64, buffer = self.blocks[2].buf)
+      
+      #  The runs of targets handed out each step (a few per worker, so uneven runs even out)
+      edges = np.linspace(0, particleCount, min(particleCount, workers * runsPerWorker) + 1).astype(int)
+      self.runs = [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+      
+      #  Start the workers
+      self.pool = multiprocessing.Pool(workers, initializer = initializeWorker, initargs = (names, particleCount, kernel))
+
+   def __call__(self, positions, masses, G = 1.0, softening = 0.0):
+      '''Work out the acceleration of every particle.
+         Input:  positions <np.ndarray> [particle [x, y, z]],
+                 masses <np.ndarray> [particle],
+                 gravitational constant <float>,
+                 softening length <float>
+         Output: accelerations <np.ndarray> [particle [x, y, z]]'''
+      #  Copy the particles into shared memory
+      self.positions[:] = positions
+      self.masses[:] = masses
+      
+      #  Every worker writes its runs straight into the shared accelerations
+      self.pool.map(computeTargets, [(start, stop, G, softening) for start, stop in self.runs], chunksize = 1)
+      
+      #  Return a copy; the shared array is overwritten by the next call
+      return(self.accelerations.copy())
+
+   def __enter__(self):
+      return(self)
+
+   def __exit__(self, kind, value, traceback):
+      self.close()
+
+   def close(self):
+      '''End the worker processes and free the shared memory.'''
+      #  Stop the workers
+      if(self.pool != None):
+         self.pool.close()
+         self.pool.join()
+         self.pool = None
+      
+      #  Drop the arrays on top of the blocks before freeing them
+      self.positions = self.masses = self.accelerations = None
+      for block in self.blocks:
+         block.close()
+         block.unlink()
+      self.blocks = []
+
+def main():
+   '''Time the parallel backend against a single process for the worker counts given on the
+      command line.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Compare the parallel force backend with a single process.")
+   parser.add_argument("--particles", type = int, default = 10000, help = "number of particles")
+   parser.add_argument("--workers", type = int, nargs = "+", default = [1, 2, 4, 8], help = "worker counts to try")
+   parser.add_argument("--softening", type = float, default = 0.01, help = "softening length")
+   args = parser.parse_args()
+   
+   positions, velocities, masses = simulation.randomCluster(args.particles, seed = 0)
+   
+   #  The single process result
+   begin = time.time()
+   expected = simulation.accelerations(positions, masses, softening = args.softening)
+   single = time.time() - begin
+   print("%-8s %10s %9s %16s" % ("workers", "seconds", "speedup", "max difference"))
+   print("%-8s %10.3f %9.2f %16.3e" % ("single", single, 1.0, 0.0))
+   
+   #  The parallel results (the first call is not timed since it starts the workers)
+   for workers in args.workers:
+      with ParallelAccelerations(args.particles, workers) as acceleration:
+         acceleration(positions, masses, softening = args.softening)
+         begin = time.time()
+         result = acceleration(positions, masses, softening = args.softening)
+         seconds = time.time() - begin
+      print("%-8d %10.3f %9.2f %16.3e" % (workers, seconds, single / seconds, np.abs(result - expected).max()))
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
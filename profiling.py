@@ -0,0 +1,156 @@
+#  Per-frame timing of the nBody graph's playback.
+#
+#  Every timer tick of playback that draws a frame gets a row of samples: how long after the
+#  previous frame it fired, the interval that was asked for, and how long each stage of drawing
+#  the frame took (ticks that don't draw, such as when adaptive playback has no step due, are
+#  dropped so they don't count as frames):
+#     interval  - the time from the previous frame's tick to this one
+#     requested - the timer interval set in the graph (timerSpinBox)
+#     slice     - getting the trails and colors out of the points
+#     upload    - handing the new data to the plots (setData / setDrawRange)
+#     paint     - OpenGL painting of the view
+#  The rows are kept in a ring, so only the most recent ones are kept and the memory used
+#  doesn't grow.  The samples can be summarized (frames per second and percentiles of every
+#  stage) or written to a CSV or JSON file.
+
+import csv
+import json
+import time
+import numpy as np
+
+#  The stages timed for every tick
+stages = ["interval", "requested", "slice", "upload", "paint"]
+
+#  The number of ticks kept by default
+defaultCapacity = 1000
+
+class FrameProfiler(object):
+   '''A ring of per-tick timing samples.
+      Input:  number of ticks to keep <int>
+      Output: None'''
+   def __init__(self, capacity = defaultCapacity):
+      #  The samples (in seconds) and the time each tick started
+      self.samples = np.full((capacity, len(stages)), np.nan)
+      self.times = np.full(capacity, np.nan)
+      self.capacity = capacity
+      
+      #  The number of ticks recorded (including ones written over), the current tick's row and
+      #  when it started, and when the last recorded tick started (None after a pause)
+      self.count = 0
+      self.current = None
+      self.currentTime = 0.0
+      self.lastTime = None
+      
+      #  The stage columns by name
+      self.columns = dict((stage, column) for column, stage in enumerate(stages))
+
+   def add(self, stage, seconds):
+      '''Add time to a stage of the current tick.  Nothing is added between ticks (when the
+         graph isn't playing).
+         Input:  stage name <str>,
+                 seconds <float>
+         Output: None'''
+      if(self.current is None): return()
+      self.current[self.columns[stage]] += seconds
+
+   def clear(self):
+      '''Drop every sample.'''
+      self.samples[:] = np.nan
+      self.times[:] = np.nan
+      self.count = 0
+      self.current = None
+      self.lastTime = None
+
+   def finishTick(self):
+      '''Store the current tick's samples in the ring.'''
+      if(self.current is None): return()
+      self.samples[self.count % self.capacity] = self.current
+      self.times[self.count % self.capacity] = self.currentTime
+      self.count += 1
+      self.current = None
+      self.lastTime = self.currentTime
+
+   def rows(self):
+      '''Get the stored ticks from the oldest to the newest.
+         Input:  None
+         Output: start times <np.ndarray> [tick],
+                 samples <np.ndarray> [tick [stage]]'''
+      #  The rows in the order they were recorded
+      order = np.arange(max(0, self.count - self.capacity), self.count) % self.capacity
+      return(self.times[order], self.samples[order])
+
+   def skipTick(self):
+      '''Drop the current tick without storing it (when it didn't draw a frame).'''
+      self.current = None
+
+   def startTick(self, requested = 0.0):
+      '''Start timing a new tick.  The previous tick (and its painting, which happens after the
+         timer handler returns) is stored first.
+         Input:  interval asked for in the graph (in seconds) <float>
+         Output: None'''
+      now = time.perf_counter()
+      self.finishTick()
+      
+      #  The time since the previous frame's tick (unknown for the first tick after a pause)
+      interval = np.nan
+      if(self.lastTime != None): interval = now - self.lastTime
+      
+      #  Start a row for the new tick
+      self.current = np.zeros(len(stages))
+      self.current[self.columns["interval"]] = interval
+      self.current[self.columns["requested"]] = requested
+      self.currentTime = now
+
+   def stop(self):
+      '''Store the current tick and stop timing (when playback is paused).'''
+      self.finishTick()
+      self.lastTime = None
+
+   def summary(self):
+      '''Summarize the stored ticks.
+         Input:  None
+         Output: number of ticks <int>,
+                 frames per second <float>,
+                 percentiles (in ms) of every stage <dict> {stage: (50th, 95th, 99th)}'''
+      times, samples = self.rows()
+      if(len(times) == 0): return(0, 0.0, {})
+      
+      #  The frames per second from the time between the first and last ticks
+      fps = 0.0
+      if(len(times) > 1 and times[-1] > times[0]): fps = (len(times) - 1) / (times[-1] - times[0])
+      
+      #  The percentiles of every stage, leaving out the ticks where the stage is unknown
+      percentiles = {}
+      for stage in stages:
+         values = samples[:, self.columns[stage]]
+         values = values[~np.isnan(values)]
+         if(len(values) > 0): percentiles[stage] = tuple(np.percentile(values, [50, 95, 99]) * 1000.0)
+      
+      return(len(times), fps, percentiles)
+
+   def writeCsv(self, fileName):
+      '''Write the stored ticks to a CSV file (times in ms).
+         Input:  file name <str>
+         Output: None'''
+      times, samples = self.rows()
+      with open(fileName, "w", newline = "") as WRITE:
+         writer = csv.writer(WRITE)
+         writer.writerow(["tick", "time"] + stages)
+         for tick in range(len(times)):
+            writer.writerow([tick, "%.6f" % (times[tick] - times[0])] + ["" if np.isnan(value) else "%.4f" % (value * 1000.0) for value in samples[tick]])
+
+   def writeJson(self, fileName):
+      '''Write the stored ticks and their summary to a JSON file (times in ms).
+         Input:  file name <str>
+         Output: None'''
+      times, samples = self.rows()
+      count, fps, percentiles = self.summary()
+      ticks = []
+      for tick in range(len(times)):
+         row = {"time": float(times[tick] - times[0])}
+         row.update((stage, None if np.isnan(value) else float(value * 1000.0)) for stage, value in zip(stages, samples[tick]))
+         ticks.append(row)
+      
+      report = {"ticks": count, "fps": fps, "percentiles": dict((stage, {"p50": float(values[0]), "p95": float(values[1]), "p99": float(values[2])}) for stage, values in percentiles.items()), "samples": ticks}
+      with open(fileName, "w") as WRITE:
+         json.dump(report, WRITE, indent = 1)
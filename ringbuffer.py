@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+#  Live streaming of nBody points from a running simulation to the graph.
+#
+#  The producer (a simulation) appends one frame (the position of every particle at a point in
+#  time) at a time to a ring buffer in shared memory.  The graph reads whatever frames are new
+#  each time its timer fires.  Neither side waits on the other: the producer never stops for
+#  the graph, and when the graph falls more than a whole ring behind, the oldest frames it
+#  missed are skipped.
+#
+#  The graph keeps the frames it has read in memory until they pass a memory limit; after that
+#  the oldest frames are written to a temporary file and read back through a chunked store, so a
+#  simulation can run for as long as there is disk space.
+#
+#  The shared block starts with a header of four int64 values (capacity, number of particles,
+#  number of frames ever written, finished flag), followed by the ring of frames
+#  [frame [particle [x, y, z]]].
+#
+#  Example
+#     python3 ringbuffer.py nbody-live --particles 200        <-- Start a simulation producing frames
+#     python3 nbody.py --live nbody-live                      <-- Watch it while it runs
+
+import argparse
+import tempfile
+import threading
+from multiprocessing import shared_memory
+from multiprocessing import resource_tracker
+import numpy as np
+import simulation
+import store
+
+#  The number of int64 values in the header
+headerLength = 4
+
+#  The positions of the values in the header
+capacityField = 0
+particleCountField = 1
+writtenField = 2
+finishedField = 3
+
+#  The default number of frames the ring holds
+defaultCapacity = 4096
+
+#  The most memory the frames read from a ring may use before the oldest are written to the disk
+#  (in bytes)
+defaultMaxBytes = 512 * 1024 * 1024
+
+class RingBuffer(object):
+   '''A ring of frames in shared memory with one producer and any number of readers.  Use
+      create() in the producer and attach() in a reader.
+      Input:  shared memory block <SharedMemory>,
+              created (True) or attached (False) flag <bool>
+      Output: None'''
+   def __init__(self, block, owner):
+      self.block = block
+      self.owner = owner
+      
+      #  The header and the ring of frames on top of the shared block
+      self.header = np.ndarray((headerLength,), dtype = np.int64, buffer = block.buf)
+      self.capacity = int(self.header[capacityField])
+      self.particleCount = int(self.header[particleCountField])
+      self.frames = np.ndarray((self.capacity, self.particleCount, 3), dtype = np.float64, buffer = block.buf, offset = headerLength * 8)
+
+   @classmethod
+   def attach(cls, name):
+      '''Attach to a ring buffer made by a producer.
+         Input:  name of the ring buffer <str>
+         Output: ring buffer <RingBuffer>'''
+      #  The producer owns the block; stop this process from removing it when it exits
+      block = shared_memory.SharedMemory(name = name)
+      try: resource_tracker.unregister(block._name, "shared_memory")
+      except Exception: pass
+      
+      return(cls(block, False))
+
+   @classmethod
+   def create(cls, name, particleCount, capacity = defaultCapacity):
+      '''Make a new ring buffer.
+         Input:  name of the ring buffer <str>,
+                 number of particles <int>,
+                 number of frames the ring holds <int>
+         Output: ring buffer <RingBuffer>'''
+      #  Make the block and fill in its header
+      block = shared_memory.SharedMemory(name = name, create = True, size = (headerLength + capacity * particleCount * 3) * 8)
+      header = np.ndarray((headerLength,), dtype = np.int64, buffer = block.buf)
+      header[:] = 0
+      header[capacityField] = capacity
+      header[particleCountField] = particleCount
+      del header
+      
+      return(cls(block, True))
+
+   def append(self, positions):
+      '''Add a frame to the ring, writing over the oldest frame if the ring is full.
+         Input:  positions <np.ndarray> [particle [x, y, z]]
+         Output: None'''
+      #  Write the frame first, then count it so readers never see a half written frame
+      written = int(self.header[writtenField])
+      self.frames[written % self.capacity] = positions
+      self.header[writtenField] = written + 1
+
+   def close(self):
+      '''Stop using the ring buffer.  The producer also removes it (readers that are still
+         attached keep their mapping of it).'''
+      #  Drop the arrays on top of the block before closing it
+      self.header = self.frames = None
+      self.block.close()
+      if(self.owner == True): self.block.unlink()
+
+   def finish(self):
+      '''Mark that no more frames will be written.'''
+      self.header[finishedField] = 1
+
+   def isFinished(self):
+      '''Check if the producer is done writing frames.
+         Input:  None
+         Output: True/False <bool>'''
+      return(bool(self.header[finishedField]))
+
+   def read(self, since):
+      '''Copy the frames written since the given frame count.  Frames that were already
+         written over are skipped.
+         Input:  number of frames already read <int>
+         Output: frames <np.ndarray> [frame [particle [x, y, z]]],
+                 number of frames read after this call <int>'''
+      #  The frames still in the ring that haven't been read
+      written = int(self.header[writtenField])
+      start = max(since, written - self.capacity)
+      slots = np.arange(start, written) % self.capacity
+      frames = self.frames[slots]
+      
+      #  Drop any frames the producer wrote over while they were copied, including the one it may
+      #  be writing now (it isn't counted until it is done)
+      overwritten = int(self.header[writtenField]) - self.capacity - start + 1
+      if(overwritten > 0): frames = frames[overwritten:]
+      
+      return(frames, written)
+
+class GrowingTrajectory(object):
+   '''A (particle, axis, time) array that frames can be added to.  Room is doubled when it runs
+      out, so adding frames takes amortized constant time per frame.  Once the frames in memory
+      would use more than maxBytes, the older half are written to a temporary file (frame by
+      frame, so a range of time is one read) and the newest half are kept.  It is indexed like
+      the numpy array it stands in for, and can be the source of a store.ChunkedTrajectory.
+      Input:  number of particles <int>,
+              starting room (in frames) <int>,
+              most memory the frames kept in memory may use (in bytes) <int>,
+              directory of the temporary file (defaults to the system's) <str>
+      Output: None'''
+   def __init__(self, particleCount, capacity = 1024, maxBytes = defaultMaxBytes, directory = None):
+      self.frameBytes = particleCount * 3 * 8
+      self.maxFrames = max(2, int(maxBytes // self.frameBytes))
+      self.buffer = np.empty((particleCount, 3, max(1, min(capacity, self.maxFrames))))
+      self.count = 0
+      self.directory = directory
+      
+      #  The number of frames in the temporary file (the first frame in the buffer comes after
+      #  them) and the file, which is made when it is first needed and removed when it is closed
+      self.spilled = 0
+      self.SPILL = None
+      
+      #  The newest frames are always in memory, however many are on the disk
+      self.tailFrames = self.maxFrames // 2
+      
+      #  The chunked store the points are read through once some are on the disk (kept, and grown,
+      #  from call to call so its working set isn't lost)
+      self.chunked = None
+      
+      #  Only one thread at a time may seek and read the file
+      self.lock = threading.Lock()
+      
+      #  The array attributes the graph uses
+      self.ndim = 3
+      self.dtype = np.dtype(np.float64)
+
+   def __len__(self):
+      '''The number of particles.
+         Input:  None
+         Output: number of particles <int>'''
+      return(self.buffer.shape[0])
+
+   def __getitem__(self, key):
+      '''Get points the same way a (particle, axis, time) numpy array is indexed.
+         Input:  index <int, slice or tuple>
+         Output: points <np.ndarray>'''
+      #  Split the index into a particle, axis and time index
+      if(not isinstance(key, tuple)): key = (key,)
+      if(len(key) > 3): raise(IndexError("too many indices for the points"))
+      particleKey, axisKey, timeKey = key + (slice(None),) * (3 - len(key))
+      
+      #  A single point in time
+      if(isinstance(timeKey, (int, np.integer))):
+         if(timeKey < 0): timeKey += self.count
+         if(timeKey < 0 or timeKey >= self.count): raise(IndexError("time index out of range"))
+         return(self.readFrames(timeKey, timeKey + 1)[:, :, 0][particleKey, axisKey])
+      
+      #  A contiguous range is read as it is
+      if(isinstance(timeKey, slice) and timeKey.step in (None, 1)):
+         start, stop, step = timeKey.indices(self.count)
+         return(self.readFrames(start, max(start, stop))[particleKey, axisKey])
+      
+      #  Other points in time are picked out of the range covering them
+      times = np.arange(self.count)[timeKey]
+      if(len(times) == 0): return(self.readFrames(0, 0)[particleKey, axisKey])
+      first = int(np.min(times))
+      return(self.readFrames(first, int(np.max(times)) + 1)[:, :, times - first][particleKey, axisKey])
+
+   @property
+   def shape(self):
+      '''The shape of the points added so far.
+         Input:  None
+         Output: shape <tuple> (particles, axes, points)'''
+      return(self.buffer.shape[:2] + (self.count,))
+
+   def close(self):
+      '''Close (and so remove) the temporary file.'''
+      if(self.SPILL != None): self.SPILL.close()
+      self.SPILL = None
+
+   def extend(self, frames):
+      '''Add frames to the end of the points.
+         Input:  frames <np.ndarray> [frame [particle [x, y, z]]]
+         Output: None'''
+      frames = np.asarray(frames, dtype = np.float64)
+      kept = self.count - self.spilled
+      
+      #  If the frames won't fit in memory, write the oldest ones to the disk, keeping the newest
+      #  half of what fits (so each write is at least half the memory's worth of frames)
+      if(kept + len(frames) > self.maxFrames):
+         spill = kept + len(frames) - self.maxFrames // 2
+         
+         #  The frames in the buffer go first, then any of the new frames that don't fit
+         fromBuffer = min(spill, kept)
+         self.spill(np.transpose(self.buffer[:, :, :fromBuffer], (2, 0, 1)))
+         self.spill(frames[:spill - fromBuffer])
+         frames = frames[spill - fromBuffer:]
+         
+         #  Move the frames still in memory to the start of the buffer
+         self.buffer[:, :, :kept - fromBuffer] = self.buffer[:, :, fromBuffer:kept]
+         self.count += spill - fromBuffer
+         kept -= fromBuffer
+      
+      #  Make room for the frames, up to the most frames kept in memory
+      if(kept + len(frames) > self.buffer.shape[2]):
+         room = min(max(kept + len(frames), 2 * self.buffer.shape[2]), self.maxFrames)
+         buffer = np.empty(self.buffer.shape[:2] + (room,))
+         buffer[:, :, :kept] = self.buffer[:, :, :kept]
+         self.buffer = buffer
+      
+      #  Copy the frames in with time as the last axis
+      self.buffer[:, :, kept:kept + len(frames)] = np.transpose(frames, (1, 2, 0))
+      self.count += len(frames)
+
+   def points(self):
+      '''Get the points added so far.  While they are all in memory, this is the array itself,
+         which is only valid until the next frames are added.  Once some are on the disk, it is a
+         chunked store of the points, the same one every time, grown to take in the new frames.
+         Input:  None
+         Output: array of points <np.ndarray or store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]]'''
+      if(self.spilled == 0): return(self.buffer[:, :, :self.count])
+      if(self.chunked == None): self.chunked = store.ChunkedTrajectory(self, maxBytes = self.maxFrames * self.frameBytes)
+      else: self.chunked.grow()
+      return(self.chunked)
+
+   def readFrames(self, start, stop):
+      '''Read a range of points in time from the disk and memory.
+         Input:  first point <int>,
+                 index after the last point <int>
+         Output: points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+      pieces = []
+      
+      #  The part written to the disk, read as one block of frames
+      if(start < self.spilled):
+         last = min(stop, self.spilled)
+         with self.lock:
+            self.SPILL.seek(start * self.frameBytes)
+            data = self.SPILL.read((last - start) * self.frameBytes)
+         pieces.append(np.transpose(np.frombuffer(data, dtype = np.float64).reshape(last - start, len(self), 3), (1, 2, 0)))
+      
+      #  The part still in memory
+      if(stop > self.spilled):
+         pieces.append(self.buffer[:, :, max(start, self.spilled) - self.spilled:stop - self.spilled])
+      
+      if(len(pieces) == 0): return(np.empty(self.buffer.shape[:2] + (0,)))
+      if(len(pieces) == 1): return(pieces[0])
+      return(np.concatenate(pieces, axis = 2))
+
+   def spill(self, frames):
+      '''Write frames to the end of the temporary file.
+         Input:  frames <np.ndarray> [frame [particle [x, y, z]]]
+         Output: None'''
+      if(len(frames) == 0): return()
+      with self.lock:
+         if(self.SPILL == None): self.SPILL = tempfile.TemporaryFile(prefix = "nbody-live-", dir = self.directory)
+         self.SPILL.seek(self.spilled * self.frameBytes)
+         self.SPILL.write(np.ascontiguousarray(frames, dtype = np.float64).tobytes())
+      self.spilled += len(frames)
+
+def produce(name, positions, velocities, masses, dt, steps = None, saveEvery = 1, G = 1.0, softening = 0.0,
+            acceleration = simulation.accelerations, capacity = defaultCapacity):
+   '''Run a simulation and append its positions to a ring buffer as it goes.
+      Input:  name of the ring buffer <str>,
+              positions <np.ndarray> [particle [x, y, z]],
+              velocities <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              time step <float>,
+              number of steps (runs until stopped if None) <int>,
+              number of steps between frames <int>,
+              gravitational constant <float>,
+              softening length <float>,
+              acceleration function <function(positions, masses, G, softening)>,
+              number of frames the ring holds <int>
+      Output: None'''
+   ring = RingBuffer.create(name, len(positions), capacity)
+   try:
+      #  With no number of steps, run (practically) forever
+      if(steps == None): steps = 2 ** 62
+      
+      #  Append every saveEvery-th position
+      for step, current in enumerate(simulation.integrate(positions, velocities, masses, dt, steps, G, softening, acceleration)):
+         if(step % saveEvery == 0): ring.append(current)
+      ring.finish()
+   finally:
+      ring.close()
+
+def main():
+   '''Stream a simulation of a random cluster given on the command line to a ring buffer.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Simulate a random cluster into a shared memory ring buffer for nbody.py --live.")
+   parser.add_argument("name", help = "name of the ring buffer")
+   parser.add_argument("--particles", type = int, default = 100, help = "number of particles")
+   parser.add_argument("--steps", type = int, default = None, help = "number of steps (default: run until stopped)")
+   parser.add_argument("--dt", type = float, default = 0.001, help = "time step")
+   parser.add_argument("--save-every", dest = "saveEvery", type = int, default = 10, help = "steps between frames")
+   parser.add_argument("--softening", type = float, default = 0.01, help = "softening length")
+   parser.add_argument("--capacity", type = int, default = defaultCapacity, help = "number of frames the ring holds")
+   args = parser.parse_args()
+   
+   positions, velocities, masses = simulation.randomCluster(args.particles)
+   print("Streaming to \"" + args.name + "\".  Press Ctrl+C to stop.")
+   try:
+      produce(args.name, positions, velocities, masses, args.dt, args.steps, args.saveEvery, softening = args.softening, capacity = args.capacity)
+   except KeyboardInterrupt:
+      pass
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
@@ -0,0 +1,91 @@
+#  Playback pacing for the nBody graph.
+#
+#  Playback is asked to move through the points at a steady rate in steps per second of wall
+#  clock time, however long each frame takes to draw.  Every timer tick works out how many
+#  steps are due since the previous tick:
+#     - if drawing is fast, a tick moves the usual number of steps
+#     - if drawing is slow, the steps that came due while drawing are coalesced into one frame
+#     - if no whole step is due yet, the frame is skipped (nothing is redrawn)
+#  The time until the next tick is never shorter than the measured cost of a frame, so timer
+#  events don't pile up behind a slow frame.  When the machine is so overloaded that more than
+#  maxLag seconds of steps are owed, the rest are dropped: playback slows down (throttles)
+#  instead of building up a backlog it would later jump through.
+#
+#  Example
+#     pacer = scheduler.PlaybackScheduler()
+#     pacer.reset()
+#     ...on every timer tick...
+#     steps = pacer.tick(rate)                       <-- Steps to move this frame (0 to skip it)
+#     pacer.addCost(secondsSpentDrawing)
+#     timer.start(int(pacer.interval(requested) * 1000))
+
+import time
+
+class PlaybackScheduler(object):
+   '''Works out how many steps each tick of playback moves and when the next tick should be.
+      Input:  shortest time between ticks (in seconds) <float>,
+              most seconds of steps that can be owed before they are dropped <float>,
+              weight of the newest frame in the frame cost average <float>,
+              how much longer than a frame's cost the time between ticks is <float>
+      Output: None'''
+   def __init__(self, minInterval = 0.005, maxLag = 0.25, smoothing = 0.25, headroom = 1.2):
+      self.minInterval = minInterval
+      self.maxLag = maxLag
+      self.smoothing = smoothing
+      self.headroom = headroom
+      self.reset()
+
+   def addCost(self, seconds):
+      '''Add time spent on the current frame (updating the plots, painting the view).
+         Input:  seconds <float>
+         Output: None'''
+      self.frameCost += seconds
+
+   def interval(self, requested):
+      '''Get the time to wait before the next tick.  It is the requested interval unless frames
+         cost more than that, in which case it is stretched to fit a frame.
+         Input:  requested time between ticks (in seconds) <float>
+         Output: time to wait (in seconds) <float>'''
+      return(max(requested, self.minInterval, self.cost * self.headroom))
+
+   def reset(self, now = None):
+      '''Start pacing from now (when playback starts or the rate is changed).
+         Input:  current time (from time.perf_counter) <float>
+         Output: None'''
+      if(now == None): now = time.perf_counter()
+      self.lastTime = now
+      self.owed = 0.0
+      self.cost = 0.0
+      self.frameCost = 0.0
+      self.frames = 0
+      self.skipped = 0
+      self.dropped = 0.0
+
+   def tick(self, rate, now = None):
+      '''Get the whole number of steps due since the previous tick.  Parts of a step are
+         carried over to the next tick.
+         Input:  steps per second <float>,
+                 current time (from time.perf_counter) <float>
+         Output: number of steps <int>'''
+      if(now == None): now = time.perf_counter()
+      
+      #  Fold the previous frame's cost into the average
+      if(self.frames > 0): self.cost += self.smoothing * (self.frameCost - self.cost)
+      self.frameCost = 0.0
+      self.frames += 1
+      
+      #  The steps that came due since the previous tick
+      self.owed += rate * max(0.0, now - self.lastTime)
+      self.lastTime = now
+      
+      #  Drop what is owed past the lag limit rather than queue it up
+      limit = max(1.0, rate * self.maxLag)
+      if(self.owed > limit):
+         self.dropped += self.owed - limit
+         self.owed = limit
+      
+      #  Move the whole steps and keep the rest for later
+      steps = int(self.owed)
+      self.owed -= steps
+      if(steps == 0): self.skipped += 1
+      return(steps)
@@ -0,0 +1,262 @@
+#  Points split across several files (shards) joined into one timeline.
+#
+#  A long simulation that checkpoints to a new file every so often is one run spread over many
+#  files.  Each shard holds every particle for a stretch of time; the shards are put end to end
+#  along the time axis and indexed as one (particle, axis, time) array, so the graph's slider
+#  moves through the whole run.  Only the shape of each shard is read up front.  A shard is
+#  opened the first time points in it are asked for, and only the most recently used few are
+#  kept open.  The joined points are read through a store.ChunkedTrajectory, so only the chunks
+#  around what is being drawn are in memory.
+#
+#  The shards can be binary (.npy) or compressed (.nbz) files.  They are given as:
+#     a list of file names,
+#     a pattern such as "run/checkpoint-*.npy" (the files are sorted with their numbers in order,
+#     so checkpoint-10 comes after checkpoint-9), or
+#     a manifest: a text file ending in .shards with a file name or pattern on every line
+#     (relative to the manifest, blank lines and lines starting with # are skipped)
+#
+#  Example
+#     points = shards.loadShards("run/checkpoint-*.npy")
+#     trail = points[0, :, :]          <-- Particle 0 over the whole run
+
+import os
+import re
+import glob
+import collections
+import threading
+import numpy as np
+import store
+import bounds
+import compressed
+
+#  Manifest files end with this
+manifestExtension = ".shards"
+
+#  The number of shards kept open at a time
+defaultMaxOpen = 4
+
+class ShardedTrajectory(object):
+   '''Shard files put end to end along the time axis.  It is indexed like the (particle, axis,
+      time) numpy array it stands in for, and can be the source of a store.ChunkedTrajectory.
+      Reads are done one at a time, so a shard is never closed while it is being read.
+      Input:  shard file names in time order <list> [str],
+              most shards kept open at a time <int>
+      Output: None'''
+   def __init__(self, fileNames, maxOpen = defaultMaxOpen):
+      if(len(fileNames) == 0): raise(ValueError("There are no shard files"))
+      self.fileNames = list(fileNames)
+      self.maxOpen = max(2, maxOpen)
+      
+      #  The shape of every shard, read without loading its points
+      shapes = [shardShape(fileName) for fileName in self.fileNames]
+      for fileName, shape in zip(self.fileNames, shapes):
+         if(len(shape) != 3 or shape[1] != 3): raise(ValueError(fileName + " must have the shape (particles, 3, points)"))
+         if(shape[0] != shapes[0][0]): raise(ValueError(fileName + " has " + str(shape[0]) + " particles, but " + self.fileNames[0] + " has " + str(shapes[0][0])))
+      
+      #  The first point of every shard on the joined time axis (and the end of the last one)
+      self.starts = np.cumsum([0] + [shape[2] for shape in shapes])
+      
+      #  The array attributes the graph uses
+      self.shape = (shapes[0][0], 3, int(self.starts[-1]))
+      self.ndim = 3
+      self.dtype = np.dtype(np.float64)
+      
+      #  The open shards, from the least to the most recently used
+      self.shards = collections.OrderedDict()
+      self.lock = threading.Lock()
+
+   def __len__(self):
+      '''The number of particles.
+         Input:  None
+         Output: number of particles <int>'''
+      return(self.shape[0])
+
+   def __getitem__(self, key):
+      '''Get points the same way a (particle, axis, time) numpy array is indexed.  Only the
+         shards covering the time asked for are opened.
+         Input:  index <int, slice or tuple>
+         Output: points <np.ndarray>'''
+      #  Split the index into a particle, axis and time index
+      if(not isinstance(key, tuple)): key = (key,)
+      if(len(key) > 3): raise(IndexError("too many indices for the points"))
+      particleKey, axisKey, timeKey = key + (slice(None),) * (3 - len(key))
+      
+      #  A single point in time is in one shard
+      if(isinstance(timeKey, (int, np.integer))):
+         if(timeKey < 0): timeKey += self.shape[2]
+         if(timeKey < 0 or timeKey >= self.shape[2]): raise(IndexError("time index out of range"))
+         shardNum = self.shardAt(timeKey)
+         with self.lock:
+            return(np.asarray(self.openShard(shardNum)[:, :, timeKey - self.starts[shardNum]], dtype = self.dtype)[particleKey, axisKey])
+      
+      #  The points in time asked for (a contiguous range is kept as a range)
+      if(isinstance(timeKey, slice) and timeKey.step in (None, 1)):
+         start, stop, step = timeKey.indices(self.shape[2])
+         times = None
+      else:
+         times = np.arange(self.shape[2])[timeKey]
+         shardNums = np.searchsorted(self.starts, times, side = "right") - 1
+         start, stop = 0, len(times)
+      
+      #  The pieces of each shard the index covers
+      pieces = []
+      with self.lock:
+         position = start
+         while(position < stop):
+            #  If the points in time are listed, take the run of them that falls in the same shard
+            if(times is not None):
+               shardNum = int(shardNums[position])
+               end = position + 1
+               while(end < stop and shardNums[end] == shardNum): end += 1
+               local = times[position:end] - self.starts[shardNum]
+            #  Otherwise, take the part of the range inside this shard
+            else:
+               shardNum = self.shardAt(position)
+               end = min(stop, int(self.starts[shardNum + 1]))
+               local = slice(position - int(self.starts[shardNum]), end - int(self.starts[shardNum]))
+            
+            pieces.append(np.asarray(self.openShard(shardNum)[:, :, local], dtype = self.dtype)[particleKey, axisKey])
+            position = end
+      
+      #  If nothing was selected, return an empty array of the right shape
+      if(len(pieces) == 0):
+         return(np.empty(self.shape[:2] + (0,), dtype = self.dtype)[particleKey, axisKey])
+      
+      #  Join the pieces along the time axis
+      return(np.concatenate(pieces, axis = -1))
+
+   def close(self):
+      '''Close every open shard.'''
+      with self.lock:
+         while(len(self.shards) > 0): closeShard(self.shards.popitem(last = False)[1])
+
+   def describe(self, position):
+      '''Describe which shard a point is in (for showing to the user).
+         Input:  point on the joined time axis <int>
+         Output: description <str>'''
+      position = min(max(position, 0), self.shape[2] - 1)
+      shardNum = self.shardAt(position)
+      return("Shard " + str(shardNum + 1) + " of " + str(len(self.fileNames)) + ": " + os.path.basename(self.fileNames[shardNum]) + " (point " + str(position - int(self.starts[shardNum]) + 1) + ")")
+
+   def modifiedTime(self):
+      '''The time the newest shard was last changed.
+         Input:  None
+         Output: modification time <float>'''
+      return(max(os.path.getmtime(fileName) for fileName in self.fileNames))
+
+   def openShard(self, shardNum):
+      '''Get a shard, opening it if it isn't open.  The least recently used shard is closed to
+         make room.  The lock must be held.
+         Input:  shard number <int>
+         Output: shard points <np.memmap or compressed.CompressedTrajectory>'''
+      #  If the shard is open, mark it as the most recently used
+      if(shardNum in self.shards):
+         self.shards.move_to_end(shardNum)
+         return(self.shards[shardNum])
+      
+      #  Close the least recently used shards until there is room
+      while(len(self.shards) >= self.maxOpen): closeShard(self.shards.popitem(last = False)[1])
+      
+      self.shards[shardNum] = openShardFile(self.fileNames[shardNum])
+      return(self.shards[shardNum])
+
+   def shardAt(self, position):
+      '''Find the shard a point is in.
+         Input:  point on the joined time axis <int>
+         Output: shard number <int>'''
+      return(int(np.searchsorted(self.starts, position, side = "right")) - 1)
+
+def closeShard(shard):
+   '''Close a shard's file.  Memory-mapped shards are unmapped once they are no longer used.
+      Input:  shard points <np.memmap or compressed.CompressedTrajectory>
+      Output: None'''
+   if(isinstance(shard, compressed.CompressedTrajectory)): shard.close()
+
+def findShards(pattern):
+   '''Find the files matching a pattern, with the numbers in their names in order.
+      Input:  pattern <str>
+      Output: file names <list> [str]'''
+   return(sortShards(glob.glob(pattern)))
+
+def isShardName(name):
+   '''Check if a name is for shards: a list of files, a manifest or a pattern that isn't itself
+      the name of a file.
+      Input:  file names, manifest or pattern <list or str>
+      Output: True/False <bool>'''
+   if(isinstance(name, (list, tuple))): return(True)
+   return(name.lower().endswith(manifestExtension) or (glob.has_magic(name) and os.path.exists(name) == False))
+
+def openShardFile(fileName):
+   '''Open a shard file without reading its points.
+      Input:  file name <str>
+      Output: shard points <np.memmap or compressed.CompressedTrajectory>'''
+   if(compressed.isCompressedFile(fileName) == True): return(compressed.CompressedTrajectory(fileName))
+   
+   #  Anything else must be a binary file, which is memory-mapped (text would have to be parsed whole)
+   try: return(np.load(fileName, mmap_mode = "r", allow_pickle = False))
+   except Exception: raise(ValueError(fileName + " is not a binary or compressed points file (convert text files with convert.py)"))
+
+def readManifest(fileName):
+   '''Read the shard file names listed in a manifest.
+      Input:  manifest file name <str>
+      Output: shard file names <list> [str]'''
+   directory = os.path.dirname(os.path.abspath(fileName))
+   fileNames = []
+   with open(fileName) as READ:
+      for line in READ:
+         line = line.strip()
+         if(line == "" or line.startswith("#")): continue
+         
+         #  Names are relative to the manifest; patterns are expanded in place
+         path = os.path.join(directory, line)
+         if(glob.has_magic(line)): fileNames.extend(findShards(path))
+         else: fileNames.append(path)
+   return(fileNames)
+
+def sortShards(fileNames):
+   '''Sort file names with the numbers in them in order (checkpoint-9 before checkpoint-10).
+      Input:  file names <list> [str]
+      Output: sorted file names <list> [str]'''
+   #  Compare the runs of digits in the names as numbers
+   def naturalKey(fileName):
+      return([int(part) if part.isdigit() else part for part in re.split(r"(\d+)", fileName)])
+   
+   return(sorted(fileNames, key = naturalKey))
+
+def shardFiles(name):
+   '''Get the shard file names from a list of files, a manifest or a pattern.
+      Input:  file names, manifest or pattern <list or str>
+      Output: shard file names <list> [str]'''
+   if(isinstance(name, (list, tuple))): return(list(name))
+   if(name.lower().endswith(manifestExtension)): return(readManifest(name))
+   return(findShards(name))
+
+def shardShape(fileName):
+   '''Read the shape of a shard without reading its points.
+      Input:  file name <str>
+      Output: shape <tuple> (particles, axes, points)'''
+   shard = openShardFile(fileName)
+   shape = tuple(shard.shape)
+   closeShard(shard)
+   return(shape)
+
+def indexShards(name, points, progress = None):
+   '''Get the bounding box index of the shards.  The index of a manifest is saved next to it
+      and reused until a shard or the manifest changes; the index of a list or pattern is
+      built every time.
+      Input:  file names, manifest or pattern <list or str>,
+              joined points <store.ChunkedTrajectory>,
+              function called with the fraction done after each block of points <function(fraction <float>)>
+      Output: index <bounds.BoundsIndex>'''
+   if(isinstance(name, str) and name.lower().endswith(manifestExtension)):
+      return(bounds.indexFile(name, points, progress, max(os.path.getmtime(name), points.source.modifiedTime())))
+   return(bounds.BoundsIndex(points, progress = progress))
+
+def loadShards(name, maxOpen = defaultMaxOpen):
+   '''Join shards into one timeline read through a chunked store.
+      Input:  file names, manifest or pattern <list or str>,
+              most shards kept open at a time <int>
+      Output: joined points <store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]]'''
+   fileNames = shardFiles(name)
+   if(len(fileNames) == 0): raise(ValueError("No shard files were found for " + str(name)))
+   return(store.ChunkedTrajectory(ShardedTrajectory(fileNames, maxOpen)))
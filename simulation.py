@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+#  A direct summation nBody simulation that writes points the graph can show.
+#
+#  The force on every particle from every other particle is worked out with numpy (O(N^2) pairs,
+#  but no Python loop over them) and the particles are moved with the leapfrog (kick-drift-kick)
+#  integrator, which keeps the energy from drifting over long runs.  The points are written
+#  straight into the (particle, axis, time) layout described at the top of nbody.py, either in
+#  memory or in a binary file on the disk that grows as the simulation runs.
+#
+#  Example
+#     import simulation
+#     positions, velocities, masses = simulation.randomCluster(500)
+#     points = simulation.simulate(positions, velocities, masses, 0.001, 2000)
+#     simulation.simulateToFile("points.npy", positions, velocities, masses, 0.001, 2000)
+#
+#  Or from the command line
+#     python3 simulation.py points.npy --particles 500 --points 2000 --dt 0.001
+
+import argparse
+import numpy as np
+
+#  The most memory (in bytes) the pairwise differences may use at a time
+pairBlockBytes = 64 * 1024 * 1024
+
+def accelerations(positions, masses, G = 1.0, softening = 0.0, targets = None):
+   '''Work out the acceleration of particles from the gravity of every particle by direct
+      summation.  The targets are done a block at a time to keep the pairwise arrays small.
+      Input:  positions <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              gravitational constant <float>,
+              softening length <float>,
+              particles to work out the accelerations of (defaults to all) <slice>
+      Output: accelerations <np.ndarray> [target particle [x, y, z]]'''
+   #  Work out the accelerations of every particle if no targets are given
+   if(targets == None): targets = slice(0, len(positions))
+   first, last, step = targets.indices(len(positions))
+   result = np.empty((len(range(first, last, step)), 3))
+   
+   #  The number of targets done at a time
+   blockSize = max(1, pairBlockBytes // (len(positions) * 4 * 8))
+   
+   #  Go through each block of targets
+   for start in range(0, len(result), blockSize):
+      stop = min(start + blockSize, len(result))
+      block = positions[first + start * step:first + stop * step:step]
+      
+      #  The vector from each target to each source, one axis at a time [axis [target [source]]],
+      #  and its softened length squared
+      difference = [positions[np.newaxis, :, axis] - block[:, axis, np.newaxis] for axis in range(3)]
+      distance = difference[0] ** 2 + difference[1] ** 2 + difference[2] ** 2 + softening ** 2
+      
+      #  mass / r^3 for every pair (a particle doesn't pull on itself)
+      weight = np.zeros_like(distance)
+      np.divide(masses[np.newaxis, :], distance * np.sqrt(distance), out = weight, where = distance > 0)
+      
+      #  Add up the pull of every source
+      for axis in range(3):
+         result[start:stop, axis] = G * np.einsum("ts,ts->t", weight, difference[axis])
+   
+   return(result)
+
+def integrate(positions, velocities, masses, dt, steps, G = 1.0, softening = 0.0, acceleration = accelerations):
+   '''Move the particles with the leapfrog (kick-drift-kick) integrator.  The positions are
+      yielded before the first step and after every step; they are overwritten by the next
+      step, so copy them to keep them.
+      Input:  positions <np.ndarray> [particle [x, y, z]],
+              velocities <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              time step <float>,
+              number of steps <int>,
+              gravitational constant <float>,
+              softening length <float>,
+              acceleration function <function(positions, masses, G, softening)>
+      Output: positions after each step <generator of np.ndarray> [particle [x, y, z]]'''
+   #  Work on copies so the initial conditions aren't changed
+   positions = np.array(positions, dtype = np.float64)
+   velocities = np.array(velocities, dtype = np.float64)
+   masses = np.asarray(masses, dtype = np.float64)
+   
+   #  The starting positions and accelerations
+   yield(positions)
+   current = acceleration(positions, masses, G, softening)
+   
+   for step in range(steps):
+      #  Half kick, drift, then another half kick with the new accelerations
+      velocities += 0.5 * dt * current
+      positions += dt * velocities
+      current = acceleration(positions, masses, G, softening)
+      velocities += 0.5 * dt * current
+      
+      yield(positions)
+
+def kineticEnergy(velocities, masses):
+   '''Work out the kinetic energy of the particles.
+      Input:  velocities <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle]
+      Output: kinetic energy <float>'''
+   return(0.5 * float((masses * (np.asarray(velocities) ** 2).sum(axis = 1)).sum()))
+
+def potentialEnergy(positions, masses, G = 1.0, softening = 0.0):
+   '''Work out the gravitational potential energy of the particles (every pair counted once).
+      Input:  positions <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              gravitational constant <float>,
+              softening length <float>
+      Output: potential energy <float>'''
+   energy = 0.0
+   
+   #  Go through the targets a block at a time, pairing each with the sources after it
+   blockSize = max(1, pairBlockBytes // (len(positions) * 3 * 8))
+   for start in range(0, len(positions), blockSize):
+      stop = min(start + blockSize, len(positions))
+      difference = positions[np.newaxis, :, :] - positions[start:stop, np.newaxis, :]
+      distance = np.sqrt((difference ** 2).sum(axis = 2) + softening ** 2)
+      
+      #  Only count the pairs where the source comes after the target
+      later = np.arange(len(positions))[np.newaxis, :] > np.arange(start, stop)[:, np.newaxis]
+      pairs = np.zeros_like(distance)
+      np.divide(masses[start:stop, np.newaxis] * masses[np.newaxis, :], distance, out = pairs, where = later & (distance > 0))
+      energy -= G * pairs.sum()
+   
+   return(float(energy))
+
+def randomCluster(particleCount, radius = 1.0, G = 1.0, seed = None):
+   '''Make a cluster of equal mass particles spread evenly through a sphere, turning slowly
+      around the z axis with a little random motion.  The total mass is 1.
+      Input:  number of particles <int>,
+              radius of the sphere <float>,
+              gravitational constant <float>,
+              random seed <int>
+      Output: positions <np.ndarray> [particle [x, y, z]],
+              velocities <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle]'''
+   random = np.random.RandomState(seed)
+   
+   #  Even spread through the sphere (the cube root keeps the density even)
+   direction = random.normal(size = (particleCount, 3))
+   direction /= np.maximum(np.sqrt((direction ** 2).sum(axis = 1, keepdims = True)), 1e-12)
+   positions = direction * radius * random.uniform(size = (particleCount, 1)) ** (1.0 / 3.0)
+   
+   #  A slow turn plus random motion, both well under the speed that would keep the cluster up
+   speed = np.sqrt(G / radius)
+   velocities = 0.3 * speed * np.cross([0.0, 0.0, 1.0], positions) / radius
+   velocities += 0.1 * speed * random.normal(size = (particleCount, 3))
+   
+   #  Take out the drift of the center of mass
+   velocities -= velocities.mean(axis = 0)
+   masses = np.full(particleCount, 1.0 / particleCount)
+   
+   return(positions, velocities, masses)
+
+def simulate(positions, velocities, masses, dt, pointCount, saveEvery = 1, G = 1.0, softening = 0.0, out = None,
+             acceleration = accelerations, progress = None):
+   '''Run a simulation and write the positions into a (particle, axis, time) array.
+      Input:  positions <np.ndarray> [particle [x, y, z]],
+              velocities <np.ndarray> [particle [x, y, z]],
+              masses <np.ndarray> [particle],
+              time step <float>,
+              number of points to write (the first is the starting position) <int>,
+              number of steps between written points <int>,
+              gravitational constant <float>,
+              softening length <float>,
+              array to write the points into (defaults to a new array) <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              acceleration function <function(positions, masses, G, softening)>,
+              function called with the fraction done after each written point <function(fraction <float>)>
+      Output: array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+   #  Make the array of points if none was given
+   if(out is None): out = np.empty((len(positions), 3, pointCount))
+   if(out.shape != (len(positions), 3, pointCount)):
+      raise(ValueError("The points array must have the shape " + str((len(positions), 3, pointCount))))
+   
+   #  Write every saveEvery-th position
+   steps = (pointCount - 1) * saveEvery
+   for step, current in enumerate(integrate(positions, velocities, masses, dt, steps, G, softening, acceleration)):
+      if(step % saveEvery == 0):
+         out[:, :, step // saveEvery] = current
+         if(progress != None): progress(float(step // saveEvery + 1) / pointCount)
+   
+   return(out)
+
+def simulateToFile(fileName, positions, velocities, masses, dt, pointCount, saveEvery = 1, G = 1.0, softening = 0.0,
+                   acceleration = accelerations, progress = None):
+   '''Run a simulation and write the positions straight into a binary (.npy) points file,
+      so runs bigger than memory can be made.  The file can be loaded while it is written.
+      Input:  file name <str>,
+              the rest are the same as simulate()
+      Output: array of points <np.memmap> [particle number [axis X, Y, Z [position value <float>]]]'''
+   #  Make the file with its header and map its points
+   out = np.lib.format.open_memmap(fileName, mode = "w+", dtype = np.float64, shape = (len(positions), 3, pointCount))
+   
+   #  Run the simulation into the file and make sure it is all on the disk
+   simulate(positions, velocities, masses, dt, pointCount, saveEvery, G, softening, out, acceleration, progress)
+   out.flush()
+   
+   return(out)
+
+def main():
+   '''Run a simulation of a random cluster given on the command line.
+      Input:  None
+      Output: None'''
+   #  Read the command line
+   parser = argparse.ArgumentParser(description = "Simulate a random cluster and write a binary points file for nbody.py.")
+   parser.add_argument("output", help = "binary points file (.npy)")
+   parser.add_argument("--particles", type = int, default = 100, help = "number of particles")
+   parser.add_argument("--points", type = int, default = 1000, help = "number of points written for each particle")
+   parser.add_argument("--dt", type = float, default = 0.001, help = "time step")
+   parser.add_argument("--save-every", dest = "saveEvery", type = int, default = 1, help = "steps between written points")
+   parser.add_argument("--softening", type = float, default = 0.01, help = "softening length")
+   parser.add_argument("--seed", type = int, default = None, help = "random seed")
+   args = parser.parse_args()
+   
+   #  Make the cluster
+   positions, velocities, masses = randomCluster(args.particles, seed = args.seed)
+
+   def progress(fraction):
+      print("\rSimulating... " + str(int(fraction * 100)) + "%", end = "", flush = True)
+   
+   points = simulateToFile(args.output, positions, velocities, masses, args.dt, args.points, args.saveEvery, softening = args.softening, progress = progress)
+   print("")
+   print("Wrote " + str(points.shape[0]) + " particles with " + str(points.shape[2]) + " points each to " + args.output)
+
+#  This piece of code only executes if this file is executed from the command line.
+#  It is not run if this file is imported from another file.
+if(__name__ == "__main__"):
+   main()
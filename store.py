@@ -0,0 +1,283 @@
+#  An out-of-core store for nBody points.
+#
+#  The points are split into chunks along the time (3rd) axis.  Only a bounded number of chunks
+#  are kept in memory; the least recently used chunk is dropped when room is needed for a new
+#  one.  The store is indexed like the (particle, axis, time) numpy array it stands in for, so
+#  the graph does not need to know if the points are in memory or on the disk.
+#
+#  A Prefetcher reads the chunks playback is about to reach in a background thread, so stepping
+#  into a new chunk doesn't wait on the disk.  It is told where playback is, which way it is
+#  going and how fast, and replaces its plan whenever that changes.
+#
+#  Example
+#     points = store.ChunkedTrajectory(np.load("points.npy", mmap_mode = "r"))
+#     trail = points[0, :, 0:1000]     <-- Particle 0, every axis, the first 1000 points
+
+import collections
+import threading
+import numpy as np
+
+#  The size of a chunk that is read from the disk at a time (in bytes)
+defaultChunkBytes = 64 * 1024 * 1024
+
+#  The most memory the chunks kept in memory may use (in bytes)
+defaultMaxBytes = 2 * 1024 * 1024 * 1024
+
+#  How far ahead (in seconds of playback) chunks are read
+defaultLookAhead = 2.0
+
+class ChunkedTrajectory(object):
+   '''Points split into time chunks with a least recently used (LRU) working set.  The source
+      can be anything with a shape that can be sliced along the time axis, such as a
+      memory-mapped array.
+      Input:  source of the points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              number of points per chunk <int>,
+              most memory the loaded chunks may use (in bytes) <int>
+      Output: None'''
+   def __init__(self, source, chunkSize = None, maxBytes = defaultMaxBytes):
+      #  Where the points are read from
+      self.source = source
+      
+      #  The array attributes the graph uses
+      self.shape = tuple(source.shape)
+      self.ndim = len(self.shape)
+      self.dtype = np.dtype(source.dtype)
+      
+      #  The number of bytes for every point in time (all particles and axes)
+      pointBytes = self.shape[0] * self.shape[1] * self.dtype.itemsize
+      
+      #  If no chunk size was given, pick one so a chunk is about the default chunk size in bytes
+      if(chunkSize == None): chunkSize = max(1, defaultChunkBytes // max(1, pointBytes))
+      self.chunkSize = int(min(chunkSize, max(1, self.shape[2])))
+      
+      #  The number of chunks and how many of them can be kept in memory (at least 2 so a
+      #  slice across a chunk boundary doesn't evict its own first half)
+      self.chunkCount = -(-self.shape[2] // self.chunkSize)
+      self.maxChunks = max(2, int(maxBytes // max(1, pointBytes * self.chunkSize)))
+      
+      #  The loaded chunks, from the least to the most recently used
+      self.chunks = collections.OrderedDict()
+      
+      #  Only one thread at a time may change the loaded chunks
+      self.lock = threading.Lock()
+      
+      #  The minimum and maximum values (found the first time they are asked for)
+      self.limits = None
+
+   def __len__(self):
+      '''The number of particles.
+         Input:  None
+         Output: number of particles <int>'''
+      return(self.shape[0])
+
+   def __getitem__(self, key):
+      '''Get points the same way a (particle, axis, time) numpy array is indexed.
+         Input:  index <int, slice or tuple>
+         Output: points <np.ndarray>'''
+      #  Split the index into a particle, axis and time index
+      if(not isinstance(key, tuple)): key = (key,)
+      if(len(key) > 3): raise(IndexError("too many indices for the points"))
+      particleKey, axisKey, timeKey = key + (slice(None),) * (3 - len(key))
+      
+      #  A single point in time only needs one chunk
+      if(isinstance(timeKey, (int, np.integer))):
+         if(timeKey < 0): timeKey += self.shape[2]
+         if(timeKey < 0 or timeKey >= self.shape[2]): raise(IndexError("time index out of range"))
+         start = (timeKey // self.chunkSize) * self.chunkSize
+         return(self.getChunk(timeKey // self.chunkSize)[:, :, timeKey - start][particleKey, axisKey])
+      
+      #  A contiguous range of time is copied chunk by chunk
+      if(isinstance(timeKey, slice) and timeKey.step in (None, 1)):
+         start, stop, step = timeKey.indices(self.shape[2])
+         times = None
+      #  Any other time index is turned into a list of points in time
+      else:
+         times = np.arange(self.shape[2])[timeKey]
+         start, stop = 0, len(times)
+      
+      #  The pieces of each chunk the index covers
+      pieces = []
+      
+      #  Go through each chunk the range of time covers
+      position = start
+      while(position < stop):
+         #  If the points in time are listed, take the run of them that falls in the same chunk
+         if(times is not None):
+            chunkNum = times[position] // self.chunkSize
+            end = position + 1
+            while(end < stop and times[end] // self.chunkSize == chunkNum): end += 1
+            local = times[position:end] - chunkNum * self.chunkSize
+         #  Otherwise, take the part of the range inside this chunk
+         else:
+            chunkNum = position // self.chunkSize
+            end = min(stop, (chunkNum + 1) * self.chunkSize)
+            local = slice(position - chunkNum * self.chunkSize, end - chunkNum * self.chunkSize)
+         
+         #  Add the piece of the chunk (time is indexed first so the time axis stays last)
+         pieces.append(self.getChunk(chunkNum)[:, :, local][particleKey, axisKey])
+         position = end
+      
+      #  If nothing was selected, return an empty array of the right shape
+      if(len(pieces) == 0):
+         empty = np.empty(self.shape[:2] + (0,), dtype = self.dtype)
+         return(empty[particleKey, axisKey])
+      
+      #  Join the pieces along the time axis
+      return(np.concatenate(pieces, axis = -1))
+
+   def bounds(self):
+      '''Find the minimum and maximum values in a single pass over the chunks.  The chunks are
+         read straight from the source so the working set isn't flushed.
+         Input:  None
+         Output: minimum value <float>, maximum value <float>'''
+      #  If the limits have not been found yet
+      if(self.limits == None):
+         #  Start with values that any point will replace
+         minimum = np.inf
+         maximum = -np.inf
+         
+         #  Go through each chunk
+         for chunkNum in range(self.chunkCount):
+            chunk = self.readChunk(chunkNum)
+            minimum = min(minimum, chunk.min())
+            maximum = max(maximum, chunk.max())
+         
+         #  Remember the limits
+         self.limits = (minimum, maximum)
+      
+      return(self.limits)
+
+   def getChunk(self, chunkNum):
+      '''Get a chunk from the working set, reading it from the source if it isn't loaded.
+         Input:  chunk number <int>
+         Output: chunk <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+      #  If the chunk is loaded, mark it as the most recently used and return it
+      with self.lock:
+         if(chunkNum in self.chunks):
+            self.chunks.move_to_end(chunkNum)
+            return(self.chunks[chunkNum])
+      
+      #  Read the chunk (outside the lock so other threads can use the loaded chunks meanwhile)
+      chunk = self.readChunk(chunkNum)
+      
+      with self.lock:
+         #  Drop the least recently used chunks until there is room for the new one
+         while(len(self.chunks) >= self.maxChunks):
+            self.chunks.popitem(last = False)
+         
+         #  Add the chunk to the working set
+         self.chunks[chunkNum] = chunk
+      
+      return(chunk)
+
+   def grow(self):
+      '''Take in points added to the end of the source since the store was made or last grown.
+         The last chunk is dropped from the working set since it may have been only part full.
+         Input:  None
+         Output: None'''
+      with self.lock:
+         self.chunks.pop(self.chunkCount - 1, None)
+         self.shape = tuple(self.source.shape)
+         self.chunkCount = -(-self.shape[2] // self.chunkSize)
+         self.limits = None
+
+   def max(self):
+      '''The maximum value of all the points.
+         Input:  None
+         Output: maximum value <float>'''
+      return(self.bounds()[1])
+
+   def min(self):
+      '''The minimum value of all the points.
+         Input:  None
+         Output: minimum value <float>'''
+      return(self.bounds()[0])
+
+   def readChunk(self, chunkNum):
+      '''Read a chunk from the source into memory.
+         Input:  chunk number <int>
+         Output: chunk <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+      #  The range of time the chunk covers
+      start = chunkNum * self.chunkSize
+      stop = min(start + self.chunkSize, self.shape[2])
+      
+      #  Copy the chunk out of the source
+      return(np.ascontiguousarray(self.source[:, :, start:stop]))
+
+class Prefetcher(object):
+   '''Reads the chunks of a ChunkedTrajectory that playback will reach next in a background
+      thread.  At most half of the store's working set is read ahead, so prefetching never
+      pushes out the chunks being drawn.
+      Input:  chunked points <ChunkedTrajectory>,
+              how far ahead to read (in seconds of playback) <float>
+      Output: None'''
+   def __init__(self, store, lookAhead = defaultLookAhead):
+      self.store = store
+      self.lookAhead = lookAhead
+      self.maxAhead = max(1, store.maxChunks // 2)
+      
+      #  The chunks still to be read, nearest first, and whether the thread should stop
+      self.plan = []
+      self.closed = False
+      self.condition = threading.Condition()
+      
+      #  Start the thread that reads the chunks
+      self.thread = threading.Thread(target = self.run)
+      self.thread.daemon = True
+      self.thread.start()
+
+   def cancel(self):
+      '''Drop the chunks that haven't been read yet.  A chunk being read is finished.'''
+      with self.condition:
+         self.plan = []
+
+   def close(self):
+      '''Stop the thread.'''
+      with self.condition:
+         self.plan = []
+         self.closed = True
+         self.condition.notify()
+
+   def follow(self, position, direction, step, rate, loop = False):
+      '''Replace the plan with the chunks playback reaches from a point, nearest first.
+         Input:  point playback is at <int>,
+                 direction (1 forward, -1 in reverse) <int>,
+                 points moved per step <int>,
+                 steps per second (0 when paused) <float>,
+                 loop flag (playback turns around at the ends instead of stopping) <bool>
+         Output: None'''
+      chunkSize = self.store.chunkSize
+      chunkCount = self.store.chunkCount
+      
+      #  The number of chunks covered in lookAhead seconds, plus the one the next step reaches
+      ahead = int(np.ceil(self.lookAhead * rate * step / chunkSize)) + 1
+      ahead = min(ahead, self.maxAhead, chunkCount)
+      
+      #  Walk the chunks from the current one, turning around at the ends if playback loops
+      chunkNum = min(max(position, 0) // chunkSize, chunkCount - 1)
+      plan = [chunkNum]
+      while(len(plan) <= ahead):
+         if(chunkNum + direction < 0 or chunkNum + direction >= chunkCount):
+            if(loop == False or chunkCount == 1): break
+            direction = -direction
+         chunkNum += direction
+         if(chunkNum not in plan): plan.append(chunkNum)
+         elif(len(plan) == chunkCount): break
+      
+      #  Start on the new plan right away
+      with self.condition:
+         self.plan = plan
+         self.condition.notify()
+
+   def run(self):
+      '''Read the planned chunks into the store until the prefetcher is closed.'''
+      while(True):
+         #  Wait for a chunk to read
+         with self.condition:
+            while(len(self.plan) == 0 and self.closed == False): self.condition.wait()
+            if(self.closed == True): return()
+            chunkNum = self.plan.pop(0)
+         
+         #  Read the chunk (or mark it as recently used if it is already loaded)
+         try: self.store.getChunk(chunkNum)
+         except Exception: pass
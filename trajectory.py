@@ -0,0 +1,301 @@
+#  Functions for reading and writing nBody points files.
+#
+#  Three file formats are supported:
+#     Text       - the repr() of the numpy array described at the top of nbody.py
+#     Binary     - a NumPy .npy file; a short header followed by the raw float buffer
+#     Compressed - chunks of delta encoded, compressed points (see compressed.py)
+#  Several binary or compressed files can also be loaded as one timeline (see shards.py).
+#
+#  Binary files are memory-mapped instead of being read, so loading takes roughly the same
+#  amount of time no matter how big the file is.  The operating system only pages in the
+#  part of the file that is actually drawn.
+#
+#  For drawing, the points are copied into a render layout: a contiguous float32 array with
+#  every particle's trail stored as a run of (x, y, z) points, so any part of a trail is a slice
+#  that can be handed to OpenGL without copying or converting it.
+#
+#  To get an np.array written to a binary file, use this code.
+#     import trajectory
+#     trajectory.savePoints("points.npy", yourNumpyArray)
+#
+#  Files ending in .nbz are written compressed; give a tolerance to quantize the positions.
+#     trajectory.savePoints("points.nbz", yourNumpyArray, tolerance = 1e-6)
+
+import os
+import re
+import numpy as np
+import store
+import compressed
+import shards
+
+#  Every .npy file starts with this magic string
+binaryMagic = b"\x93NUMPY"
+
+#  Binary files bigger than this (in bytes) are read through an out-of-core chunked store
+chunkedFileSize = 2 * 1024 * 1024 * 1024
+
+#  The number of bytes of a text file that are parsed at a time
+textChunkSize = 4 * 1024 * 1024
+
+#  The number of values copied into the render layout at a time
+renderBlockValues = 2 ** 24
+
+#  The characters allowed in a text file (numbers, "nan", "inf", separators and brackets)
+textCharacters = np.zeros(256, dtype = bool)
+textCharacters[np.frombuffer(b"0123456789.+-eEnaifNAIF,[] \t\r\n", dtype = np.uint8)] = True
+
+#  The characters that separate numbers
+separatorCharacters = np.zeros(256, dtype = bool)
+separatorCharacters[np.frombuffer(b",[]", dtype = np.uint8)] = True
+
+#  Brackets are replaced with spaces before the numbers are converted
+bracketsToSpaces = bytes.maketrans(b"[]", b"  ")
+
+class LoadCancelled(Exception):
+   '''Raised by a progress function to stop loading a points file.'''
+   pass
+
+def isBinaryFile(fileName):
+   '''Check if the given file is a binary (.npy) points file by looking at its magic string.
+      Input:  file name <str>
+      Output: True/False <bool>'''
+   #  Read just enough bytes to compare against the magic string
+   with open(fileName, "rb") as READ:
+      magic = READ.read(len(binaryMagic))
+   
+   return(magic == binaryMagic)
+
+def isTextFile(fileName):
+   '''Check if the given file is a text points file (neither binary nor compressed).
+      Input:  file name <str>
+      Output: True/False <bool>'''
+   return(isBinaryFile(fileName) == False and compressed.isCompressedFile(fileName) == False)
+
+def loadBinaryPoints(fileName):
+   '''Memory-map the points stored in a binary (.npy) file.  Nothing is read from the disk
+      until the points are used.
+      Input:  file name <str>
+      Output: array of points <np.memmap> [particle number [axis X, Y, Z [position value <float>]]]'''
+   #  Map the file read only; pickled (object) arrays are refused
+   return(np.load(fileName, mmap_mode = "r", allow_pickle = False))
+
+def childCounts(childMask, parentMask, carry):
+   '''Count how many children end inside each parent that closes in a block of text.  Used to
+      check that every list in the text has the same length.
+      Input:  mask of the characters that end a child <np.ndarray> [bool],
+              mask of the characters that close a parent <np.ndarray> [bool],
+              children counted since the last parent closed <int>
+      Output: number of children in each closed parent <np.ndarray> [int],
+              children counted since the last parent closed <int>'''
+   #  A running count of the children and the count at every closing parent
+   total = np.cumsum(childMask)
+   closed = total[parentMask]
+   
+   #  The first parent also gets the children left over from the previous block
+   counts = np.diff(closed, prepend = 0)
+   if(len(counts) > 0): counts[0] += carry
+   
+   #  Carry the children after the last closing parent on to the next block
+   if(len(closed) > 0): carry = int(total[-1] - closed[-1])
+   elif(len(total) > 0): carry += int(total[-1])
+   
+   return(counts, carry)
+
+def loadTextPoints(fileName, chunkSize = textChunkSize, progress = None):
+   '''Parse the points stored as the repr() of a numpy array.  The file is read in chunks and
+      the numbers are written straight into a preallocated float array, so the memory used is
+      about the size of the final array.  The shape is worked out while parsing and the text is
+      never evaluated.
+      After every chunk the progress function (if given) is called with the fraction of the
+      file read and the particles parsed so far (or None).  The particles are only valid during
+      the call, so copy them to keep them.  Raise LoadCancelled from it to stop loading.
+      Input:  file name <str>,
+              number of bytes read at a time <int>,
+              progress function <function(fraction <float>, particles <np.ndarray>)>
+      Output: array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]]'''
+   #  The size of the file is used to guess how many numbers it holds
+   fileSize = os.path.getsize(fileName)
+   
+   #  The parsed numbers, how many there are and how many there should be
+   values = np.empty(0)
+   count = 0
+   expected = 0
+   
+   #  The bracket depth at the start of the block, the number of points per axis (unknown
+   #  until the first axis is closed) and the number of particles seen
+   depth = 0
+   pointCount = None
+   particleCount = 0
+   
+   #  Numbers and axes seen since the last axis or particle was closed
+   numberCarry = 0
+   axisCarry = 0
+   
+   #  Text left over from the previous chunk (a number may be split across two chunks)
+   remainder = b""
+   
+   with open(fileName, "rb") as READ:
+      while(True):
+         #  Read the next chunk and add it to the leftover text
+         chunk = READ.read(chunkSize)
+         text = remainder + chunk
+         
+         #  Nothing is left to parse
+         if(len(text) == 0): break
+         
+         #  Only parse up to the last separator; the rest might be part of a number
+         if(len(chunk) > 0):
+            cut = max(text.rfind(b","), text.rfind(b"]")) + 1
+            remainder = text[cut:]
+            text = text[:cut]
+         else:
+            remainder = b""
+         
+         #  Wait for more text if no separator was found
+         if(len(text) == 0): continue
+         
+         #  Drop the "array(", ")" and any "dtype=..." wrapped around the numbers
+         text = re.sub(rb"dtype\s*=\s*\w+", b"", text.replace(b"array(", b"").replace(b")", b""))
+         block = np.frombuffer(text, dtype = np.uint8)
+         if(len(block) == 0): continue
+         
+         #  Refuse anything that could not be part of an array of floats
+         valid = textCharacters[block]
+         if(not valid.all()):
+            raise(ValueError("Unexpected character " + repr(chr(block[np.argmin(valid)])) + " in the points file"))
+         
+         #  Only the brackets and commas are needed to follow the structure of the array
+         marks = block[separatorCharacters[block]]
+         
+         #  The bracket depth after each bracket or comma
+         opens = marks == ord("[")
+         closes = marks == ord("]")
+         depths = np.append(depth, depth + np.cumsum(opens.astype(np.int64) - closes))
+         if(depths.min() < 0 or depths.max() > 3):
+            raise(ValueError("The points must be a 3 dimensional array"))
+         
+         #  Count the numbers in each closed axis and the axes in each closed particle
+         depths = depths[1:]
+         commas = (marks == ord(",")) & (depths == 3)
+         axisCloses = closes & (depths == 2)
+         particleCloses = closes & (depths == 1)
+         numbers, numberCarry = childCounts(commas, axisCloses, numberCarry)
+         axes, axisCarry = childCounts(axisCloses, particleCloses, axisCarry)
+         numbers += 1
+         
+         #  The first closed axis sets the number of points; every other axis must match
+         if(pointCount == None and len(numbers) > 0): pointCount = int(numbers[0])
+         if(np.any(numbers != pointCount)):
+            raise(ValueError("Every axis must have " + str(pointCount) + " points"))
+         if(np.any(axes != 3)):
+            raise(ValueError("Every particle must have exactly 3 axes (X, Y, Z)"))
+         
+         #  Keep track of the numbers that should have been parsed so far
+         if(len(depths) > 0): depth = int(depths[-1])
+         particleCount += len(axes)
+         expected += int(numbers.sum())
+         
+         #  Turn the brackets into spaces and convert the numbers
+         text = text.translate(bracketsToSpaces).strip(b" \t\r\n,")
+         if(len(text) > 0): parsed = np.fromstring(text, dtype = np.float64, sep = ",")
+         else: parsed = np.empty(0)
+         
+         #  If this is the first chunk, allocate room for the number of values the file probably holds
+         if(len(values) == 0 and len(parsed) > 0):
+            values = np.empty(int(fileSize * len(parsed) / len(text) * 1.05) + len(parsed))
+         
+         #  Grow the array if the guess was too small
+         if(count + len(parsed) > len(values)):
+            values.resize(max(count + len(parsed), int(len(values) * 1.5)), refcheck = False)
+         
+         #  Copy the numbers into place
+         values[count:count + len(parsed)] = parsed
+         count += len(parsed)
+         
+         #  Every number must have been read (the open axis has one number per trailing comma)
+         if(count != expected + (numberCarry if depth == 3 else 0)):
+            raise(ValueError("Could not read all of the numbers in the points file"))
+         
+         #  Report the progress along with the particles that have been completely parsed
+         if(progress != None):
+            if(particleCount > 0): progress(READ.tell() / max(1, fileSize), values[:particleCount * 3 * pointCount].reshape(particleCount, 3, pointCount))
+            else: progress(READ.tell() / max(1, fileSize), None)
+   
+   #  Every bracket must be closed and there must be at least one particle
+   if(depth != 0 or particleCount == 0):
+      raise(ValueError("The points file ended before the array was complete"))
+   
+   #  Trim the unused space and give the array its shape
+   values.resize(count, refcheck = False)
+   return(values.reshape(particleCount, 3, pointCount))
+
+def loadCompressedPoints(fileName):
+   '''Load the points stored in a compressed file.  If the points are too big to keep in
+      memory, they are wrapped in a chunked store that decompresses a chunk when it is needed.
+      Input:  file name <str>
+      Output: array of points <np.ndarray or store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]]'''
+   source = compressed.CompressedTrajectory(fileName)
+   
+   #  Decompress everything (in parallel) if it fits
+   particleCount, axisCount, pointCount = source.shape
+   if(particleCount * axisCount * pointCount * 8 <= chunkedFileSize):
+      points = source[:, :, :]
+      source.close()
+      return(points)
+   
+   #  Otherwise, keep store chunks that line up with a whole number of compressed chunks
+   chunkSize = max(1, store.defaultChunkBytes // max(1, particleCount * axisCount * 8 * source.chunkSize)) * source.chunkSize
+   return(store.ChunkedTrajectory(source, chunkSize))
+
+def loadPoints(fileName, progress = None):
+   '''Load a points file in the binary, compressed or text format.  Large binary and
+      compressed files are wrapped in a chunked store so only part of them is kept in memory.
+      A list of files, a shard manifest or a pattern is joined into one timeline.  The progress
+      function is passed on to loadTextPoints.
+      Input:  file name, or shard file names, manifest or pattern <str or list>,
+              progress function <function(fraction <float>, particles <np.ndarray>)>
+      Output: array of points <np.ndarray or store.ChunkedTrajectory> [particle number [axis X, Y, Z [position value <float>]]]'''
+   #  If shards are given, join them (reading them through a chunked store)
+   if(shards.isShardName(fileName) == True): return(shards.loadShards(fileName))
+   #  If the file is binary and too big to keep in memory, read it through a chunked store
+   elif(isBinaryFile(fileName) == True and os.path.getsize(fileName) > chunkedFileSize):
+      return(store.ChunkedTrajectory(loadBinaryPoints(fileName)))
+   #  If the file is binary, memory-map it
+   elif(isBinaryFile(fileName) == True): return(loadBinaryPoints(fileName))
+   #  If the file is compressed, decompress it (or the parts of it that are used)
+   elif(compressed.isCompressedFile(fileName) == True): return(loadCompressedPoints(fileName))
+   #  Otherwise, parse the text
+   else: return(loadTextPoints(fileName, progress = progress))
+
+def renderLayout(points, progress = None):
+   '''Copy the points into the render layout: a contiguous float32 array of every particle's
+      trail [particle [point [x, y, z]]].  A block of particles is copied at a time to keep the
+      temporary arrays small.
+      Input:  array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              function called with the fraction done after each block of particles <function(fraction <float>)>
+      Output: render layout <np.ndarray> [particle [point [x, y, z <np.float32>]]]'''
+   particleCount, axisCount, pointCount = points.shape
+   layout = np.empty((particleCount, pointCount, 3), dtype = np.float32)
+   
+   #  Go through each block of particles
+   blockSize = max(1, renderBlockValues // max(1, 3 * pointCount))
+   for start in range(0, particleCount, blockSize):
+      stop = min(start + blockSize, particleCount)
+      layout[start:stop] = np.transpose(points[start:stop], (0, 2, 1))
+      if(progress != None): progress(stop / particleCount)
+   
+   return(layout)
+
+def savePoints(fileName, points, tolerance = 0.0, codec = "zlib"):
+   '''Save the points to a binary (.npy) file, or a compressed file if the name ends in .nbz.
+      Input:  file name <str>,
+              array of points <np.ndarray> [particle number [axis X, Y, Z [position value <float>]]],
+              position tolerance of a compressed file (0 for lossless) <float>,
+              codec of a compressed file ("zlib" or "lzma") <str>
+      Output: None'''
+   #  Write the compressed chunks and their index
+   if(fileName.lower().endswith(".nbz")):
+      compressed.savePoints(fileName, points, tolerance, codec)
+   #  Otherwise, write the header and the raw float buffer
+   else:
+      np.save(fileName, np.asarray(points, dtype = np.float64), allow_pickle = False)